@@ -0,0 +1,133 @@
+"""
+Local prefix index for category autocomplete
+
+category-search.js asks /get_categories_with_query/<lang>/<query>/ on every debounced keystroke. Instead of
+one `list=allcategories` call per keystroke, the results of earlier prefixes are kept in memory per language
+(LRU, CATEGORY_INDEX_MAX_ENTRIES prefixes) and longer prefixes are answered locally when a known listing
+covers them:
+- the listing of a shorter prefix was complete (no continuation), or
+- it was cut, but its last title already sorts after every title starting with the new prefix
+
+Prefixes are fetched with the largest aclimit, so most listings are complete after two or three letters
+and typing further never leaves the server. A listing older than CATEGORY_INDEX_TTL seconds no longer covers
+anything and is fetched again, so categories created since then show up.
+
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import metrics, wiki_client
+
+RESULT_LIMIT = 50  # categories returned to the browser
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL = 60 * 60
+
+_index = OrderedDict()  # (lang, prefix) -> (sorted titles, complete, time fetched)
+_lock = threading.Lock()
+
+
+def normalize_prefix(prefix):
+    """
+    Normalize a query like MediaWiki normalizes titles: underscores are spaces and the first letter
+    is upper case (Wikipedias use first-letter case sensitivity).
+
+    :param prefix: Query typed by the user
+    :return: Normalized prefix
+    """
+    prefix = prefix.replace("_", " ").lstrip()
+    return prefix[:1].upper() + prefix[1:]
+
+
+def _sort_key(title):
+    # allcategories is sorted by the database key, where spaces are underscores
+    return title.replace(" ", "_")
+
+
+def _covers(titles, complete, prefix):
+    """
+    :return: True if a listing (sorted, starting at its own prefix) holds every title starting with prefix
+    """
+    if complete:
+        return True
+    if not titles:
+        return False
+    last = _sort_key(titles[-1])
+    key = _sort_key(prefix)
+    return last > key and not last.startswith(key)
+
+
+def _lookup(lang, prefix):
+    """
+    :return: Titles starting with prefix from a covering listing, or None
+    """
+    ttl = getattr(settings, "CATEGORY_INDEX_TTL", DEFAULT_TTL)
+    now = time.monotonic()
+    with _lock:
+        for length in range(len(prefix), 0, -1):
+            entry = _index.get((lang, prefix[:length]))
+            if entry is not None and ttl is not None and now - entry[2] > ttl:
+                del _index[(lang, prefix[:length])]  # outdated: categories may have been created since
+                continue
+            if entry is not None and _covers(entry[0], entry[1], prefix):
+                _index.move_to_end((lang, prefix[:length]))
+                titles = entry[0]
+                break
+        else:
+            return None
+    return [title for title in titles if title.startswith(prefix)]
+
+
+def _remember(lang, prefix, titles, complete):
+    with _lock:
+        _index[(lang, prefix)] = (titles, complete, time.monotonic())
+        _index.move_to_end((lang, prefix))
+        while len(_index) > getattr(settings, "CATEGORY_INDEX_MAX_ENTRIES", DEFAULT_MAX_ENTRIES):
+            _index.popitem(last=False)
+
+
+def fetch_prefix(lang, prefix):
+    """
+    Fetch the first categories starting with a prefix, in the largest batch the API allows.
+https://en.wikipedia.org/w/api.php?action=query&list=allcategories&acprefix=Hist&aclimit=max&format=json
+    :param lang: Wikipedia language code
+    :param prefix: Normalized prefix
+    :return: (sorted list of category names without namespace, True if the listing is complete)
+    """
+    params = {
+        "action": "query",
+        "list": "allcategories",
+        "acprefix": prefix,  # Direct filtering using query prefix
+        "aclimit": "max",
+        "format": "json",
+    }
+    data = wiki_client.api_get(lang, params)
+    titles = [cat["*"] for cat in data.get("query", {}).get("allcategories", [])]
+    return titles, "continue" not in data
+
+
+def search_categories(lang, query):
+    """
+    Return the first categories whose name starts with the query, from the local index when possible.
+
+    :param lang: Wikipedia language code
+    :param query: Query string for category prefix
+    :return: List of at most RESULT_LIMIT category names
+    """
+    prefix = normalize_prefix(query)
+    titles = _lookup(lang, prefix)
+    metrics.record_cache("category_index", "miss" if titles is None else "hit")
+    if titles is None:
+        titles, complete = fetch_prefix(lang, prefix)
+        _remember(lang, prefix, titles, complete)
+    return titles[:RESULT_LIMIT]
+
+
+def clear():
+    """
+    Forget every indexed prefix.
+    """
+    with _lock:
+        _index.clear()
@@ -0,0 +1,11 @@
+DROP TABLE IF EXISTS `categorylinks`;
+CREATE TABLE `categorylinks` (
+  `cl_from` int(8) unsigned NOT NULL DEFAULT 0,
+  `cl_to` varbinary(255) NOT NULL DEFAULT '',
+  `cl_sortkey` varbinary(230) NOT NULL DEFAULT '',
+  `cl_timestamp` timestamp NOT NULL DEFAULT current_timestamp(),
+  `cl_type` enum('page','subcat','file') NOT NULL DEFAULT 'page',
+  PRIMARY KEY (`cl_from`,`cl_to`)
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+INSERT INTO `categorylinks` VALUES (2,'Root','SUB','2025-01-01 00:00:00','subcat'),(10,'Root','EARTH','2025-01-01 00:00:00','page'),(11,'Root','O\'BRIEN (BAND)','2025-01-01 00:00:00','page'),(13,'Root','OLD EARTH','2025-01-01 00:00:00','page');
+INSERT INTO `categorylinks` VALUES (1,'Sub','ROOT','2025-01-01 00:00:00','subcat'),(11,'Sub','O\'BRIEN (BAND)','2025-01-01 00:00:00','page'),(12,'Sub','MOON),(','2025-01-01 00:00:00','page'),(14,'Sub','BACK\\SLASH','2025-01-01 00:00:00','page');
@@ -0,0 +1,8 @@
+DROP TABLE IF EXISTS `langlinks`;
+CREATE TABLE `langlinks` (
+  `ll_from` int(8) unsigned NOT NULL DEFAULT 0,
+  `ll_lang` varbinary(35) NOT NULL DEFAULT '',
+  `ll_title` varbinary(255) NOT NULL DEFAULT '',
+  PRIMARY KEY (`ll_from`,`ll_lang`)
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+INSERT INTO `langlinks` VALUES (1,'he','קטגוריה:שורש'),(10,'fr','Terre'),(10,'he','כדור הארץ'),(12,'fr','Lune'),(14,'fr','Barre oblique inversée');
@@ -0,0 +1,15 @@
+-- Sample dump for the tests (Missing_App/tests.py): en:Category:Root -> Category:Sub -> Category:Root
+DROP TABLE IF EXISTS `page`;
+CREATE TABLE `page` (
+  `page_id` int(8) unsigned NOT NULL AUTO_INCREMENT,
+  `page_namespace` int(11) NOT NULL DEFAULT 0,
+  `page_title` varbinary(255) NOT NULL DEFAULT '',
+  `page_is_redirect` tinyint(1) unsigned NOT NULL DEFAULT 0,
+  `page_random` double unsigned NOT NULL DEFAULT 0,
+  `page_touched` binary(14) NOT NULL,
+  `page_len` int(8) unsigned NOT NULL DEFAULT 0,
+  PRIMARY KEY (`page_id`),
+  KEY `page_len` (`page_len`)
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+INSERT INTO `page` VALUES (1,14,'Root',0,0.125,'20250101000000',50),(2,14,'Sub',0,0.5,'20250101000000',40),(10,0,'Earth',0,0.25,'20250101000000',900);
+INSERT INTO `page` VALUES (11,0,'O\'Brien_(band)',0,0.75,'20250101000000',120),(12,0,'Moon),(99,0,\'x',0,1e-05,'20250101000000',80),(13,0,'Old_Earth',1,0.375,'20250101000000',20),(14,0,'Back\\slash',0,0.625,'20250101000000',10),(15,4,'About',0,0.875,'20250101000000',30);
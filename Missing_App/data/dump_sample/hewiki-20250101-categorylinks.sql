@@ -0,0 +1,7 @@
+CREATE TABLE `categorylinks` (
+  `cl_from` int(8) unsigned NOT NULL DEFAULT 0,
+  `cl_to` varbinary(255) NOT NULL DEFAULT '',
+  `cl_type` enum('page','subcat','file') NOT NULL DEFAULT 'page',
+  PRIMARY KEY (`cl_from`,`cl_to`)
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+INSERT INTO `categorylinks` VALUES (501,'שורש','page');
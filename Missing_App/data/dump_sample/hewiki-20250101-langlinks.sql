@@ -0,0 +1,7 @@
+CREATE TABLE `langlinks` (
+  `ll_from` int(8) unsigned NOT NULL DEFAULT 0,
+  `ll_lang` varbinary(35) NOT NULL DEFAULT '',
+  `ll_title` varbinary(255) NOT NULL DEFAULT '',
+  PRIMARY KEY (`ll_from`,`ll_lang`)
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+INSERT INTO `langlinks` VALUES (500,'en','Category:Root'),(501,'en','Earth');
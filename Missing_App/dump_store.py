@@ -0,0 +1,447 @@
+"""
+Offline engine built from MediaWiki SQL dumps
+
+Computes missing articles for whole category trees without the live API, from the dump files published at
+https://dumps.wikimedia.org/<dbname>/ for each language:
+- <dbname>-<date>-page.sql.gz, -categorylinks.sql.gz, -langlinks.sql.gz
+- -linktarget.sql.gz, only for dumps where categorylinks references link targets (cl_target_id)
+- -siteinfo-namespaces.json.gz (optional; the namespace names are fetched once from the API otherwise)
+
+ingest_wiki streams the files row by row (they are never loaded into memory) into one compact SQLite file
+per language in DUMP_STORE_DIR, keeping only what the search needs:
+- page: page id, namespace and title of the non-redirect pages in DUMP_NAMESPACES (articles and categories)
+- categorylinks: (category, type, page id), clustered by category for range scans
+- langlinks: (page id, language, title), optionally restricted to some target languages
+The file is built next to the old one and swapped in atomically, so searches never see a partial store.
+
+DumpBackend answers the questions of the search pipeline (resolve the category, list subcategories, list the
+members missing in a language or present in several) from these stores; see search.get_backend.
+
+"""
+import bz2
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from . import siteinfo
+from .languages import get_catalog
+from .search import SearchError
+
+DUMP_FILES = ("page", "categorylinks", "langlinks", "linktarget", "siteinfo-namespaces")
+DEFAULT_NAMESPACES = (0, siteinfo.NAMESPACE_CATEGORY)
+BATCH_SIZE = 10000  # rows per executemany
+CHECK_BATCH = 500  # page ids per langlinks lookup (below SQLite's limit on query parameters)
+
+SCHEMA = """
+CREATE TABLE page (
+    page_id INTEGER PRIMARY KEY,
+    ns INTEGER NOT NULL,
+    title TEXT NOT NULL
+);
+CREATE TABLE categorylinks (
+    cl_to TEXT NOT NULL,
+    cl_type TEXT NOT NULL,
+    cl_from INTEGER NOT NULL,
+    PRIMARY KEY (cl_to, cl_type, cl_from)
+) WITHOUT ROWID;
+CREATE TABLE langlinks (
+    ll_from INTEGER NOT NULL,
+    ll_lang TEXT NOT NULL,
+    ll_title TEXT NOT NULL,
+    PRIMARY KEY (ll_from, ll_lang)
+) WITHOUT ROWID;
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# One token of an INSERT statement: row delimiters, quoted strings (backslash escapes), NULL and numbers
+_TOKEN_RE = re.compile(r"\(|\)|'((?:[^'\\]|\\.)*)'|(NULL)|(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)", re.S)
+_ESCAPE_RE = re.compile(r"\\(.)", re.S)
+_ESCAPES = {"0": "\0", "b": "\b", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a"}
+_COLUMN_RE = re.compile(r"\s*`(\w+)`")
+
+_local = threading.local()  # per-thread read-only connections: lang -> (mtime, connection)
+
+
+def _unescape(value):
+    return _ESCAPE_RE.sub(lambda match: _ESCAPES.get(match.group(1), match.group(1)), value)
+
+
+def _open(path):
+    path = str(path)
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+def iter_dump_rows(path, columns):
+    """
+    Stream the rows of a mysqldump file (as published by Wikimedia), one INSERT line at a time.
+    Column positions are read from the CREATE TABLE statement of the file, so both old and new table
+    layouts are supported.
+
+    :param path: Path of the .sql, .sql.gz or .sql.bz2 file
+    :param columns: Names of the columns to extract
+    :return: Generator of tuples with the values of columns (None for a column the table does not have)
+    """
+    table_columns = []
+    in_create = False
+    positions = None
+    with _open(path) as dump:
+        for line in dump:
+            if line.startswith("CREATE TABLE"):
+                in_create, table_columns = True, []
+                continue
+            if in_create:
+                match = _COLUMN_RE.match(line)
+                if match:
+                    table_columns.append(match.group(1))
+                elif line.startswith(")"):
+                    in_create = False
+                    positions = [table_columns.index(name) if name in table_columns else None
+                                 for name in columns]
+                continue
+            if not line.startswith("INSERT INTO") or positions is None:
+                continue
+
+            row = []
+            for match in _TOKEN_RE.finditer(line, line.index(" VALUES ") + 8):
+                token = match.group(0)
+                if token == "(":
+                    row = []
+                elif token == ")":
+                    yield tuple(row[position] if position is not None else None for position in positions)
+                elif match.group(1) is not None:
+                    row.append(_unescape(match.group(1)))
+                elif match.group(2):
+                    row.append(None)
+                else:
+                    number = match.group(3)
+                    row.append(float(number) if "." in number or "e" in number.lower() else int(number))
+
+
+def _insert_rows(connection, sql, rows):
+    """
+    Insert rows in batches of BATCH_SIZE.
+
+    :return: Number of rows inserted
+    """
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            connection.executemany(sql, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        connection.executemany(sql, batch)
+        count += len(batch)
+    return count
+
+
+def find_dump_files(directory, lang):
+    """
+    Find the latest dump files of a language in a directory (e.g. enwiki-20250101-page.sql.gz).
+
+    :param directory: Directory holding the downloaded dumps
+    :param lang: Wikipedia language code
+    :return: Dict file kind (see DUMP_FILES) -> path, for the kinds found
+    """
+    dbname = get_catalog().dbname(lang)
+    found = {}
+    for kind in DUMP_FILES:
+        extension = "json" if kind == "siteinfo-namespaces" else "sql"
+        candidates = sorted(Path(directory).glob(f"{dbname}-*-{kind}.{extension}*"))
+        if candidates:
+            found[kind] = candidates[-1]  # dates sort lexicographically; 'latest' sorts after them
+    return found
+
+
+def store_dir():
+    return Path(getattr(settings, "DUMP_STORE_DIR", Path(settings.BASE_DIR) / "dumps"))
+
+
+def store_path(lang):
+    return store_dir() / f"{lang}.sqlite3"
+
+
+def ingest_wiki(lang, files, target_langs=None, namespaces=None, log=print):
+    """
+    Build the offline store of a language from its dump files.
+
+    :param lang: Wikipedia language code
+    :param files: Dict file kind -> path (see find_dump_files); page, categorylinks and langlinks are required
+    :param target_langs: (Optional) only keep the langlinks to these languages
+    :param namespaces: (Optional) namespaces of the pages to keep (default: DUMP_NAMESPACES)
+    :param log: Function receiving progress messages
+    :return: Dict table -> number of rows stored
+    """
+    missing = [kind for kind in ("page", "categorylinks", "langlinks") if kind not in files]
+    if missing:
+        raise ValueError(f"Missing dump files for {lang}: {', '.join(missing)}")
+    namespaces = set(namespaces or getattr(settings, "DUMP_NAMESPACES", DEFAULT_NAMESPACES))
+
+    if "siteinfo-namespaces" in files:
+        with _open(files["siteinfo-namespaces"]) as namespace_file:
+            namespace_data = json.load(namespace_file)
+    else:
+        namespace_data = siteinfo.fetch_namespace_data(lang)
+
+    path = store_path(lang)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    connection = sqlite3.connect(tmp_path)
+    connection.execute("PRAGMA journal_mode=OFF")
+    connection.execute("PRAGMA synchronous=OFF")
+    connection.executescript(SCHEMA)
+    stats = {}
+    try:
+        log(f"{lang}: reading {files['page']}")
+        pages = (
+            (page_id, ns, title)
+            for page_id, ns, title, is_redirect in iter_dump_rows(
+                files["page"], ["page_id", "page_namespace", "page_title", "page_is_redirect"])
+            if ns in namespaces and not is_redirect
+        )
+        stats["page"] = _insert_rows(connection, "INSERT INTO page VALUES (?, ?, ?)", pages)
+
+        # Newer dumps reference categories through linktarget (cl_target_id) instead of cl_to
+        if "linktarget" in files:
+            log(f"{lang}: reading {files['linktarget']}")
+            connection.execute("CREATE TEMP TABLE linktarget (lt_id INTEGER PRIMARY KEY, title TEXT NOT NULL)")
+            targets = (
+                (lt_id, title)
+                for lt_id, ns, title in iter_dump_rows(files["linktarget"], ["lt_id", "lt_namespace", "lt_title"])
+                if ns == siteinfo.NAMESPACE_CATEGORY
+            )
+            _insert_rows(connection, "INSERT INTO linktarget VALUES (?, ?)", targets)
+
+        log(f"{lang}: reading {files['categorylinks']}")
+        connection.execute("CREATE TEMP TABLE categorylinks_target (cl_target_id INTEGER, cl_type TEXT, cl_from INTEGER)")
+        named, targeted = [], []
+        for cl_from, cl_to, target, cl_type in iter_dump_rows(
+                files["categorylinks"], ["cl_from", "cl_to", "cl_target_id", "cl_type"]):
+            if cl_type not in ("page", "subcat"):
+                continue
+            if cl_to is not None:
+                named.append((cl_to, cl_type, cl_from))
+            elif target is not None:
+                targeted.append((target, cl_type, cl_from))
+            if len(named) >= BATCH_SIZE:
+                connection.executemany("INSERT OR IGNORE INTO categorylinks VALUES (?, ?, ?)", named)
+                named = []
+            if len(targeted) >= BATCH_SIZE:
+                connection.executemany("INSERT INTO categorylinks_target VALUES (?, ?, ?)", targeted)
+                targeted = []
+        connection.executemany("INSERT OR IGNORE INTO categorylinks VALUES (?, ?, ?)", named)
+        connection.executemany("INSERT INTO categorylinks_target VALUES (?, ?, ?)", targeted)
+        if connection.execute("SELECT 1 FROM categorylinks_target LIMIT 1").fetchone():
+            if "linktarget" not in files:
+                raise ValueError(f"The categorylinks dump of {lang} uses cl_target_id: the linktarget dump is needed")
+            connection.execute(
+                "INSERT OR IGNORE INTO categorylinks SELECT lt.title, c.cl_type, c.cl_from "
+                "FROM categorylinks_target c JOIN linktarget lt ON lt.lt_id = c.cl_target_id")
+
+        log(f"{lang}: reading {files['langlinks']}")
+        target_langs = set(target_langs or [])
+        langlinks = (
+            row for row in iter_dump_rows(files["langlinks"], ["ll_from", "ll_lang", "ll_title"])
+            if not target_langs or row[1] in target_langs
+        )
+        _insert_rows(connection, "INSERT OR IGNORE INTO langlinks VALUES (?, ?, ?)", langlinks)
+
+        # Keep only the links of the stored pages
+        connection.execute("DELETE FROM categorylinks WHERE cl_from NOT IN (SELECT page_id FROM page)")
+        connection.execute("DELETE FROM langlinks WHERE ll_from NOT IN (SELECT page_id FROM page)")
+        connection.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("namespaces", json.dumps(namespace_data)),
+            ("ingested_at", str(int(time.time()))),
+            ("files", json.dumps({kind: Path(file).name for kind, file in files.items()})),
+        ])
+        connection.commit()
+        for table in ("categorylinks", "langlinks"):
+            stats[table] = connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+
+    os.replace(tmp_path, path)
+    log(f"{lang}: stored {stats} in {path}")
+    return stats
+
+
+def _connect(lang):
+    """
+    Return this thread's read-only connection to the store of a language (reopened after a new ingest)
+    and install the language's namespace table, so titles are built without API calls.
+
+    :raises SearchError: if the language has no offline store
+    """
+    path = store_path(lang)
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        raise SearchError({"error": f"No offline dump store for language: {lang}"}, status=400)
+
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    cached = connections.get(lang)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    if cached is not None:
+        cached[1].close()
+
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    namespaces = connection.execute("SELECT value FROM meta WHERE key = 'namespaces'").fetchone()[0]
+    siteinfo.set_namespace_table(lang, siteinfo.parse_namespace_table(json.loads(namespaces)))
+    connections[lang] = (mtime, connection)
+    return connection
+
+
+def has_store(lang):
+    return store_path(lang).exists()
+
+
+def _db_key(name):
+    # titles are stored as database keys: underscores instead of spaces
+    return name.replace(" ", "_")
+
+
+def _title(lang, ns, db_key):
+    name = db_key.replace("_", " ")
+    return name if ns == 0 else siteinfo.namespace_title(lang, ns, name)
+
+
+class DumpBackend:
+    """
+    Search backend answering from the offline dump stores (see search.get_backend).
+    """
+    name = "dump"
+
+    def category_title(self, lang, name):
+        _connect(lang)
+        return siteinfo.category_title(lang, name)
+
+    def resolve_reference_category(self, edit_lang, category, refer_lang):
+        """
+        Find the reference-language title of a category through the langlinks of the contribution wiki
+        or, when only the reference wiki was ingested, through the reverse langlinks of the reference wiki
+        (the category must then be given with its namespace prefix).
+
+        :raises SearchError: same payloads as search.resolve_reference_category
+        """
+        refer_connection = _connect(refer_lang)
+        if has_store(edit_lang):
+            connection = _connect(edit_lang)
+            ns, name = siteinfo.split_title(edit_lang, siteinfo.category_title(edit_lang, category))
+            found = connection.execute(
+                "SELECT p.page_id, l.ll_title FROM page p LEFT JOIN langlinks l "
+                "ON l.ll_from = p.page_id AND l.ll_lang = ? WHERE p.ns = ? AND p.title = ?",
+                (refer_lang, ns, _db_key(name)),
+            ).fetchone()
+            if found is None:
+                raise SearchError({"noQCode": "Category not found in wikipedia"}, status=200)
+            if not found[1]:
+                raise SearchError({"noCatError": " category names not found"}, status=400)
+            return siteinfo.category_title(refer_lang, found[1])
+
+        found = refer_connection.execute(
+            "SELECT p.ns, p.title FROM langlinks l JOIN page p ON p.page_id = l.ll_from "
+            "WHERE l.ll_lang = ? AND l.ll_title = ? AND p.ns = ?",
+            (edit_lang, category.replace("_", " "), siteinfo.NAMESPACE_CATEGORY),
+        ).fetchone()
+        if found is None:
+            raise SearchError({"noQCode": "Category not found in wikipedia"}, status=200)
+        return _title(refer_lang, found[0], found[1])
+
+    def get_direct_subcategories(self, lang, category, limit=None):
+        connection = _connect(lang)
+        name = siteinfo.split_title(lang, category)[1]
+        rows = connection.execute(
+            "SELECT p.ns, p.title FROM categorylinks c JOIN page p ON p.page_id = c.cl_from "
+            "WHERE c.cl_to = ? AND c.cl_type = 'subcat' ORDER BY p.title LIMIT ?",
+            (_db_key(name), limit or -1),
+        )
+        return [_title(lang, ns, title) for ns, title in rows]
+
+    def iter_missing_category_members(self, lang, category, target_lang, limit=None):
+        for pageid, title in self.iter_missing_category_pages(lang, category, target_lang, limit):
+            yield title
+
+    def iter_missing_category_pages(self, lang, category, target_lang, limit=None):
+        connection = _connect(lang)
+        name = siteinfo.split_title(lang, category)[1]
+        rows = connection.execute(
+            "SELECT p.page_id, p.ns, p.title, "
+            "EXISTS (SELECT 1 FROM langlinks l WHERE l.ll_from = p.page_id AND l.ll_lang = ?) "
+            "FROM categorylinks c JOIN page p ON p.page_id = c.cl_from "
+            "WHERE c.cl_to = ? AND c.cl_type = 'page' ORDER BY p.title LIMIT ?",
+            (target_lang, _db_key(name), limit or -1),
+        )
+        for pageid, ns, title, has_langlink in rows:  # read from the cursor: huge categories are not loaded
+            if not has_langlink:
+                yield pageid, _title(lang, ns, title)
+
+    def iter_new_missing_pages(self, lang, category, target_lang, seen, limit=None):
+        connection = _connect(lang)
+        name = siteinfo.split_title(lang, category)[1]
+        rows = connection.execute(
+            "SELECT p.page_id, p.ns, p.title FROM categorylinks c JOIN page p ON p.page_id = c.cl_from "
+            "WHERE c.cl_to = ? AND c.cl_type = 'page' ORDER BY p.title LIMIT ?",
+            (_db_key(name), limit or -1),
+        )
+        # the langlinks are only looked up for the pages not met before, CHECK_BATCH at a time
+        batch = []
+        for pageid, ns, title in rows:
+            if pageid in seen:
+                continue
+            seen.add(pageid)
+            batch.append((pageid, ns, title))
+            if len(batch) >= CHECK_BATCH:
+                yield from self._without_langlink(connection, lang, batch, target_lang)
+                batch = []
+        yield from self._without_langlink(connection, lang, batch, target_lang)
+
+    @staticmethod
+    def _without_langlink(connection, lang, pages, target_lang):
+        if not pages:
+            return
+        placeholders = ", ".join("?" * len(pages))
+        linked = {pageid for (pageid,) in connection.execute(
+            f"SELECT ll_from FROM langlinks WHERE ll_lang = ? AND ll_from IN ({placeholders})",
+            (target_lang, *(pageid for pageid, _, _ in pages)),
+        )}
+        for pageid, ns, title in pages:
+            if pageid not in linked:
+                yield pageid, _title(lang, ns, title)
+
+    def iter_member_presence(self, lang, category, target_langs, limit=None):
+        connection = _connect(lang)
+        name = siteinfo.split_title(lang, category)[1]
+        targets = list(target_langs)
+        placeholders = ", ".join("?" * len(targets)) or "NULL"
+        rows = connection.execute(
+            "SELECT p.ns, p.title, (SELECT group_concat(l.ll_lang) FROM langlinks l "
+            f"WHERE l.ll_from = p.page_id AND l.ll_lang IN ({placeholders})) "
+            "FROM categorylinks c JOIN page p ON p.page_id = c.cl_from "
+            "WHERE c.cl_to = ? AND c.cl_type = 'page' ORDER BY p.title LIMIT ?",
+            (*targets, _db_key(name), limit or -1),
+        ).fetchall()
+        for ns, title, languages in rows:
+            yield _title(lang, ns, title), set(languages.split(",")) if languages else set()
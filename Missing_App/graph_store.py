@@ -0,0 +1,213 @@
+"""
+Persistent category graph store
+
+Keeps the category trees already discovered in the project's database (db.sqlite3), so repeated or
+overlapping searches do not ask the API again while the data is fresh:
+- category -> subcategory edges (CategoryListing kind 'subcat' + CategoryEdge)
+- category -> page membership (kind 'page' + CategoryMember)
+- page -> langlink status for a target language (PageLanglink)
+
+Listings are keyed per language, stamped with their fetch time and considered fresh for CATEGORY_STORE_TTL
+seconds. The page membership is shared by every target language; the langlink statuses are kept per page, so
+a search towards another language reuses the membership and only needs the statuses it lacks. A listing cut
+by a per-category cap is only reused for requests with the same or a smaller cap.
+
+Rows older than the TTL are deleted by prune(): at most once every CATEGORY_STORE_PRUNE_INTERVAL seconds per
+process when listings are written, and by the prefetch_searches command.
+
+Database errors (e.g. migrations not applied yet) are logged and the caller falls back to the live API.
+
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from . import metrics
+from .models import CategoryEdge, CategoryListing, CategoryMember, PageLanglink
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 60 * 60 * 24  # one day
+DEFAULT_PRUNE_INTERVAL = 60 * 60
+
+_prune_lock = threading.Lock()
+_last_prune = 0.0
+
+
+def is_enabled():
+    return getattr(settings, "CATEGORY_STORE_ENABLED", True)
+
+
+def _cutoff(max_age=None):
+    """
+    :return: Oldest fetch time still considered fresh
+    """
+    ttl = max_age if max_age is not None else getattr(settings, "CATEGORY_STORE_TTL", DEFAULT_TTL)
+    return timezone.now() - timedelta(seconds=ttl)
+
+
+def prune(max_age=None):
+    """
+    Delete the listings and langlink statuses older than CATEGORY_STORE_TTL.
+
+    :param max_age: (Optional) age in seconds overriding the setting
+    :return: Number of listings and statuses deleted
+    """
+    cutoff = _cutoff(max_age)
+    with transaction.atomic():
+        listings = CategoryListing.objects.filter(fetched_at__lt=cutoff)
+        pruned = listings.count()
+        listings.delete()  # cascades to the edges and members
+        statuses, _ = PageLanglink.objects.filter(checked_at__lt=cutoff).delete()
+    return pruned + statuses
+
+
+def _maybe_prune():
+    """
+    Prune the store if this process has not done it in the last CATEGORY_STORE_PRUNE_INTERVAL seconds.
+    """
+    global _last_prune
+    interval = getattr(settings, "CATEGORY_STORE_PRUNE_INTERVAL", DEFAULT_PRUNE_INTERVAL)
+    with _prune_lock:
+        if interval is None or time.monotonic() - _last_prune < interval:
+            return
+        _last_prune = time.monotonic()
+    try:
+        pruned = prune()
+        if pruned:
+            logger.info("Category store: deleted %d expired rows", pruned)
+    except DatabaseError as e:
+        logger.warning("Category store prune failed: %s", e)
+
+
+def _fresh_listing(lang, title, kind, limit):
+    """
+    :return: The stored listing if it is fresh and covers the requested limit, else None
+    """
+    listing = CategoryListing.objects.filter(lang=lang, title=title, kind=kind, fetched_at__gte=_cutoff()).first()
+    if listing is not None and not listing.complete:
+        related = listing.edges if kind == CategoryListing.KIND_SUBCAT else listing.members
+        if not limit or related.count() < limit:
+            listing = None  # the stored listing was capped below what is asked now
+    return listing
+
+
+def _replace_listing(lang, title, kind, complete):
+    """
+    Delete the previous listing of a category (and its rows) and create a new, empty one.
+    """
+    CategoryListing.objects.filter(lang=lang, title=title, kind=kind).delete()
+    return CategoryListing.objects.create(lang=lang, title=title, kind=kind, fetched_at=timezone.now(),
+                                          complete=complete)
+
+
+def get_subcategories(lang, category, limit=None):
+    """
+    :param lang: Wikipedia language code
+    :param category: Full category title
+    :param limit: (Optional) per-category cap of the request
+    :return: List of stored subcategory titles, or None if there is no fresh listing
+    """
+    if not is_enabled():
+        return None
+    try:
+        listing = _fresh_listing(lang, category, CategoryListing.KIND_SUBCAT, limit)
+        metrics.record_cache("category_store", "miss" if listing is None else "hit")
+        if listing is None:
+            return None
+        edges = listing.edges.order_by("position")
+        if limit:
+            edges = edges[:limit]
+        return list(edges.values_list("title", flat=True))
+    except DatabaseError as e:
+        logger.warning("Category store read failed: %s", e)
+        return None
+
+
+def save_subcategories(lang, category, subcategories, complete=True):
+    """
+    :param lang: Wikipedia language code
+    :param category: Full category title
+    :param subcategories: List of subcategory titles, in API order
+    :param complete: False if the listing was cut by a per-category cap
+    """
+    if not is_enabled():
+        return
+    try:
+        with transaction.atomic():
+            listing = _replace_listing(lang, category, CategoryListing.KIND_SUBCAT, complete)
+            CategoryEdge.objects.bulk_create(
+                CategoryEdge(listing=listing, position=position, title=title)
+                for position, title in enumerate(subcategories)
+            )
+    except DatabaseError as e:
+        logger.warning("Category store write failed: %s", e)
+        return
+    _maybe_prune()
+
+
+def get_members(lang, category, target_lang, limit=None):
+    """
+    :param lang: Wikipedia language code
+    :param category: Full category title
+    :param target_lang: Language the langlink status was checked for
+    :param limit: (Optional) per-category cap of the request
+    :return: List of (pageid, title, has_langlink) in listing order, or None if there is no fresh listing or
+             a member has no fresh langlink status for target_lang
+    """
+    if not is_enabled():
+        return None
+    try:
+        listing = _fresh_listing(lang, category, CategoryListing.KIND_PAGE, limit)
+        if listing is None:
+            metrics.record_cache("category_store", "miss")
+            return None
+        status = PageLanglink.objects.filter(lang=lang, target_lang=target_lang, pageid=OuterRef("pageid"),
+                                             checked_at__gte=_cutoff()).values("has_langlink")[:1]
+        members = listing.members.order_by("position").annotate(has_langlink=Subquery(status))
+        if limit:
+            members = members[:limit]
+        members = list(members.values_list("pageid", "title", "has_langlink"))
+        if any(has_langlink is None for _, _, has_langlink in members):
+            members = None  # the membership is known, but not checked against this language
+        metrics.record_cache("category_store", "miss" if members is None else "hit")
+        return members
+    except DatabaseError as e:
+        logger.warning("Category store read failed: %s", e)
+        return None
+
+
+def save_members(lang, category, target_lang, members, complete=True):
+    """
+    :param lang: Wikipedia language code
+    :param category: Full category title
+    :param target_lang: Language the langlink status was checked for
+    :param members: List of (pageid, title, has_langlink), in listing order
+    :param complete: False if the listing was cut by a per-category cap
+    """
+    if not is_enabled():
+        return
+    try:
+        with transaction.atomic():
+            listing = _replace_listing(lang, category, CategoryListing.KIND_PAGE, complete)
+            CategoryMember.objects.bulk_create(
+                CategoryMember(listing=listing, position=position, pageid=pageid, title=title)
+                for position, (pageid, title, _) in enumerate(members)
+            )
+            now = timezone.now()
+            PageLanglink.objects.bulk_create(
+                [PageLanglink(lang=lang, pageid=pageid, target_lang=target_lang, has_langlink=has_langlink,
+                              checked_at=now) for pageid, _, has_langlink in members],
+                update_conflicts=True, unique_fields=["lang", "target_lang", "pageid"],
+                update_fields=["has_langlink", "checked_at"], batch_size=500,
+            )
+    except DatabaseError as e:
+        logger.warning("Category store write failed: %s", e)
+        return
+    _maybe_prune()
@@ -0,0 +1,143 @@
+"""
+HTTP conditional caching and precompressed bodies for the JSON endpoints
+
+A JSON payload is identified by a few "etag parts" known before it is built (e.g. the language catalog's
+timestamp, or the cache key and computed_at of a search result), so:
+- the strong ETag is computed from the parts alone: an If-None-Match revalidation is answered 304 without
+  building, serializing or compressing anything
+- the body is serialized and gzipped once, then kept in a per-process LRU (HTTP_BODY_CACHE_MAX_BYTES) keyed
+  by its ETag, and served as is to every client accepting gzip (decompressed for the others)
+- Cache-Control (public, max-age) lets browsers and proxies reuse the response for its lifetime
+
+The gzip and identity representations carry different strong ETags ("...-gzip" suffix), with
+Vary: Accept-Encoding. Other responses (HTML pages) are compressed on the fly by GZipMiddleware, except the
+streamed ones, whose events would be held back in the compressor's buffer.
+
+"""
+import gzip
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.middleware import gzip as gzip_middleware
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from . import metrics
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+ACCEPTS_GZIP_RE = re.compile(r"\bgzip\b(?!\s*;\s*q=0(?:\.0*)?\b)")
+
+_bodies = OrderedDict()  # etag -> gzipped body, least recently used first
+_size = 0
+_lock = threading.Lock()
+
+
+def make_etag(etag_parts):
+    """
+    :param etag_parts: JSON-serializable value identifying the payload
+    :return: Strong ETag (quoted) of the identity representation
+    """
+    raw = json.dumps(etag_parts, ensure_ascii=False, sort_keys=True, cls=DjangoJSONEncoder)
+    return '"' + hashlib.md5(raw.encode("utf-8")).hexdigest() + '"'
+
+
+def accepts_gzip(request):
+    """
+    :param request: Django HTTP request
+    :return: True if the client accepts gzip-encoded responses
+    """
+    return bool(ACCEPTS_GZIP_RE.search(request.META.get("HTTP_ACCEPT_ENCODING", "")))
+
+
+def _get_body(etag):
+    with _lock:
+        body = _bodies.get(etag)
+        if body is not None:
+            _bodies.move_to_end(etag)
+        return body
+
+
+def _remember(etag, body):
+    global _size
+    max_bytes = getattr(settings, "HTTP_BODY_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+    if len(body) > max_bytes:
+        return
+    with _lock:
+        if etag in _bodies:
+            return
+        _bodies[etag] = body
+        _size += len(body)
+        while _size > max_bytes:
+            _, evicted = _bodies.popitem(last=False)
+            _size -= len(evicted)
+
+
+def clear():
+    """
+    Forget every prepared body.
+    """
+    global _size
+    with _lock:
+        _bodies.clear()
+        _size = 0
+
+
+def _patch_headers(response, max_age):
+    patch_cache_control(response, public=True, max_age=max(int(max_age), 0))
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+def cached_json_response(request, etag_parts, build, max_age):
+    """
+    Answer a JSON endpoint with ETag, Cache-Control and a precompressed body, or a 304.
+
+    :param request: Django HTTP request
+    :param etag_parts: JSON-serializable value identifying the payload: the same parts must always give
+                       the same payload
+    :param build: Function without arguments returning the payload (called only if no body is prepared)
+    :param max_age: Seconds the response may be reused without revalidation
+    :return: HttpResponse (200 or 304)
+    """
+    etag = make_etag(etag_parts)
+    gzipped = accepts_gzip(request)
+    response_etag = etag[:-1] + '-gzip"' if gzipped else etag
+
+    not_modified = get_conditional_response(request, etag=response_etag)
+    if not_modified is not None:
+        not_modified["ETag"] = response_etag
+        return _patch_headers(not_modified, max_age)
+
+    body = _get_body(etag)
+    metrics.record_cache("http_body", "miss" if body is None else "hit")
+    if body is None:
+        data = json.dumps(build(), cls=DjangoJSONEncoder).encode("utf-8")
+        body = gzip.compress(data, compresslevel=6, mtime=0)
+        _remember(etag, body)
+    else:
+        data = None
+
+    if gzipped:
+        response = HttpResponse(body, content_type="application/json")
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(data if data is not None else gzip.decompress(body), content_type="application/json")
+    response["ETag"] = response_etag
+    return _patch_headers(response, max_age)
+
+
+class GZipMiddleware(gzip_middleware.GZipMiddleware):
+    """
+    Django's GZipMiddleware, leaving streamed responses (search progress) uncompressed so that every event is
+    sent as soon as it is produced.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming:
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,188 @@
+"""
+Background search jobs
+
+Deep searches (high max_depth) can run longer than the proxy timeout of an HTTP request. A job runs the same
+search (through the result cache, see result_cache.py) on a small local worker pool, separate from the pool
+used for API fan-out, and keeps its status, progress and result in the database (SearchJob):
+- submit_job stores the job and queues it
+- the worker claims it (queued -> running), saves progress at most every PROGRESS_INTERVAL seconds and
+  stores the result, or the error payload, when the search ends
+- while it runs, a heartbeat thread touches the job every JOB_HEARTBEAT_TIMEOUT / 3 seconds, so phases that
+  report no progress (the traversal of the category tree, a huge category) do not look orphaned
+- when the pool starts, jobs left queued, or running without a heartbeat for JOB_HEARTBEAT_TIMEOUT seconds
+  (their worker was restarted), are queued again, so jobs survive a restart
+
+"""
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+from . import metrics, result_cache, search_log, wiki_client
+from .models import SearchJob, SearchLog
+from .search import SearchError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_HEARTBEAT_TIMEOUT = 60 * 15
+PROGRESS_INTERVAL = 1.0  # seconds between two progress saves
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Return the job worker pool, creating it (and resuming unfinished jobs) on first use.
+
+    :return: concurrent.futures.ThreadPoolExecutor
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "JOB_MAX_WORKERS", DEFAULT_MAX_WORKERS),
+                    thread_name_prefix="search-job",
+                )
+                resume_jobs(_pool)
+    return _pool
+
+
+def resume_jobs(pool):
+    """
+    Queue again the jobs a previous worker did not finish.
+
+    :param pool: Pool to run them on
+    """
+    timeout = getattr(settings, "JOB_HEARTBEAT_TIMEOUT", DEFAULT_HEARTBEAT_TIMEOUT)
+    try:
+        SearchJob.objects.filter(
+            status=SearchJob.STATUS_RUNNING, updated_at__lt=timezone.now() - timedelta(seconds=timeout),
+        ).update(status=SearchJob.STATUS_QUEUED, updated_at=timezone.now())
+        job_ids = list(SearchJob.objects.filter(status=SearchJob.STATUS_QUEUED)
+                       .order_by("created_at").values_list("id", flat=True))
+    except DatabaseError as e:
+        logger.warning("Could not resume search jobs: %s", e)
+        return
+    for job_id in job_ids:
+        pool.submit(run_job, job_id)
+
+
+def submit_job(edit_lang, category, refer_lang, max_depth=1, max_members=None, backend=None):
+    """
+    Store a new search job and queue it.
+
+    :param edit_lang: Contribution language code
+    :param category: Category name in contribution language
+    :param refer_lang: Reference language code
+    :param max_depth: Maximum subcategory depth
+    :param max_members: (Optional) maximum number of members listed per category
+    :param backend: (Optional) search backend name (see search.get_backend)
+    :return: SearchJob
+    """
+    pool = get_pool()
+    job = SearchJob.objects.create(edit_lang=edit_lang, category=category, refer_lang=refer_lang,
+                                   max_depth=max_depth, max_members=max_members, backend=backend or "")
+    pool.submit(run_job, job.id)
+    return job
+
+
+def _update(job_id, **fields):
+    SearchJob.objects.filter(id=job_id).update(updated_at=timezone.now(), **fields)
+
+
+def _beat(job_id):
+    SearchJob.objects.filter(id=job_id, status=SearchJob.STATUS_RUNNING).update(updated_at=timezone.now())
+
+
+def _heartbeat(job_id, stop, interval):
+    """
+    Touch a running job every interval seconds until stop is set (heartbeat thread).
+
+    :param job_id: SearchJob primary key
+    :param stop: threading.Event set when the job ends
+    :param interval: Seconds between two heartbeats
+    """
+    try:
+        while not stop.wait(interval):
+            _beat(job_id)
+    except DatabaseError as e:
+        logger.warning("Search job %s heartbeat failed: %s", job_id, e)
+    finally:
+        stop.set()
+        connections.close_all()  # this thread's database connections
+
+
+def run_job(job_id):
+    """
+    Run a queued job to completion (worker pool entry point).
+
+    :param job_id: SearchJob primary key
+    """
+    stop = threading.Event()
+    try:
+        claimed = SearchJob.objects.filter(id=job_id, status=SearchJob.STATUS_QUEUED).update(
+            status=SearchJob.STATUS_RUNNING, updated_at=timezone.now())
+        if not claimed:
+            return  # already taken by another worker, or finished
+        interval = getattr(settings, "JOB_HEARTBEAT_TIMEOUT", DEFAULT_HEARTBEAT_TIMEOUT) / 3
+        threading.Thread(target=_heartbeat, args=(job_id, stop, interval), name="search-job-heartbeat",
+                         daemon=True).start()
+        job = SearchJob.objects.get(id=job_id)
+        start = time.perf_counter()
+
+        articles = []
+        summary = {}
+        last_save = 0
+        with metrics.collect_timings() as timings:
+            events = result_cache.search_events(job.edit_lang, job.category, job.refer_lang, job.max_depth,
+                                                job.max_members, job.backend or None)
+            for event in events:
+                if event["event"] == "article":
+                    articles.append({"title": event["title"], "source": event["source"]})
+                elif event["event"] == "start":
+                    _update(job_id, total=event["total"])
+                elif event["event"] == "progress" and time.monotonic() - last_save >= PROGRESS_INTERVAL:
+                    _update(job_id, done=event["done"], total=event["total"])
+                    last_save = time.monotonic()
+                elif event["event"] == "summary":
+                    summary = event
+        search_log.log_search(job.edit_lang, job.category, job.refer_lang, job.max_depth, job.max_members,
+                              job.backend, SearchLog.MODE_JOB, 200, time.perf_counter() - start,
+                              timings.upstream_calls())
+
+        result = {
+            "articles": articles,
+            "missing_only": True,
+            "computed_at": summary.get("computed_at"),
+            "stale": summary.get("stale", False),
+        }
+        _update(job_id, status=SearchJob.STATUS_DONE, done=summary.get("categories", 0), result=result,
+                finished_at=timezone.now())
+
+    except SearchError as e:
+        _update(job_id, status=SearchJob.STATUS_FAILED, error=e.payload, error_status=e.status,
+                finished_at=timezone.now())
+
+    except Exception as e:
+        logger.warning("Search job %s failed: %s", job_id, e)
+        error, status = {"error": str(e)}, 500
+        if isinstance(e, wiki_client.UpstreamThrottled):
+            error["retry_after"], status = math.ceil(e.retry_after), 503
+        try:
+            _update(job_id, status=SearchJob.STATUS_FAILED, error=error, error_status=status,
+                    finished_at=timezone.now())
+        except DatabaseError:
+            pass
+
+    finally:
+        stop.set()
+        connections.close_all()  # this thread's database connections
@@ -0,0 +1,252 @@
+"""
+Wikipedia language catalog
+
+An indexed, in-memory catalog of the Wikipedia language editions (code -> names, hostname, validity),
+built from the Wikimedia sitematrix. It replaces the sitematrix fetch that used to run at import time
+in settings.py, so startup never touches the network:
+- A versioned snapshot ships with the app (data/sitematrix.json) and is loaded lazily on first use
+- A refreshed catalog is shared through Django's cache ('language_catalog')
+- When the loaded catalog is older than LANGUAGE_CATALOG_REFRESH_INTERVAL, a background thread refreshes it
+- `python manage.py refresh_sitematrix` rewrites the bundled snapshot
+
+Usage:
+    from Missing_App.languages import get_catalog
+    get_catalog().is_valid("he")  # True
+    get_catalog().hostname("he")  # 'he.wikipedia.org'
+
+"""
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import wiki_client
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = Path(__file__).resolve().parent / "data" / "sitematrix.json"
+SNAPSHOT_VERSION = 1
+CACHE_KEY = "language_catalog"
+DEFAULT_REFRESH_INTERVAL = 60 * 60 * 24 * 7  # one week
+RETRY_DELAY = 60 * 60  # wait an hour before retrying a failed refresh
+
+_catalog = None
+_lock = threading.Lock()
+_refreshing = threading.Event()
+_last_attempt = 0
+
+
+class LanguageCatalog:
+    """
+    Indexed view of the Wikipedia language editions.
+
+    :param languages: List of language entries (code, name, native_name, hostname, dbname, dir, closed)
+    :param generated_at: Unix timestamp of the sitematrix the entries were built from
+    """
+
+    def __init__(self, languages, generated_at=0):
+        self.languages = sorted(languages, key=lambda entry: entry["code"])
+        self.generated_at = generated_at
+        self.by_code = {entry["code"]: entry for entry in self.languages}
+        self.by_dbname = {entry["dbname"]: entry for entry in self.languages if entry.get("dbname")}
+        # Precomputed payload of get_supported_languages, in the legacy format. Closed (read-only) editions
+        # are listed too, as the live sitematrix list always did: they can still be searched as references
+        self.supported = [
+            {"code": entry["code"], "name": entry["name"], "native_name": entry["native_name"]}
+            for entry in self.languages
+        ]
+
+    def get(self, code):
+        """
+        :param code: Wikipedia language code
+        :return: Language entry or None
+        """
+        return self.by_code.get(code)
+
+    def is_valid(self, code):
+        """
+        :param code: Wikipedia language code
+        :return: True if the code is a Wikipedia edition (open or closed)
+        """
+        return code in self.by_code
+
+    def hostname(self, code):
+        """
+        :param code: Wikipedia language code
+        :return: Hostname of the edition (e.g. 'ar.wikipedia.org') or None
+        """
+        entry = self.by_code.get(code)
+        return entry["hostname"] if entry else None
+
+    def dbname(self, code):
+        """
+        :param code: Wikipedia language code
+        :return: Wikidata site id / database name of the edition (e.g. 'arwiki', 'zh_min_nanwiki')
+        """
+        entry = self.by_code.get(code)
+        if entry and entry.get("dbname"):
+            return entry["dbname"]
+        return code.replace("-", "_") + "wiki"
+
+    def code_for_dbname(self, dbname):
+        """
+        :param dbname: Wikidata site id (e.g. 'arwiki')
+        :return: Wikipedia language code, or None for sites that are not a Wikipedia edition
+        """
+        entry = self.by_dbname.get(dbname)
+        return entry["code"] if entry else None
+
+    def as_list(self):
+        """
+        :return: List of {code, name, native_name} for all editions
+        """
+        return self.supported
+
+    def age(self):
+        """
+        :return: Seconds since the underlying sitematrix was generated
+        """
+        return time.time() - self.generated_at
+
+    def to_dict(self):
+        """
+        :return: Serializable snapshot of the catalog
+        """
+        return {"version": SNAPSHOT_VERSION, "generated_at": self.generated_at, "languages": self.languages}
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported sitematrix snapshot version: {data.get('version')}")
+        return cls(data["languages"], data.get("generated_at", 0))
+
+
+def parse_sitematrix(data):
+    """
+    Extract the Wikipedia editions from an action=sitematrix response.
+https://meta.wikimedia.org/w/api.php?action=sitematrix&format=json
+    :param data: Decoded sitematrix JSON
+    :return: List of language entries
+    """
+    languages = []
+    for value in data["sitematrix"].values():
+        if not isinstance(value, dict) or "code" not in value:
+            continue
+        for site in value.get("site", []):
+            if site.get("code") != "wiki":
+                continue  # only Wikipedia, not Wiktionary, Wikibooks, ...
+            languages.append({
+                "code": value["code"],
+                "name": value.get("localname", "Unknown Language"),
+                "native_name": value.get("name", "Unknown Language"),
+                "hostname": site["url"].split("//", 1)[-1],
+                "dbname": site.get("dbname", ""),
+                "dir": value.get("dir", "ltr"),
+                "closed": "closed" in site,
+            })
+    return languages
+
+
+def fetch_catalog():
+    """
+    Build a fresh catalog from the live sitematrix.
+
+    :return: LanguageCatalog
+    """
+    data = wiki_client.meta_get({"action": "sitematrix", "format": "json"})
+    return LanguageCatalog(parse_sitematrix(data), generated_at=int(time.time()))
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    """
+    :param path: Snapshot file path
+    :return: LanguageCatalog loaded from the bundled snapshot
+    """
+    with open(path, encoding="utf-8") as snapshot:
+        return LanguageCatalog.from_dict(json.load(snapshot))
+
+
+def write_snapshot(catalog, path=SNAPSHOT_PATH):
+    """
+    Write a catalog as the bundled snapshot file.
+
+    :param catalog: LanguageCatalog
+    :param path: Snapshot file path
+    """
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as snapshot:
+        json.dump(catalog.to_dict(), snapshot, ensure_ascii=False, indent=1)
+        snapshot.write("\n")
+
+
+def set_catalog(catalog):
+    """
+    Install a catalog for this process and share it with other workers through the cache.
+
+    :param catalog: LanguageCatalog
+    """
+    global _catalog
+    with _lock:
+        _catalog = catalog
+    cache.set(CACHE_KEY, catalog.to_dict(), timeout=None)
+
+
+def refresh_catalog():
+    """
+    Fetch the live sitematrix and install it. Errors are logged, the current catalog stays in place.
+
+    :return: The new LanguageCatalog, or None on failure
+    """
+    try:
+        catalog = fetch_catalog()
+    except Exception as e:
+        logger.warning("Sitematrix refresh failed: %s", e)
+        return None
+    set_catalog(catalog)
+    return catalog
+
+
+def _refresh_worker():
+    try:
+        refresh_catalog()
+    finally:
+        _refreshing.clear()
+
+
+def refresh_in_background():
+    """
+    Start a background refresh unless one is already running or one was attempted recently.
+    """
+    global _last_attempt
+    with _lock:
+        if _refreshing.is_set() or time.time() - _last_attempt < RETRY_DELAY:
+            return
+        _refreshing.set()
+        _last_attempt = time.time()
+    threading.Thread(target=_refresh_worker, name="sitematrix-refresh", daemon=True).start()
+
+
+def get_catalog():
+    """
+    Return the language catalog: from memory, else from the cache, else from the bundled snapshot.
+    Schedules a background refresh when the catalog is older than LANGUAGE_CATALOG_REFRESH_INTERVAL.
+
+    :return: LanguageCatalog
+    """
+    global _catalog
+    catalog = _catalog
+    if catalog is None:
+        with _lock:
+            if _catalog is None:
+                cached = cache.get(CACHE_KEY)
+                _catalog = LanguageCatalog.from_dict(cached) if cached else load_snapshot()
+            catalog = _catalog
+
+    interval = getattr(settings, "LANGUAGE_CATALOG_REFRESH_INTERVAL", DEFAULT_REFRESH_INTERVAL)
+    if interval and catalog.age() > interval:
+        refresh_in_background()
+    return catalog
@@ -0,0 +1,144 @@
+"""
+Bounded-memory mode for very large category trees
+
+The default search keeps one dict per article (title and a repeated source string), in the result cache and
+in the response, and deduplicates by title. For huge trees (e.g. biography subtrees several levels deep) that
+is what blows up worker memory. In large mode (?large=1):
+- articles are deduplicated by page id as they arrive, in PageIdSet: a sorted array of 8-byte ids plus a
+  small set of recent ids, merged into the array when it fills up; every page examined goes into the set, and
+  a page met again in another category is dropped before its langlinks are checked (the dump backend only
+  looks them up for new pages; the API lists them with the page, so there it saves the check, not the call)
+- the JSON response is written category by category while the search runs, JSON_BATCH articles at a time, so
+  no list of dicts is ever built and the articles are not kept at all; the result cache is bypassed (it would
+  hold the whole result in memory)
+
+Peak memory is then 8 bytes per distinct page for deduplication plus the category tree itself, whatever the
+number of articles.
+
+"""
+import json
+import math
+from array import array
+from bisect import bisect_left
+
+from . import metrics, wiki_client
+from .search import get_all_subcategories, get_backend
+
+RECENT_IDS = 1 << 16  # page ids kept in a set before being merged into the sorted array
+JSON_BATCH = 1000  # articles serialized per piece of the streamed response
+
+
+class PageIdSet:
+    """
+    Compact set of page ids (about 8 bytes per id): a sorted array of ids and a set of the recent ones.
+    """
+
+    def __init__(self):
+        self._sorted = array("q")
+        self._recent = set()
+
+    def __len__(self):
+        return len(self._sorted) + len(self._recent)
+
+    def __contains__(self, pageid):
+        if pageid in self._recent:
+            return True
+        position = bisect_left(self._sorted, pageid)
+        return position < len(self._sorted) and self._sorted[position] == pageid
+
+    def add(self, pageid):
+        """
+        :return: True if the id was added, False if it was already in the set
+        """
+        if pageid in self:
+            return False
+        self._recent.add(pageid)
+        if len(self._recent) >= RECENT_IDS:
+            self._merge()
+        return True
+
+    def _merge(self):
+        # copy the runs of old ids between two recent ones as array slices (C speed, no int objects)
+        merged = array("q")
+        old = self._sorted
+        start = 0
+        for pageid in sorted(self._recent):
+            position = bisect_left(old, pageid, start)
+            merged.extend(old[start:position])
+            merged.append(pageid)
+            start = position
+        merged.extend(old[start:])
+        self._sorted = merged
+        self._recent = set()
+
+
+def _categories(source, edit_lang, category, refer_lang, max_depth, max_members, backend):
+    with metrics.phase("resolve"):
+        refer_category = source.resolve_reference_category(edit_lang, category, refer_lang)
+    categories = [refer_category]
+    with metrics.phase("traversal"):
+        categories.extend(get_all_subcategories(refer_lang, refer_category, max_depth=max_depth,
+                                                max_members=max_members, backend=backend))
+    return categories
+
+
+def _iter_missing(source, categories, edit_lang, refer_lang, max_members):
+    """
+    :return: Generator of (category, generator of (pageid, title) of its missing pages not met before)
+    """
+    seen = PageIdSet()
+    for current_category in categories:
+        pages = source.iter_new_missing_pages(refer_lang, current_category, edit_lang, seen, max_members)
+        yield current_category, metrics.timed_iter("members", pages)
+
+
+def stream_missing_articles(edit_lang, category, refer_lang, max_depth=1, max_members=None, backend=None):
+    """
+    Run a missing-articles search in bounded memory and serialize it as it runs, as the payload of
+    get_articles_from_other_languages (with the number of categories). The category is resolved and the tree
+    traversed before returning, so these errors are raised here; the articles of each category are then
+    written as soon as its listing is read, JSON_BATCH at a time, without being kept.
+
+    :param edit_lang: Contribution language code
+    :param category: Category name in contribution language
+    :param refer_lang: Reference language code
+    :param max_depth: Maximum subcategory depth
+    :param max_members: (Optional) maximum number of members listed per category
+    :param backend: (Optional) search backend name (see search.get_backend)
+    :return: Generator of str
+    :raises SearchError: if the category cannot be resolved, or the backend is unknown
+    """
+    source = get_backend(backend)
+    categories = _categories(source, edit_lang, category, refer_lang, max_depth, max_members, backend)
+    return _iter_json(_iter_missing(source, categories, edit_lang, refer_lang, max_members), len(categories))
+
+
+def _iter_json(missing, n_categories):
+    yield '{"articles": ['
+    separator = ""
+    count = 0
+    error = None
+    batch = []
+    try:
+        for current_category, pages in missing:
+            for _, title in pages:
+                batch.append(json.dumps({"title": title, "source": current_category}, ensure_ascii=False))
+                if len(batch) >= JSON_BATCH:
+                    yield separator + ", ".join(batch)
+                    separator, count, batch = ", ", count + len(batch), []
+            if batch:  # the category is complete: send its last articles now
+                yield separator + ", ".join(batch)
+                separator, count, batch = ", ", count + len(batch), []
+    except Exception as e:
+        if batch:
+            yield separator + ", ".join(batch)
+            count += len(batch)
+        # the status line is already sent: report the failure in the payload, after the articles written
+        error = {"error": str(e), "complete": False}
+        if isinstance(e, wiki_client.UpstreamThrottled):
+            error["retry_after"] = math.ceil(e.retry_after)
+    yield "]"
+    fields = {"missing_only": True, "count": count, "categories": n_categories, **(error or {})}
+    for name, value in fields.items():
+        yield f", {json.dumps(name)}: {json.dumps(value, ensure_ascii=False)}"
+    yield "}"
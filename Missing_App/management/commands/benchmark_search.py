@@ -0,0 +1,226 @@
+"""
+Management command: benchmark the search endpoints on recorded (or live) Wikimedia traffic.
+
+Usage:
+    python manage.py benchmark_search --record bench.json.gz --case he:en:Physics --case ar:en:Chemistry
+    python manage.py benchmark_search --fixture bench.json.gz --latency 0.05
+    python manage.py benchmark_search --fixture bench.json.gz --depths 1 2 --endpoints articles --warm --json
+    python manage.py benchmark_search --fixture bench.json.gz --endpoints articles large  # memory of both modes
+
+A case is edit_lang:refer_lang:category (category in the contribution language). With --record the cases
+are run against live Wikipedia and every response is saved, with the cases, into the fixture; with
+--fixture they are replayed offline (see replay.py), each call delayed by --latency seconds.
+
+For each case, endpoint and depth, the command reports the wall time (median of --repeat cold runs), the
+number of upstream calls and the peak memory allocated (tracemalloc, measured in a separate run). Every run
+starts cold: a private in-memory cache, the category store off and the in-process indexes cleared. Replayed
+calls are not paced by the per-host rate limiter; recorded (live) ones are.
+"""
+import json
+import statistics
+import time
+import tracemalloc
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from Missing_App import category_index, replay, siteinfo, wiki_client
+from Missing_App.search import SearchError, get_backend
+
+ENDPOINTS = ("articles", "stream", "matrix", "large")
+DEFAULT_ENDPOINTS = ("articles", "stream", "matrix")
+
+BENCHMARK_SETTINGS = {
+    "CACHES": {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                           "LOCATION": "benchmark_search"}},
+    "CATEGORY_STORE_ENABLED": False,
+    "LANGUAGE_CATALOG_REFRESH_INTERVAL": 0,  # the bundled catalog, no sitematrix call during the runs
+}
+REPLAY_SETTINGS = {
+    "WIKI_HTTP_RATE": 0,  # replays are not paced: the figures measure the pipeline, not the rate limit
+}
+
+
+def parse_case(value):
+    """
+    :param value: 'edit_lang:refer_lang:category'
+    :return: Dict with edit_lang, refer_lang and category
+    """
+    parts = value.split(":", 2)
+    if len(parts) != 3 or not all(parts):
+        raise CommandError(f"Invalid case {value!r}: expected edit_lang:refer_lang:category")
+    return {"edit_lang": parts[0], "refer_lang": parts[1], "category": parts[2]}
+
+
+def reset_caches(backend):
+    """
+    Start a cold run: empty the (private) cache and the in-process indexes.
+
+    :param backend: Search backend name (the dump backend installs its own namespace tables)
+    """
+    cache.clear()
+    category_index.clear()
+    if get_backend(backend).name == "api":
+        siteinfo.clear()
+
+
+class Command(BaseCommand):
+    help = "Measure wall time, upstream calls and peak memory of the search endpoints for several depths."
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument("--fixture", help="Replay this fixture file (.json or .json.gz)")
+        source.add_argument("--record", help="Run against live Wikipedia and record the responses into this file")
+        parser.add_argument("--case", action="append", default=[], dest="cases",
+                            help="edit_lang:refer_lang:category (repeatable; default: the cases of the fixture)")
+        parser.add_argument("--depths", nargs="+", type=int, default=[1, 2, 3, 4], help="Depths to measure")
+        parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(DEFAULT_ENDPOINTS),
+                            help="Endpoints to measure (large: the bounded-memory mode of articles)")
+        parser.add_argument("--latency", type=float, default=0.0,
+                            help="Seconds added to every replayed call (simulated network and server time)")
+        parser.add_argument("--repeat", type=int, default=3, help="Timed cold runs per measurement")
+        parser.add_argument("--max-members", type=int, default=0, help="max_members passed to the endpoints")
+        parser.add_argument("--backend", help="Search backend (default: SEARCH_BACKEND)")
+        parser.add_argument("--warm", action="store_true", help="Also measure a run with warm caches")
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        try:
+            get_backend(options["backend"])
+        except SearchError as e:
+            raise CommandError(e.payload["error"])
+
+        if options["record"]:
+            fixture = replay.Fixture(meta={"cases": []})
+            adapter = replay.RecordingAdapter(fixture)
+        else:
+            try:
+                fixture = replay.Fixture.load(options["fixture"])
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot load {options['fixture']}: {e}")
+            adapter = replay.ReplayAdapter(fixture, latency=options["latency"])
+
+        cases = [parse_case(value) for value in options["cases"]] or fixture.meta.get("cases", [])
+        if not cases:
+            raise CommandError("No case to run: give --case")
+
+        overrides = BENCHMARK_SETTINGS if options["record"] else {**BENCHMARK_SETTINGS, **REPLAY_SETTINGS}
+        wiki_client.reset_session()  # per-host limiters are rebuilt with the overridden settings
+        with override_settings(**overrides), replay.use_adapter(adapter):
+            results = []
+            for case in cases:
+                results.extend(self.run_case(case, adapter, options))
+
+        if options["record"]:
+            fixture.meta["cases"] = cases
+            fixture.save(options["record"])
+            self.stderr.write(f"Recorded {len(fixture)} responses into {options['record']}")
+        if getattr(adapter, "misses", None):
+            self.stderr.write(self.style.WARNING(
+                f"{len(adapter.misses)} calls were not in the fixture, e.g. {adapter.misses[0]}"))
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, ensure_ascii=False, indent=1))
+        else:
+            self.write_table(results)
+
+    def run_case(self, case, adapter, options):
+        """
+        Measure every endpoint and depth of one case.
+
+        :return: List of result rows
+        """
+        backend = options["backend"]
+        client = Client()
+        reset_caches(backend)
+        try:
+            refer_category = get_backend(backend).resolve_reference_category(
+                case["edit_lang"], case["category"], case["refer_lang"])
+        except SearchError as e:
+            raise CommandError(f"Cannot resolve {case}: {e.payload}")
+
+        rows = []
+        for endpoint in options["endpoints"]:
+            url, extra_params = self.endpoint_url(endpoint, case, refer_category)
+            for depth in options["depths"]:
+                params = {**extra_params, "max_depth": depth}
+                if options["max_members"]:
+                    params["max_members"] = options["max_members"]
+                if backend:
+                    params["backend"] = backend
+                full_url = f"{url}?{urlencode(params)}"
+
+                timings = []
+                for _ in range(max(options["repeat"], 1)):
+                    reset_caches(backend)
+                    adapter.reset()
+                    status, items, elapsed = self.fetch(client, full_url, endpoint)
+                    timings.append(elapsed)
+                calls = adapter.calls
+
+                reset_caches(backend)
+                tracemalloc.start()
+                self.fetch(client, full_url, endpoint)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                row = {**case, "endpoint": endpoint, "depth": depth, "status": status, "items": items,
+                       "wall_ms": round(statistics.median(timings) * 1000, 1), "calls": calls,
+                       "peak_kib": round(peak / 1024)}
+                if options["warm"]:
+                    adapter.reset()
+                    row["warm_ms"] = round(self.fetch(client, full_url, endpoint)[2] * 1000, 1)
+                    row["warm_calls"] = adapter.calls
+                rows.append(row)
+                if not options["json"]:
+                    self.stderr.write(f"{case['edit_lang']}:{case['category']} {endpoint} depth {depth}: "
+                                      f"{row['wall_ms']} ms, {calls} calls")
+        return rows
+
+    @staticmethod
+    def endpoint_url(endpoint, case, refer_category):
+        """
+        :return: (path, query parameters) of an endpoint for a case
+        """
+        if endpoint == "matrix":
+            return reverse("get_missing_matrix", args=[case["refer_lang"], refer_category]), \
+                {"targets": case["edit_lang"]}
+        params = {"stream": "ndjson"} if endpoint == "stream" else {"large": 1} if endpoint == "large" else {}
+        return reverse("get_articles_from_other_languages",
+                       args=[case["edit_lang"], case["category"], case["refer_lang"]]), params
+
+    @staticmethod
+    def fetch(client, url, endpoint):
+        """
+        Request an endpoint and read its whole response.
+
+        :return: (HTTP status, number of articles returned, seconds elapsed)
+        """
+        start = time.perf_counter()
+        response = client.get(url)
+        if endpoint == "stream":
+            lines = b"".join(response.streaming_content).splitlines()
+            elapsed = time.perf_counter() - start
+            items = sum(1 for line in lines if json.loads(line).get("event") == "article")
+        elif response.streaming:  # large mode: JSON written piece by piece
+            data = json.loads(b"".join(response.streaming_content))
+            elapsed = time.perf_counter() - start
+            items = len(data.get("articles", []))
+        else:
+            data = response.json()
+            elapsed = time.perf_counter() - start
+            items = len(data.get("articles", [])) if isinstance(data, dict) else len(data)
+        return response.status_code, items, elapsed
+
+    def write_table(self, results):
+        columns = ["edit_lang", "refer_lang", "category", "endpoint", "depth", "status", "items", "wall_ms",
+                   "calls", "peak_kib", "warm_ms", "warm_calls"]
+        columns = [c for c in columns if any(c in row for row in results)]
+        table = [columns] + [[str(row.get(c, "")) for c in columns] for row in results]
+        widths = [max(len(line[i]) for line in table) for i in range(len(columns))]
+        for line in table:
+            self.stdout.write("  ".join(value.ljust(width) for value, width in zip(line, widths)))
@@ -0,0 +1,50 @@
+"""
+Management command: build the offline search stores from MediaWiki SQL dumps.
+
+Usage:
+    python manage.py ingest_dumps en he --dir /data/dumps
+    python manage.py ingest_dumps en --dir /data/dumps --target-langs he ar   # keep only these langlinks
+    python manage.py ingest_dumps en --page enwiki-latest-page.sql.gz --categorylinks ... --langlinks ...
+
+The files of each language are found in --dir by their Wikimedia names
+(<dbname>-<date>-page.sql.gz, -categorylinks.sql.gz, -langlinks.sql.gz, -linktarget.sql.gz,
+-siteinfo-namespaces.json.gz). Searches use the stores with ?backend=dump or SEARCH_BACKEND = "dump".
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from Missing_App import dump_store
+
+
+class Command(BaseCommand):
+    help = "Load page, categorylinks and langlinks dumps into the offline search stores (one per language)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("langs", nargs="+", help="Wikipedia language codes to ingest")
+        parser.add_argument("--dir", help="Directory holding the downloaded dump files")
+        parser.add_argument("--target-langs", nargs="*",
+                            help="Only keep the interlanguage links to these languages (smaller stores)")
+        parser.add_argument("--namespaces", nargs="*", type=int,
+                            help="Namespaces of the pages to keep (default: DUMP_NAMESPACES)")
+        for kind in dump_store.DUMP_FILES:
+            parser.add_argument(f"--{kind}", dest=kind.replace("-", "_"),
+                                help=f"Path of the {kind} dump (single language only)")
+
+    def handle(self, *args, **options):
+        explicit = {kind: options[kind.replace("-", "_")] for kind in dump_store.DUMP_FILES
+                    if options[kind.replace("-", "_")]}
+        if explicit and len(options["langs"]) > 1:
+            raise CommandError("Explicit dump paths can only be given for one language; use --dir instead")
+        if not explicit and not options["dir"]:
+            raise CommandError("Give --dir or the paths of the dump files")
+
+        for lang in options["langs"]:
+            files = dump_store.find_dump_files(options["dir"], lang) if options["dir"] else {}
+            files.update(explicit)
+            try:
+                stats = dump_store.ingest_wiki(lang, files, target_langs=options["target_langs"],
+                                               namespaces=options["namespaces"], log=self.stdout.write)
+            except (ValueError, OSError) as e:
+                raise CommandError(f"Failed to ingest {lang}: {e}")
+            self.stdout.write(self.style.SUCCESS(
+                f"{lang}: {stats['page']} pages, {stats['categorylinks']} category links, "
+                f"{stats['langlinks']} interlanguage links"))
@@ -0,0 +1,87 @@
+"""
+Management command: warm the caches for the searches people run most often.
+
+Usage:
+    python manage.py prefetch_searches                      # PREFETCH_TOP_N searches, PREFETCH_REQUEST_BUDGET calls
+    python manage.py prefetch_searches --top 20 --budget 500 --days 7
+    python manage.py prefetch_searches --dry-run            # list what would be warmed
+
+The popular searches come from the search history (SearchLog, see search_log.py) of the last --days days,
+most asked first. Each one is computed through the result cache (result_cache.warm), which also fills the
+Wikidata, namespace and category graph caches, unless its cached result is still fresh for --min-fresh
+seconds. Wikimedia calls are limited to --budget per run: a search whose history shows it needs more calls
+than are left is skipped, and the run stops when the budget is spent or when Wikimedia throttles us.
+History older than SEARCH_LOG_RETENTION_DAYS, and category graph rows older than CATEGORY_STORE_TTL, are deleted.
+
+Run it from cron (e.g. every morning, and after each deploy) with the same settings as the web workers, so
+that it fills the cache they share.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from Missing_App import graph_store, metrics, result_cache, search_log, wiki_client
+from Missing_App.search import SearchError
+
+
+class Command(BaseCommand):
+    help = "Pre-compute the most popular searches of the search history, within a Wikimedia request budget."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=getattr(settings, "PREFETCH_TOP_N", 50),
+                            help="Number of popular searches to warm")
+        parser.add_argument("--budget", type=int, default=getattr(settings, "PREFETCH_REQUEST_BUDGET", 2000),
+                            help="Maximum number of Wikimedia calls for the whole run")
+        parser.add_argument("--days", type=int, default=getattr(settings, "PREFETCH_WINDOW_DAYS", 14),
+                            help="Days of search history considered")
+        parser.add_argument("--min-fresh", type=int, default=0,
+                            help="Recompute cached results fresh for less than this many seconds")
+        parser.add_argument("--dry-run", action="store_true", help="Only list the searches that would be warmed")
+
+    def handle(self, *args, **options):
+        pruned = search_log.prune()
+        if pruned:
+            self.stdout.write(f"Deleted {pruned} old search log entries")
+        pruned = graph_store.prune()
+        if pruned:
+            self.stdout.write(f"Deleted {pruned} expired category store rows")
+
+        budget = options["budget"]
+        warmed = kept = skipped = 0
+        for entry in search_log.popular_searches(options["top"], options["days"]):
+            search_args = [entry["edit_lang"], entry["category"], entry["refer_lang"], entry["max_depth"],
+                           entry["max_members"], entry["backend"] or None]
+            label = f"{entry['edit_lang']}:{entry['category']} <- {entry['refer_lang']} depth {entry['max_depth']}"
+            if entry["calls"] > budget:
+                skipped += 1
+                self.stdout.write(f"skip {label}: needs about {entry['calls']} calls, {budget} left")
+                continue
+            if options["dry_run"]:
+                self.stdout.write(f"{label}: {entry['searches']} searches, up to {entry['calls']} calls")
+                continue
+
+            try:
+                with metrics.collect_timings() as timings:
+                    computed = result_cache.warm(*search_args, min_fresh=options["min_fresh"])
+            except SearchError as e:
+                self.stdout.write(f"skip {label}: {e.payload}")
+                skipped += 1
+                continue
+            except wiki_client.UpstreamThrottled as e:
+                self.stderr.write(self.style.WARNING(f"Throttled by Wikimedia (retry after {e.retry_after:.0f} s), "
+                                                     f"stopping"))
+                break
+
+            calls = timings.upstream_calls()
+            budget -= calls
+            if computed:
+                warmed += 1
+                self.stdout.write(f"warmed {label}: {calls} calls")
+            else:
+                kept += 1
+            if budget <= 0:
+                self.stdout.write("Request budget spent")
+                break
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Prefetch done: {warmed} warmed, {kept} already fresh, {skipped} skipped, "
+            f"{options['budget'] - budget} calls"))
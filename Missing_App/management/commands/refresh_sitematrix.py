@@ -0,0 +1,45 @@
+"""
+Management command: refresh the Wikipedia language catalog from the live sitematrix.
+
+Usage:
+    python manage.py refresh_sitematrix            # update the cache and rewrite data/sitematrix.json
+    python manage.py refresh_sitematrix --no-write # only update the shared cache
+    python manage.py refresh_sitematrix --input sitematrix.json  # from a saved action=sitematrix response
+"""
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Missing_App import languages
+
+
+class Command(BaseCommand):
+    help = "Fetch the Wikimedia sitematrix and refresh the bundled language catalog snapshot."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=str(languages.SNAPSHOT_PATH),
+                            help="Snapshot file to write (default: the bundled data/sitematrix.json)")
+        parser.add_argument("--input",
+                            help="Saved action=sitematrix&format=json response to build the snapshot from, for "
+                                 "hosts that cannot reach meta.wikimedia.org")
+        parser.add_argument("--no-write", action="store_true",
+                            help="Only refresh the shared cache, do not rewrite the snapshot file")
+
+    def handle(self, *args, **options):
+        try:
+            if options["input"]:
+                with open(options["input"], encoding="utf-8") as response:
+                    data = json.load(response)
+                catalog = languages.LanguageCatalog(languages.parse_sitematrix(data),
+                                                    generated_at=int(os.path.getmtime(options["input"])))
+            else:
+                catalog = languages.fetch_catalog()
+        except Exception as e:
+            raise CommandError(f"Failed to fetch the sitematrix: {e}")
+
+        languages.set_catalog(catalog)
+        if not options["no_write"]:
+            languages.write_snapshot(catalog, options["output"])
+            self.stdout.write(f"Wrote {options['output']}")
+        self.stdout.write(self.style.SUCCESS(f"Language catalog refreshed: {len(catalog.languages)} Wikipedias"))
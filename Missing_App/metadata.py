@@ -0,0 +1,209 @@
+"""
+Batched article metadata harvester for ranking
+
+Gathers the ranking features of many articles with multi-title API queries instead of several calls per
+article from the browser. Each batch of up to 50 titles is one `action=query` with
+prop=info|langlinks|templates|pageviews|contributors|linkshere|links|revisions, and the batches run with
+bounded concurrency on the shared worker pool.
+
+Features per title (names match the ones used by category-submission.js):
+- views: page views over the last 30 days
+- langlinks: number of languages that have the article
+- editors: number of distinct contributors (registered + anonymous)
+- templates: number of templates used
+- in_links_Count / out_links_count: pages linking to / linked from the article
+- size: page length in bytes
+- secs_since_last_edit: seconds since the latest revision
+
+The list-valued props share their limits across the titles of a query, and the API walks the pages in page id
+order, so a batch that runs out of its METADATA_MAX_CONTINUATIONS requests has not counted its last pages. The
+continuation tells which pages are still open: they are counted again with one query per title (with its own
+budget). Only a page too large for its own budget keeps lower-bound counts; it is flagged incomplete, and the
+ranking leaves it out of normalization.
+
+"""
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+from . import wiki_client
+from .workers import parallel_map
+
+TITLES_PER_BATCH = 50  # maximum number of titles per query for non-bot clients
+DEFAULT_MAX_CONTINUATIONS = 10
+PAGEVIEW_DAYS = 30
+
+# (feature name, list key in the page object, continuation parameter) of the props counted across continuations
+COUNTED_PROPS = (
+    ("langlinks", "langlinks", "llcontinue"),
+    ("templates", "templates", "tlcontinue"),
+    ("editors", "contributors", "pccontinue"),
+    ("in_links_Count", "linkshere", "lhcontinue"),
+    ("out_links_count", "links", "plcontinue"),
+)
+COUNT_PARAMS = {
+    "lllimit": "max",
+    "tllimit": "max",
+    "pclimit": "max",
+    "lhlimit": "max",
+    "lhprop": "pageid",
+    "pllimit": "max",
+}
+
+
+def _empty_features(title):
+    return {
+        "title": title,
+        "exists": True,
+        "views": 0,
+        "langlinks": 0,
+        "editors": 0,
+        "templates": 0,
+        "in_links_Count": 0,
+        "out_links_count": 0,
+        "size": 0,
+        "secs_since_last_edit": 0,
+        "incomplete": False,  # counts are lower bounds (page too large for the continuation budget)
+    }
+
+
+def _seconds_since(timestamp):
+    """
+    :param timestamp: MediaWiki ISO 8601 timestamp (e.g. '2024-05-01T12:00:00Z')
+    :return: Seconds elapsed since that time
+    """
+    then = datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+    return int((datetime.now(timezone.utc) - then).total_seconds())
+
+
+def _max_requests():
+    return getattr(settings, "METADATA_MAX_CONTINUATIONS", DEFAULT_MAX_CONTINUATIONS)
+
+
+def _open_from(continuation):
+    """
+    :param continuation: 'continue' object of a response (None when the query is finished)
+    :return: Smallest page id whose list props are not fully counted yet, or None if they all are
+    """
+    open_pageids = [int(str(continuation[param]).split("|", 1)[0])
+                    for _, _, param in COUNTED_PROPS if param in (continuation or {})]
+    return min(open_pageids) if open_pageids else None
+
+
+def _count(entry, page, anon_editors):
+    for feature, key, _ in COUNTED_PROPS:
+        entry[feature] += len(page.get(key, []))
+    if "anoncontributors" in page:
+        anon_editors[page["title"]] = page["anoncontributors"]
+
+
+def count_page_lists(lang, title):
+    """
+    Count the list props of one page, with a query of its own (the limits are not shared with other titles).
+
+    :param lang: Wikipedia language code
+    :param title: Page title, as reported by the API
+    :return: Dict with the counted features and incomplete (True if the budget ran out before the end)
+    """
+    params = {
+        "action": "query",
+        "titles": title,
+        "prop": "|".join(key for _, key, _ in COUNTED_PROPS),
+        **COUNT_PARAMS,
+        "format": "json",
+    }
+    counts = {feature: 0 for feature, _, _ in COUNTED_PROPS}
+    anon_editors = {}
+    continuation = None
+    for requests_made, data in enumerate(wiki_client.api_continue(lang, params), start=1):
+        for page in data.get("query", {}).get("pages", {}).values():
+            _count(counts, page, anon_editors)
+        continuation = data.get("continue")
+        if requests_made >= _max_requests():
+            break
+    counts["editors"] += sum(anon_editors.values())
+    counts["incomplete"] = _open_from(continuation) is not None
+    return counts
+
+
+def harvest_batch(lang, titles):
+    """
+    Gather the ranking features of up to 50 titles with one multi-title query (plus continuations).
+    Pages the query could not count to the end are counted again one by one (see count_page_lists).
+https://en.wikipedia.org/w/api.php?action=query&titles=Earth|Moon&prop=info|langlinks|templates|pageviews|contributors|linkshere|links|revisions&rvprop=timestamp&format=json
+    :param lang: Wikipedia language code
+    :param titles: List of at most TITLES_PER_BATCH titles
+    :return: Dict title -> features
+    """
+    params = {
+        "action": "query",
+        "titles": "|".join(titles),
+        "prop": "info|langlinks|templates|pageviews|contributors|linkshere|links|revisions",
+        **COUNT_PARAMS,
+        "pvipdays": PAGEVIEW_DAYS,
+        "rvprop": "timestamp",
+        "redirects": 1,
+        "format": "json",
+    }
+
+    features = {}  # title reported by the API -> features
+    pageids = {}  # title reported by the API -> page id
+    anon_editors = {}  # title -> anonymous contributors (reported again with every contributors chunk)
+    aliases = {}  # requested title -> title reported by the API (normalization, redirects)
+    continuation = None
+    for requests_made, data in enumerate(wiki_client.api_continue(lang, params), start=1):
+        query = data.get("query", {})
+        for mapping in query.get("normalized", []) + query.get("redirects", []):
+            aliases[mapping["from"]] = mapping["to"]
+
+        for page in query.get("pages", {}).values():
+            entry = features.setdefault(page["title"], _empty_features(page["title"]))
+            if "missing" in page or "invalid" in page:
+                entry["exists"] = False
+                continue
+            pageids[page["title"]] = page.get("pageid")
+            entry["size"] = page.get("length", entry["size"])
+            _count(entry, page, anon_editors)
+            if page.get("pageviews"):
+                entry["views"] = sum(views or 0 for views in page["pageviews"].values())
+            if page.get("revisions"):
+                entry["secs_since_last_edit"] = _seconds_since(page["revisions"][0]["timestamp"])
+
+        continuation = data.get("continue")
+        if requests_made >= _max_requests():
+            break
+
+    for title, count in anon_editors.items():
+        features[title]["editors"] += count
+
+    # Pages at or after the continuation point were not (fully) counted: count them on their own
+    open_from = _open_from(continuation)
+    if open_from is not None:
+        recount = [title for title, pageid in pageids.items() if pageid is not None and pageid >= open_from]
+        for title, counts in zip(recount, parallel_map(lambda title: count_page_lists(lang, title), recount)):
+            features[title].update(counts)
+
+    result = {}
+    for title in titles:
+        resolved = aliases.get(title, title)
+        resolved = aliases.get(resolved, resolved)  # normalized, then redirected
+        entry = dict(features.get(resolved) or _empty_features(resolved))
+        entry["title"] = title
+        result[title] = entry
+    return result
+
+
+def harvest_metadata(lang, titles):
+    """
+    Gather the ranking features of any number of titles, in parallel batches of 50.
+
+    :param lang: Wikipedia language code
+    :param titles: List of article titles
+    :return: List of feature dicts, in the order of titles (duplicates removed)
+    """
+    titles = list(dict.fromkeys(titles))
+    batches = [titles[i:i + TITLES_PER_BATCH] for i in range(0, len(titles), TITLES_PER_BATCH)]
+    features = {}
+    for batch_features in parallel_map(lambda batch: harvest_batch(lang, batch), batches):
+        features.update(batch_features)
+    return [features[title] for title in titles]
@@ -0,0 +1,417 @@
+"""
+Instrumentation of requests, upstream calls, search phases and cache lookups
+
+Two outputs:
+- a Server-Timing header on every response (MetricsMiddleware, SERVER_TIMING_ENABLED): time and number of
+  calls per Wikimedia API module (api.query.categorymembers, api.wbgetentities, ...), time of the search
+  phases (resolve, traversal, members) and hits / misses per cache, for this request only
+- Prometheus metrics (text exposition format) served by the metrics view (/metrics, METRICS_ENABLED):
+  request latency histograms per view, upstream call latency histograms and counts per host and API module,
+  search phase histograms, cache lookups per cache and result with their hit ratio, requests in flight
+
+The phase timings of a request live in a contextvar: the threads working for the request (worker pool
+fan-out, live search thread) run in a copy of its context, so their calls are accounted to it.
+A streamed response carries the timings of what happened before its first byte.
+Metrics are kept per process: with several worker processes, each one exposes its own.
+
+Usage:
+    with metrics.phase("traversal"):
+        ...
+    metrics.record_cache("wikidata", "hit")
+
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlparse
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+CACHE_HIT_RESULTS = ("hit", "stale")  # results served from a cache
+
+_registry = []
+_current = ContextVar("request_timings", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values -> value
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def samples(self):
+        """
+        :return: Generator of exposition lines of the samples
+        """
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{self._labels(key)} {_format_number(value)}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """
+    Monotonic counter (Prometheus counter).
+    """
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        """
+        :return: Dict label values -> count
+        """
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge(_Metric):
+    """
+    Value going up and down (Prometheus gauge). With function, the value is read when the metrics are rendered.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        if self.function is not None:
+            for key, value in self.function().items():
+                self.set(value, **dict(zip(self.labelnames, key)))
+        return super().samples()
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values in cumulative buckets (Prometheus histogram).
+    """
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, {**state, "buckets": list(state["buckets"])})
+                            for key, state in self._values.items())
+        for key, state in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["buckets"]):
+                cumulative += count
+                yield f"{self.name}_bucket{self._labels(key, [('le', _format_number(bound))])} {cumulative}"
+            yield f"{self.name}_sum{self._labels(key)} {_format_number(state['sum'])}"
+            yield f"{self.name}_count{self._labels(key)} {state['count']}"
+
+
+def _cache_hit_ratios():
+    totals = {}
+    for (name, result), count in CACHE_LOOKUPS.values().items():
+        hits, total = totals.get(name, (0, 0))
+        totals[name] = (hits + (count if result in CACHE_HIT_RESULTS else 0), total + count)
+    return {(name,): hits / total for name, (hits, total) in totals.items() if total}
+
+
+HTTP_SECONDS = Histogram("missing_http_request_duration_seconds", "Time to answer a request, per view",
+                         ["view"])
+HTTP_REQUESTS = Counter("missing_http_requests_total", "Requests answered, per view and status", ["view", "status"])
+HTTP_IN_FLIGHT = Gauge("missing_http_requests_in_flight", "Requests being answered")
+UPSTREAM_SECONDS = Histogram("missing_upstream_request_duration_seconds",
+                             "Duration of the calls to Wikimedia, per host and API module", ["host", "module"])
+UPSTREAM_CALLS = Counter("missing_upstream_requests_total",
+                         "Calls to Wikimedia, per host, API module and status", ["host", "module", "status"])
+UPSTREAM_IN_FLIGHT = Gauge("missing_upstream_requests_in_flight", "Calls to Wikimedia being sent, per host",
+                           ["host"])
+PHASE_SECONDS = Histogram("missing_search_phase_duration_seconds", "Duration of the search phases", ["phase"])
+CACHE_LOOKUPS = Counter("missing_cache_lookups_total", "Cache lookups, per cache and result (hit, stale, miss)",
+                        ["cache", "result"])
+CACHE_HIT_RATIO = Gauge("missing_cache_hit_ratio", "Share of the lookups served from the cache since start",
+                        ["cache"], function=_cache_hit_ratios)
+
+
+def render():
+    """
+    :return: Every metric in the Prometheus text exposition format
+    """
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+class RequestTimings:
+    """
+    Phase timings and cache lookups of one request (thread-safe: worker threads add to it).
+    """
+
+    def __init__(self):
+        self.phases = {}  # name -> [seconds, count]
+        self.caches = {}  # name -> {result: count}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, count=1):
+        with self._lock:
+            phase = self.phases.setdefault(name, [0.0, 0])
+            phase[0] += seconds
+            phase[1] += count
+
+    def add_cache(self, name, result):
+        with self._lock:
+            results = self.caches.setdefault(name, {})
+            results[result] = results.get(result, 0) + 1
+
+    def header(self, total=None):
+        """
+        :param total: (Optional) seconds spent on the whole request
+        :return: Server-Timing header value
+        """
+        with self._lock:
+            entries = []
+            for name, (seconds, count) in self.phases.items():
+                entry = f"{name};dur={seconds * 1000:.1f}"
+                if name.startswith("api."):
+                    entry += f';desc="{count} call{"s" if count > 1 else ""}"'
+                elif count > 1:
+                    entry += f';desc="{count} times"'
+                entries.append(entry)
+            for name, results in self.caches.items():
+                desc = ", ".join(f"{count} {result}" for result, count in sorted(results.items()))
+                entries.append(f'cache.{name};desc="{desc}"')
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+    def upstream_calls(self):
+        """
+        :return: Number of calls made to Wikimedia so far
+        """
+        with self._lock:
+            return sum(count for name, (_, count) in self.phases.items() if name.startswith("api."))
+
+
+@contextmanager
+def collect_timings():
+    """
+    Context manager collecting timings, like for a request, around code run outside of one (background job,
+    management command). Threads started with a copy of the context add to the same timings.
+
+    :return: RequestTimings
+    """
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def current_timings():
+    """
+    :return: RequestTimings of the request being answered, or None outside of a request
+    """
+    return _current.get()
+
+
+@contextmanager
+def phase(name):
+    """
+    Context manager timing a search phase (for the request and the phase histogram).
+
+    :param name: Phase name (e.g. 'traversal')
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        PHASE_SECONDS.observe(elapsed, phase=name)
+        timings = _current.get()
+        if timings is not None:
+            timings.add(name, elapsed)
+
+
+def timed_iter(name, iterable):
+    """
+    Time a phase that produces its results lazily: only the time spent computing the items counts,
+    not the time the consumer spends between them.
+
+    :param name: Phase name (e.g. 'members')
+    :param iterable: Iterable to time
+    :return: Generator of the items of iterable
+    """
+    iterator = iter(iterable)
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        PHASE_SECONDS.observe(elapsed, phase=name)
+        timings = _current.get()
+        if timings is not None:
+            timings.add(name, elapsed)
+
+
+def record_cache(name, result):
+    """
+    Count a cache lookup.
+
+    :param name: Cache name (e.g. 'wikidata')
+    :param result: 'hit', 'stale' (served, but expired) or 'miss'
+    """
+    CACHE_LOOKUPS.inc(cache=name, result=result)
+    timings = _current.get()
+    if timings is not None:
+        timings.add_cache(name, result)
+
+
+def api_module(params):
+    """
+    :param params: Action API parameters
+    :return: API module of a call, e.g. 'wbgetentities', 'query.categorymembers' or
+             'query.categorymembers+langlinks' (generator and prop modules joined)
+    """
+    params = params or {}
+    action = params.get("action") or "other"
+    if action != "query":
+        return action
+    submodules = []
+    for name in ("list", "meta", "generator", "prop"):
+        if params.get(name):
+            submodules.extend(str(params[name]).split("|"))
+    return "query." + "+".join(submodules) if submodules else "query"
+
+
+@contextmanager
+def upstream_call(url, params):
+    """
+    Context manager accounting one call to Wikimedia: the caller sets call["status"] from the response.
+
+    :param url: URL of the call
+    :param params: Query parameters of the call
+    :return: Dict receiving the status of the call ('error' when no response is received)
+    """
+    host = urlparse(url).netloc
+    module = api_module(params)
+    call = {"status": "error"}
+    UPSTREAM_IN_FLIGHT.inc(host=host)
+    start = time.perf_counter()
+    try:
+        yield call
+    finally:
+        elapsed = time.perf_counter() - start
+        UPSTREAM_IN_FLIGHT.dec(host=host)
+        UPSTREAM_SECONDS.observe(elapsed, host=host, module=module)
+        UPSTREAM_CALLS.inc(host=host, module=module, status=call["status"])
+        timings = _current.get()
+        if timings is not None:
+            timings.add("api." + module, elapsed)
+
+
+def _observe_stream(content, finish):
+    try:
+        yield from content
+    finally:
+        finish()
+
+
+class MetricsMiddleware:
+    """
+    Times every request, counts it per view and status, and adds the Server-Timing header.
+    Streamed responses are counted when their last byte is sent (or the client disconnects).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            HTTP_IN_FLIGHT.dec()
+            raise
+        finally:
+            _current.reset(token)
+
+        match = getattr(request, "resolver_match", None)
+        view = match.url_name if match and match.url_name else "unmatched"
+        if getattr(settings, "SERVER_TIMING_ENABLED", True):
+            response["Server-Timing"] = timings.header(total=time.perf_counter() - start)
+
+        def finish():
+            HTTP_IN_FLIGHT.dec()
+            HTTP_SECONDS.observe(time.perf_counter() - start, view=view)
+            HTTP_REQUESTS.inc(view=view, status=response.status_code)
+
+        if response.streaming:
+            response.streaming_content = _observe_stream(response.streaming_content, finish)
+        else:
+            finish()
+        return response
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryListing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lang', models.CharField(max_length=32)),
+                ('title', models.CharField(max_length=255)),
+                ('kind', models.CharField(choices=[('subcat', 'Subcategories'), ('page', 'Pages')], max_length=8)),
+                ('target_lang', models.CharField(blank=True, default='', max_length=32)),
+                ('fetched_at', models.DateTimeField()),
+                ('complete', models.BooleanField(default=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fetched_at'], name='Missing_App_fetched_cea82a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('lang', 'title', 'kind', 'target_lang'), name='unique_category_listing')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CategoryEdge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='edges', to='Missing_App.categorylisting')),
+            ],
+            options={
+                'ordering': ['listing', 'position'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CategoryMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('pageid', models.BigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('has_langlink', models.BooleanField()),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='Missing_App.categorylisting')),
+            ],
+            options={
+                'ordering': ['listing', 'position'],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:53
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Missing_App', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('edit_lang', models.CharField(max_length=32)),
+                ('category', models.CharField(max_length=255)),
+                ('refer_lang', models.CharField(max_length=32)),
+                ('max_depth', models.PositiveIntegerField(default=1)),
+                ('max_members', models.PositiveIntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=8)),
+                ('done', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.JSONField(blank=True, null=True)),
+                ('error_status', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='Missing_App_status_42ca39_idx')],
+            },
+        ),
+    ]
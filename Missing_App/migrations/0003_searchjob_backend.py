@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Missing_App', '0002_searchjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchjob',
+            name='backend',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:15
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Missing_App', '0003_searchjob_backend'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearch',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(blank=True, default='', max_length=255)),
+                ('edit_lang', models.CharField(max_length=32)),
+                ('category', models.CharField(max_length=255)),
+                ('refer_lang', models.CharField(max_length=32)),
+                ('refer_category', models.CharField(max_length=255)),
+                ('max_depth', models.PositiveIntegerField(default=1)),
+                ('categories', models.JSONField(default=dict)),
+                ('articles', models.JSONField(default=list)),
+                ('last_delta', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
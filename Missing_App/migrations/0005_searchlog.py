@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Missing_App', '0004_savedsearch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('edit_lang', models.CharField(max_length=32)),
+                ('category', models.CharField(max_length=255)),
+                ('refer_lang', models.CharField(max_length=32)),
+                ('max_depth', models.PositiveIntegerField(default=1)),
+                ('max_members', models.PositiveIntegerField(blank=True, null=True)),
+                ('backend', models.CharField(blank=True, default='', max_length=16)),
+                ('mode', models.CharField(choices=[('json', 'JSON'), ('stream', 'Streamed'), ('job', 'Background job')], default='json', max_length=8)),
+                ('status', models.PositiveIntegerField()),
+                ('latency_ms', models.PositiveIntegerField()),
+                ('calls', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='Missing_App_created_2c668e_idx')],
+            },
+        ),
+    ]
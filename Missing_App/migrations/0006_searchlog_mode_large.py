@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Missing_App', '0005_searchlog'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='searchlog',
+            name='mode',
+            field=models.CharField(choices=[('json', 'JSON'), ('stream', 'Streamed'), ('job', 'Background job'), ('large', 'Large category mode')], default='json', max_length=8),
+        ),
+    ]
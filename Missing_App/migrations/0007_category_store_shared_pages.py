@@ -0,0 +1,54 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:36
+
+from django.db import migrations, models
+
+
+def drop_page_listings(apps, schema_editor):
+    # page listings were stored once per target language; they are a cache, fetched again on the next search
+    apps.get_model("Missing_App", "CategoryListing").objects.filter(kind="page").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Missing_App', '0006_searchlog_mode_large'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_page_listings, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='PageLanglink',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lang', models.CharField(max_length=32)),
+                ('pageid', models.BigIntegerField()),
+                ('target_lang', models.CharField(max_length=32)),
+                ('has_langlink', models.BooleanField()),
+                ('checked_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RemoveConstraint(
+            model_name='categorylisting',
+            name='unique_category_listing',
+        ),
+        migrations.RemoveField(
+            model_name='categorylisting',
+            name='target_lang',
+        ),
+        migrations.RemoveField(
+            model_name='categorymember',
+            name='has_langlink',
+        ),
+        migrations.AddConstraint(
+            model_name='categorylisting',
+            constraint=models.UniqueConstraint(fields=('lang', 'title', 'kind'), name='unique_category_listing'),
+        ),
+        migrations.AddIndex(
+            model_name='pagelanglink',
+            index=models.Index(fields=['checked_at'], name='Missing_App_checked_ddeae4_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='pagelanglink',
+            constraint=models.UniqueConstraint(fields=('lang', 'target_lang', 'pageid'), name='unique_page_langlink'),
+        ),
+    ]
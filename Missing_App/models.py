@@ -1,3 +1,201 @@
+import uuid
+
 from django.db import models
 
-# Create your models here.
+
+class CategoryListing(models.Model):
+    """
+    One fetched listing of a category's members in a given wiki, with its fetch time.
+
+    kind 'subcat' stores the category -> subcategory edges (CategoryEdge).
+    kind 'page' stores the category -> page membership (CategoryMember); whether each page has a langlink
+    to a given language is kept apart, per page (PageLanglink), so the listing is shared by all languages.
+    """
+    KIND_SUBCAT = "subcat"
+    KIND_PAGE = "page"
+    KIND_CHOICES = [(KIND_SUBCAT, "Subcategories"), (KIND_PAGE, "Pages")]
+
+    lang = models.CharField(max_length=32)
+    title = models.CharField(max_length=255)
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    fetched_at = models.DateTimeField()
+    complete = models.BooleanField(default=True)  # False when the listing was cut by a per-category cap
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["lang", "title", "kind"], name="unique_category_listing"),
+        ]
+        indexes = [models.Index(fields=["fetched_at"])]
+
+    def __str__(self):
+        return f"{self.lang}:{self.title} ({self.kind})"
+
+
+class CategoryEdge(models.Model):
+    """
+    A category -> subcategory edge, in the order returned by the API.
+    """
+    listing = models.ForeignKey(CategoryListing, on_delete=models.CASCADE, related_name="edges")
+    position = models.PositiveIntegerField()
+    title = models.CharField(max_length=255)
+
+    class Meta:
+        ordering = ["listing", "position"]
+
+
+class CategoryMember(models.Model):
+    """
+    A category -> page membership, in the order returned by the API.
+    """
+    listing = models.ForeignKey(CategoryListing, on_delete=models.CASCADE, related_name="members")
+    position = models.PositiveIntegerField()
+    pageid = models.BigIntegerField()
+    title = models.CharField(max_length=255)
+
+    class Meta:
+        ordering = ["listing", "position"]
+
+
+class PageLanglink(models.Model):
+    """
+    Whether a page of a wiki has a langlink to a target language, with the time it was checked.
+    """
+    lang = models.CharField(max_length=32)
+    pageid = models.BigIntegerField()
+    target_lang = models.CharField(max_length=32)
+    has_langlink = models.BooleanField()
+    checked_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["lang", "target_lang", "pageid"], name="unique_page_langlink"),
+        ]
+        indexes = [models.Index(fields=["checked_at"])]
+
+
+class SearchJob(models.Model):
+    """
+    A missing-articles search run in the background (see jobs.py), with its progress and result.
+    """
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    edit_lang = models.CharField(max_length=32)
+    category = models.CharField(max_length=255)
+    refer_lang = models.CharField(max_length=32)
+    max_depth = models.PositiveIntegerField(default=1)
+    max_members = models.PositiveIntegerField(null=True, blank=True)
+    backend = models.CharField(max_length=16, blank=True, default="")  # empty: the SEARCH_BACKEND setting
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    done = models.PositiveIntegerField(default=0)  # categories processed
+    total = models.PositiveIntegerField(default=0)  # categories to process (known once the tree is fetched)
+    result = models.JSONField(null=True, blank=True)  # same payload as get_articles_from_other_languages
+    error = models.JSONField(null=True, blank=True)  # error payload, e.g. {"noQCode": "..."}
+    error_status = models.PositiveIntegerField(null=True, blank=True)  # HTTP status of the error payload
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # heartbeat of the worker running the job
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "updated_at"])]
+
+    def __str__(self):
+        return f"{self.edit_lang}:{self.category} <- {self.refer_lang} ({self.status})"
+
+    def to_dict(self):
+        """
+        :return: Status payload of the job (without the result)
+        """
+        return {
+            "job_id": str(self.id),
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class SavedSearch(models.Model):
+    """
+    A missing-articles search saved by an editor, with the state of its last run (see saved_searches.py):
+    the reference-language category tree and the missing articles, refreshed incrementally.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=255, blank=True, default="")
+    edit_lang = models.CharField(max_length=32)
+    category = models.CharField(max_length=255)
+    refer_lang = models.CharField(max_length=32)
+    refer_category = models.CharField(max_length=255)  # full title of the category in refer_lang
+    max_depth = models.PositiveIntegerField(default=1)
+    categories = models.JSONField(default=dict)  # category title -> depth in the tree
+    articles = models.JSONField(default=list)  # missing articles: [pageid, title, source]
+    last_delta = models.JSONField(null=True, blank=True)  # changes found by the last refresh
+    created_at = models.DateTimeField(auto_now_add=True)
+    refreshed_at = models.DateTimeField()  # start of the last run: changes are asked from this time
+
+    def __str__(self):
+        return f"{self.name or self.category} ({self.edit_lang} <- {self.refer_lang})"
+
+    def to_dict(self, with_articles=False):
+        """
+        :param with_articles: Include the missing articles (title, source)
+        :return: Payload describing the saved search
+        """
+        payload = {
+            "id": str(self.id),
+            "name": self.name,
+            "edit_lang": self.edit_lang,
+            "category": self.category,
+            "refer_lang": self.refer_lang,
+            "refer_category": self.refer_category,
+            "max_depth": self.max_depth,
+            "count": len(self.articles),
+            "categories": len(self.categories),
+            "created_at": self.created_at.isoformat(),
+            "refreshed_at": self.refreshed_at.isoformat(),
+        }
+        if with_articles:
+            payload["articles"] = [{"title": title, "source": source} for _, title, source in self.articles]
+        return payload
+
+
+class SearchLog(models.Model):
+    """
+    One missing-articles search asked by a user (see search_log.py): the history the prefetch command uses
+    to warm the caches for the searches people actually run.
+    """
+    MODE_JSON = "json"
+    MODE_STREAM = "stream"
+    MODE_JOB = "job"
+    MODE_LARGE = "large"
+    MODE_CHOICES = [(MODE_JSON, "JSON"), (MODE_STREAM, "Streamed"), (MODE_JOB, "Background job"),
+                    (MODE_LARGE, "Large category mode")]
+
+    edit_lang = models.CharField(max_length=32)
+    category = models.CharField(max_length=255)
+    refer_lang = models.CharField(max_length=32)
+    max_depth = models.PositiveIntegerField(default=1)
+    max_members = models.PositiveIntegerField(null=True, blank=True)
+    backend = models.CharField(max_length=16, blank=True, default="")  # empty: the SEARCH_BACKEND setting
+    mode = models.CharField(max_length=8, choices=MODE_CHOICES, default=MODE_JSON)
+    status = models.PositiveIntegerField()  # HTTP status of the answer
+    latency_ms = models.PositiveIntegerField()  # until the last byte of the answer
+    calls = models.PositiveIntegerField(default=0)  # calls made to Wikimedia to answer it
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["created_at"])]
+
+    def __str__(self):
+        return f"{self.edit_lang}:{self.category} <- {self.refer_lang} ({self.latency_ms} ms)"
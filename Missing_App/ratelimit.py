@@ -0,0 +1,127 @@
+"""
+Adaptive per-host rate limiting for upstream calls
+
+Each Wikimedia host gets a HostLimiter, used by wiki_client for every request:
+- a token bucket caps the request rate (rate requests/second, bursts of up to burst requests)
+- a concurrency window caps the requests in flight, adjusted AIMD-style: +1 per window of successful
+  responses, halved when the host throttles us (HTTP 429 or a maxlag error)
+- while a host asks us to back off (Retry-After), no request is sent to it
+
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class HostLimiter:
+    """
+    Token bucket + AIMD concurrency window for one host.
+
+    :param rate: Requests per second (0: no rate limit)
+    :param burst: Size of the token bucket
+    :param max_concurrency: Largest concurrency window
+    """
+
+    def __init__(self, rate, burst, max_concurrency):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_concurrency = max(max_concurrency, 1)
+        self.concurrency = float(self.max_concurrency)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.throttled = 0  # number of throttling responses received
+        self._condition = threading.Condition()
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        else:
+            self.tokens = self.burst
+        self.updated = now
+
+    def acquire(self):
+        """
+        Wait until a request may be sent: the host is not paused, the window has room and a token is available.
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.paused_until - now
+                if wait <= 0 and self.in_flight < int(self.concurrency):
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self.in_flight += 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                # wait=None: the window is full, a release() will wake us up
+                self._condition.wait(timeout=wait if wait > 0 else None)
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """
+        Context manager holding a request slot (acquire / release).
+        """
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def record_success(self):
+        """
+        Additive increase: the window grows by one after a window's worth of successful responses.
+        """
+        with self._condition:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self._condition.notify_all()
+
+    def record_throttle(self, retry_after):
+        """
+        Multiplicative decrease: halve the window and pause the host for retry_after seconds.
+
+        :param retry_after: Seconds to wait before the next request to this host
+        """
+        with self._condition:
+            self.throttled += 1
+            self.concurrency = max(1.0, self.concurrency / 2)
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def snapshot(self):
+        """
+        :return: Dict with the current window, requests in flight, pause left and throttling count
+        """
+        with self._condition:
+            return {
+                "concurrency": int(self.concurrency),
+                "in_flight": self.in_flight,
+                "paused_for": max(0.0, round(self.paused_until - time.monotonic(), 3)),
+                "throttled": self.throttled,
+            }
+
+
+def parse_retry_after(value, default):
+    """
+    :param value: Retry-After header value: seconds or an HTTP date (or None)
+    :param default: Delay used when the header is missing or invalid
+    :return: Delay in seconds
+    """
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,221 @@
+"""
+Record / replay of Wikimedia API traffic
+
+Lets the search pipeline run offline, deterministically, e.g. for tests and benchmarks:
+- a Fixture maps requests (method, URL and query parameters, without maxlag) to recorded responses and is
+  saved as JSON (gzipped when the path ends with .gz), together with free-form metadata
+- RecordingAdapter sends requests for real and adds every non-throttled response to a fixture
+- ReplayAdapter answers from a fixture, after an injected latency; a request that was not recorded raises
+  FixtureMiss (a requests.ConnectionError)
+- both adapters count the calls they handle (calls, reset())
+- use_adapter installs an adapter as the transport of the shared client (wiki_client) for a block of code
+
+Usage:
+    fixture = replay.Fixture()
+    with replay.use_adapter(replay.RecordingAdapter(fixture)):
+        search.run_search("he", "Physics", "en", max_depth=2)
+    fixture.save("tree.json.gz")
+
+    adapter = replay.ReplayAdapter(replay.Fixture.load("tree.json.gz"), latency=0.05)
+    with replay.use_adapter(adapter):
+        search.run_search("he", "Physics", "en", max_depth=2)
+    print(adapter.calls)
+
+"""
+import gzip
+import json
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from . import wiki_client
+
+FIXTURE_VERSION = 1
+IGNORED_PARAMS = {"maxlag"}  # parameters that do not change the answer
+RECORDED_HEADERS = ("Content-Type", "Retry-After", "MediaWiki-API-Error")
+
+
+class FixtureMiss(requests.ConnectionError):
+    """
+    The replayed request is not in the fixture.
+    """
+
+
+def request_key(method, url):
+    """
+    :param method: HTTP method
+    :param url: Full URL, with its query string
+    :return: Key identifying the request in a fixture (query parameters sorted, IGNORED_PARAMS dropped)
+    """
+    parts = urlsplit(url)
+    params = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in IGNORED_PARAMS)
+    return f"{method.upper()} {parts.scheme}://{parts.netloc}{parts.path}?{urlencode(params)}"
+
+
+class Fixture:
+    """
+    Recorded responses, keyed by request_key.
+
+    :param responses: (Optional) dict key -> {"status", "headers", "body"}
+    :param meta: (Optional) free-form metadata (e.g. the cases a benchmark recorded)
+    """
+
+    def __init__(self, responses=None, meta=None):
+        self.responses = responses or {}
+        self.meta = meta or {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.responses)
+
+    def add(self, method, url, status, headers, body):
+        """
+        Record a response (replacing an earlier one for the same request).
+
+        :param method: HTTP method
+        :param url: Full URL
+        :param status: HTTP status code
+        :param headers: Response headers (only RECORDED_HEADERS are kept)
+        :param body: Response body (text)
+        """
+        entry = {
+            "status": status,
+            "headers": {name: headers[name] for name in RECORDED_HEADERS if name in headers},
+            "body": body,
+        }
+        with self._lock:
+            self.responses[request_key(method, url)] = entry
+
+    def lookup(self, method, url):
+        """
+        :return: Recorded entry of the request, or None
+        """
+        return self.responses.get(request_key(method, url))
+
+    @classmethod
+    def load(cls, path):
+        """
+        :param path: Fixture file (.json or .json.gz)
+        :return: Fixture
+        """
+        opener = gzip.open if str(path).endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != FIXTURE_VERSION:
+            raise ValueError(f"Unsupported fixture version in {path}: {data.get('version')}")
+        return cls(data["responses"], data.get("meta"))
+
+    def save(self, path):
+        """
+        :param path: Fixture file (.json or .json.gz)
+        """
+        opener = gzip.open if str(path).endswith(".gz") else open
+        with self._lock:
+            data = {"version": FIXTURE_VERSION, "meta": self.meta, "responses": dict(sorted(self.responses.items()))}
+        with opener(path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+
+class RecordingAdapter(BaseAdapter):
+    """
+    Transport adapter sending requests for real (through another adapter) and recording the responses.
+    Throttling and server error responses are not recorded.
+
+    :param fixture: Fixture to record into
+    :param adapter: (Optional) adapter actually sending the requests (default: wiki_client.build_adapter())
+    """
+
+    def __init__(self, fixture, adapter=None):
+        super().__init__()
+        self.fixture = fixture
+        self.adapter = adapter or wiki_client.build_adapter()
+        self.calls = 0  # requests sent
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.calls += 1
+        response = self.adapter.send(request, **kwargs)
+        if response.status_code != 429 and response.status_code < 500 \
+                and response.headers.get("MediaWiki-API-Error") != "maxlag":
+            self.fixture.add(request.method, request.url, response.status_code, response.headers, response.text)
+        return response
+
+    def reset(self):
+        """
+        Reset the call counter.
+        """
+        with self._lock:
+            self.calls = 0
+
+    def close(self):
+        self.adapter.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Transport adapter answering from a fixture, without any network access.
+
+    :param fixture: Fixture to replay
+    :param latency: Seconds each call waits before answering (simulated network and server time)
+    """
+
+    def __init__(self, fixture, latency=0.0):
+        super().__init__()
+        self.fixture = fixture
+        self.latency = latency
+        self.calls = 0  # requests answered (or missed)
+        self.misses = []  # keys of the requests not found in the fixture
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        entry = self.fixture.lookup(request.method, request.url)
+        if entry is None:
+            key = request_key(request.method, request.url)
+            with self._lock:
+                self.misses.append(key)
+            raise FixtureMiss(f"No recorded response for {key}", request=request)
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = entry["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def reset(self):
+        """
+        Reset the call counter (misses are kept).
+        """
+        with self._lock:
+            self.calls = 0
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def use_adapter(adapter):
+    """
+    Context manager sending all the calls of the shared client (wiki_client) through an adapter.
+
+    :param adapter: RecordingAdapter, ReplayAdapter or any requests transport adapter
+    :return: The adapter
+    """
+    previous = wiki_client.set_session(wiki_client.build_session(adapter))
+    try:
+        yield adapter
+    finally:
+        wiki_client.set_session(previous).close()
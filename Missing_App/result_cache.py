@@ -0,0 +1,261 @@
+"""
+Whole-result cache for missing-article searches (stale-while-revalidate)
+
+The events of a completed search are cached under (edit_lang, category, refer_lang, max_depth, max_members,
+backend):
+- fresh entries (younger than SEARCH_RESULT_FRESH_TIMEOUT) are replayed without any API call
+- stale entries (up to SEARCH_RESULT_STALE_TIMEOUT older) are replayed immediately too, while one background
+  thread recomputes the search and replaces the entry
+- misses run the search live and store its events once the summary is reached
+- warm computes a search ahead of the requests for it (prefetch_searches command)
+
+Live searches are single-flight: each runs on the bounded search pool (workers.get_search_pool) and every
+request for the same key (including a stale refresh) follows that one computation, receiving its events as
+they are produced. A client that
+disconnects does not stop the search, so its result still reaches the cache.
+
+The summary event carries the freshness of the result: computed_at (Unix time) and stale.
+
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from contextvars import Context, copy_context
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from . import metrics
+from .search import SearchError, get_backend, iter_search_events
+from .workers import get_search_pool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FRESH_TIMEOUT = 60 * 60  # one hour
+DEFAULT_STALE_TIMEOUT = 60 * 60 * 24  # one day
+REFRESH_LOCK_TIMEOUT = 60 * 10  # a refresh taking longer than this may be started again
+
+
+def _fresh_timeout():
+    return getattr(settings, "SEARCH_RESULT_FRESH_TIMEOUT", DEFAULT_FRESH_TIMEOUT)
+
+
+def _stale_timeout():
+    return getattr(settings, "SEARCH_RESULT_STALE_TIMEOUT", DEFAULT_STALE_TIMEOUT)
+
+
+def cache_key(edit_lang, category, refer_lang, max_depth, max_members, backend=None):
+    raw = json.dumps([edit_lang, category, refer_lang, max_depth, max_members, get_backend(backend).name],
+                     ensure_ascii=False)
+    return "search_result:" + hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+def _store(key, events):
+    """
+    Cache the events of a completed search.
+
+    :return: Unix time the result was computed at
+    """
+    computed_at = time.time()
+    timeout = _fresh_timeout() + _stale_timeout()
+    # the timestamp alone is read by warm() without loading the events
+    cache.set_many({key: {"events": events, "computed_at": computed_at}, key + ":computed_at": computed_at},
+                   timeout=timeout)
+    return computed_at
+
+
+def _with_freshness(event, computed_at, stale):
+    if event["event"] != "summary":
+        return event
+    return {**event, "computed_at": int(computed_at), "stale": stale}
+
+
+def _replay(entry, stale):
+    for event in entry["events"]:
+        yield _with_freshness(event, entry["computed_at"], stale)
+
+
+class _Flight:
+    """
+    A search running on the search pool, whose events are shared by every request following it.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    def publish(self, event):
+        with self.condition:
+            self.events.append(event)
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.error = error
+            self.done = True
+            self.condition.notify_all()
+
+    def follow(self):
+        """
+        :return: Generator of the search events, from the first one, as they are produced
+        """
+        position = 0
+        while True:
+            with self.condition:
+                while position >= len(self.events) and not self.done:
+                    self.condition.wait()
+                new_events = self.events[position:]
+                done, error = self.done, self.error
+            yield from new_events
+            position += len(new_events)
+            if done:  # every event was published before done was set
+                if error is not None:
+                    raise error
+                return
+
+
+_flights = {}  # cache key -> _Flight of the live search
+_flights_lock = threading.Lock()
+
+metrics.Gauge("missing_search_in_flight", "Distinct searches running (identical searches coalesced)",
+              function=lambda: {(): len(_flights)})
+
+
+def _run(key, args, flight, refresh_lock):
+    recorded = []
+    error = None
+    try:
+        for event in iter_search_events(*args):
+            recorded.append(event)
+            if event["event"] == "summary":
+                computed_at = _store(key, recorded) if _fresh_timeout() else time.time()
+                event = _with_freshness(event, computed_at, False)
+            flight.publish(event)
+    except Exception as e:
+        error = e
+        if not isinstance(e, SearchError):
+            logger.warning("Search failed: %s", e)
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        if refresh_lock:
+            cache.delete(refresh_lock)
+        flight.finish(error)
+        connections.close_all()  # this thread's database connections (category graph store)
+
+
+def _join(key, args, refresh_lock=None):
+    """
+    Return the live search of a key, starting it if no identical search is running.
+
+    :return: (_Flight, True if this call started it)
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is not None:
+            return flight, False
+        flight = _flights[key] = _Flight()
+    # A live search is accounted to the request that started it; a background refresh to no request
+    context = copy_context() if refresh_lock is None else Context()
+    get_search_pool().submit(context.run, _run, key, args, flight, refresh_lock)
+    return flight, True
+
+
+def refresh_in_background(key, args):
+    """
+    Recompute a search on the search pool and replace its cached result.
+    At most one refresh per key runs at a time.
+
+    :param key: Cache key of the result
+    :param args: Arguments of iter_search_events
+    """
+    refresh_lock = key + ":refreshing"
+    if not cache.add(refresh_lock, True, timeout=REFRESH_LOCK_TIMEOUT):
+        return  # already being refreshed
+    flight, started = _join(key, args, refresh_lock)
+    if not started:
+        cache.delete(refresh_lock)  # the running search refreshes the entry
+
+
+def search_events(edit_lang, category, refer_lang, max_depth=1, max_members=None, backend=None):
+    """
+    Same events as search.iter_search_events, served from the result cache when possible.
+
+    :param edit_lang: Contribution language code
+    :param category: Category name in contribution language
+    :param refer_lang: Reference language code
+    :param max_depth: Maximum subcategory depth
+    :param max_members: (Optional) maximum number of members listed per category
+    :param backend: (Optional) search backend name (see search.get_backend)
+    :return: Generator of event dicts; the summary also has computed_at and stale
+    :raises SearchError: for an unknown backend, or if the category cannot be resolved (on the first next())
+    """
+    args = (edit_lang, category, refer_lang, max_depth, max_members, backend)
+    key = cache_key(*args)
+    entry = cache.get(key) if _fresh_timeout() else None  # a timeout of 0 disables the result cache
+    if entry is None:
+        metrics.record_cache("search_result", "miss")
+        flight, _ = _join(key, args)
+        return flight.follow()
+
+    stale = time.time() - entry["computed_at"] > _fresh_timeout()
+    metrics.record_cache("search_result", "stale" if stale else "hit")
+    if stale:
+        refresh_in_background(key, args)
+    return _replay(entry, stale)
+
+
+def warm(edit_lang, category, refer_lang, max_depth=1, max_members=None, backend=None, min_fresh=0):
+    """
+    Compute a search ahead of the requests for it (prefetch), unless its cached result stays fresh for at
+    least min_fresh more seconds. Waits for the computation to end.
+
+    :param min_fresh: Seconds of freshness left below which the result is computed again
+    :return: True if the search was computed, False if its cached result was kept
+    :raises SearchError: if the category cannot be resolved
+    """
+    args = (edit_lang, category, refer_lang, max_depth, max_members, backend)
+    key = cache_key(*args)
+    computed_at = cache.get(key + ":computed_at")
+    if computed_at is not None and fresh_for(computed_at) > min_fresh:
+        return False
+    flight, _ = _join(key, args)
+    for _ in flight.follow():
+        pass
+    return True
+
+
+def fresh_for(computed_at):
+    """
+    :param computed_at: Unix time a result was computed at
+    :return: Seconds the result stays fresh (0 if stale)
+    """
+    return max(0, int(_fresh_timeout() - (time.time() - computed_at)))
+
+
+def run_search(edit_lang, category, refer_lang, max_depth=1, max_members=None, backend=None):
+    """
+    Run a missing-articles search to completion, through the result cache.
+
+    :return: Dict with the missing articles (title, source), the missing_only flag and the freshness
+             of the result (computed_at, stale)
+    :raises SearchError: if the category cannot be resolved
+    """
+    articles = []
+    summary = {}
+    for event in search_events(edit_lang, category, refer_lang, max_depth, max_members, backend):
+        if event["event"] == "article":
+            articles.append({"title": event["title"], "source": event["source"]})
+        elif event["event"] == "summary":
+            summary = event
+    return {
+        "articles": articles,
+        "missing_only": True,
+        "computed_at": summary.get("computed_at"),
+        "stale": summary.get("stale", False),
+    }
@@ -0,0 +1,193 @@
+"""
+Materialized result sets, served page by page with cursors
+
+A search result can be large to serialize, transfer and render at once. With ?page_size= the search endpoint
+answers the first page only, together with a result id and a cursor for the next page; the following pages
+are read from /api/results/<result_id>/?cursor=...:
+- the result comes from the result cache (result_cache.py), so the search itself runs once; the list of
+  articles is then materialized in the shared cache under the result id, in chunks of CHUNK_SIZE articles,
+  so reading a page loads one or two chunks, not the whole list
+- the result id names one computed result (search parameters and computed_at): a background refresh gives
+  new results a new id, and the pages of an id never change while a client scrolls through them
+- sort orders (title, source, descending with '-') are materialized the first time they are asked
+- a cursor is an opaque token carrying the sort and the offset of the next page
+- result sets expire RESULT_SET_TIMEOUT seconds after being materialized; an expired id answers 404 and the
+  client runs the search again (served from the result cache)
+
+"""
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .search import SearchError
+
+CHUNK_SIZE = 500  # articles per cache entry
+DEFAULT_TIMEOUT = 60 * 60
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+SORT_KEYS = {
+    "": None,  # search order: categories in tree order, pages in listing order
+    "title": lambda article: (article["title"].casefold(), article["title"]),
+    "source": lambda article: (article["source"].casefold(), article["title"].casefold()),
+}
+
+
+def timeout():
+    """
+    :return: Seconds a result set is kept (RESULT_SET_TIMEOUT)
+    """
+    return getattr(settings, "RESULT_SET_TIMEOUT", DEFAULT_TIMEOUT)
+
+
+def result_id(search_args, computed_at):
+    """
+    :param search_args: Arguments of the search (edit_lang, category, refer_lang, max_depth, max_members,
+                        backend name)
+    :param computed_at: Unix time the result was computed at
+    :return: Id of the result set
+    """
+    raw = json.dumps([list(search_args), int(computed_at)], ensure_ascii=False)
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+def _key(rid, sort=None, chunk=None):
+    key = f"result_set:{rid}"
+    if sort is not None:
+        key += f":{sort or '-'}:{chunk}"
+    return key
+
+
+def parse_sort(sort):
+    """
+    :param sort: '', 'title', 'source', '-title' or '-source'
+    :return: The sort, validated
+    :raises SearchError: for an unknown sort key
+    """
+    sort = sort or ""
+    if sort.lstrip("-") not in SORT_KEYS or sort == "-":
+        raise SearchError({"error": f"Unknown sort: {sort} (expected title, source, -title or -source)"})
+    return sort
+
+
+def parse_page_size(value):
+    """
+    :param value: Requested page size (str or None)
+    :return: Page size, between 1 and RESULT_PAGE_MAX_SIZE
+    :raises SearchError: if it is not a number
+    """
+    try:
+        size = int(value) if value else DEFAULT_PAGE_SIZE
+    except ValueError:
+        raise SearchError({"error": f"Invalid page_size: {value}"})
+    return max(1, min(size, getattr(settings, "RESULT_PAGE_MAX_SIZE", MAX_PAGE_SIZE)))
+
+
+def encode_cursor(sort, offset):
+    raw = json.dumps({"s": sort, "o": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, sort):
+    """
+    :param cursor: Cursor returned with a previous page ('' or None: the first page)
+    :param sort: Sort of the request
+    :return: Offset of the page
+    :raises SearchError: for an invalid cursor, or a cursor of another sort
+    """
+    if not cursor:
+        return 0
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offset = int(data["o"])
+    except (ValueError, TypeError, KeyError):
+        raise SearchError({"error": "Invalid cursor"})
+    if data.get("s", "") != sort or offset < 0:
+        raise SearchError({"error": "The cursor belongs to another sort order"})
+    return offset
+
+
+def _store_chunks(rid, sort, articles):
+    cache.set_many({_key(rid, sort, number): articles[start:start + CHUNK_SIZE]
+                    for number, start in enumerate(range(0, len(articles), CHUNK_SIZE))}, timeout=timeout())
+
+
+def exists(rid):
+    """
+    :param rid: Result id
+    :return: True if the result set is materialized (and not expired)
+    """
+    return cache.get(_key(rid)) is not None
+
+
+def materialize(rid, result):
+    """
+    Keep the articles of a search result under its id, unless they already are.
+
+    :param rid: Result id (see result_id)
+    :param result: Search result (see result_cache.run_search): dict with articles (title, source) in search
+                   order, computed_at and stale
+    """
+    if exists(rid):
+        return
+    articles = result["articles"]
+    _store_chunks(rid, "", articles)
+    cache.add(_key(rid), {"total": len(articles), "computed_at": result["computed_at"], "stale": result["stale"],
+                          "missing_only": True}, timeout=timeout())
+
+
+def _load(rid, sort, first, last):
+    """
+    :return: Articles first to last (excluded) of a materialized sort order, or None if it is not
+    """
+    articles = []
+    for number in range(first // CHUNK_SIZE, (max(last, first + 1) - 1) // CHUNK_SIZE + 1):
+        chunk = cache.get(_key(rid, sort, number))
+        if chunk is None:
+            return None
+        articles.extend(chunk)
+    start = first - (first // CHUNK_SIZE) * CHUNK_SIZE
+    return articles[start:start + (last - first)]
+
+
+def get_page(rid, cursor=None, page_size=DEFAULT_PAGE_SIZE, sort=""):
+    """
+    Read one page of a materialized result.
+
+    :param rid: Result id
+    :param cursor: Cursor of the page (None: the first one)
+    :param page_size: Articles per page
+    :param sort: Sort order ('' for the search order)
+    :return: Dict with result_id, articles, total, sort, next_cursor (None on the last page) and the meta
+             fields of the result
+    :raises SearchError: 404 if the result set is unknown or expired, 400 for an invalid cursor or sort
+    """
+    sort = parse_sort(sort)
+    offset = decode_cursor(cursor, sort)
+    meta = cache.get(_key(rid))
+    if meta is None:
+        raise SearchError({"error": "Unknown or expired result", "result_id": rid}, status=404)
+    total = meta["total"]
+    end = min(offset + page_size, total)
+
+    articles = _load(rid, sort, offset, end) if offset < total else []
+    if articles is None and sort:
+        # first request for this order: sort the whole result once
+        everything = _load(rid, "", 0, total)
+        if everything is not None:
+            field = sort.lstrip("-")
+            everything.sort(key=SORT_KEYS[field], reverse=sort.startswith("-"))
+            _store_chunks(rid, sort, everything)
+            articles = everything[offset:end]
+    if articles is None:
+        raise SearchError({"error": "Unknown or expired result", "result_id": rid}, status=404)
+
+    return {
+        **meta,
+        "result_id": rid,
+        "articles": articles,
+        "sort": sort,
+        "next_cursor": encode_cursor(sort, end) if end < total else None,
+    }
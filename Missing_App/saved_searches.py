@@ -0,0 +1,310 @@
+"""
+Saved searches with incremental (delta) refresh
+
+Editors rerun the same category searches to see what changed. A saved search (SavedSearch) keeps, in the
+database, the reference-language category tree (title -> depth) and the missing articles (pageid, title,
+source) of its last run, so a refresh only asks what changed since then instead of walking everything again:
+- new members: one generator=categorymembers query per category of the tree, sorted by the time pages were
+  added to the category (gcmsort=timestamp, gcmstart=last run), with the langlink status of each new page;
+  new subcategories (above max_depth) are walked and listed in full, like a new search
+- removed members: the previously missing pages are checked again by pageid, 50 per query
+  (prop=langlinks|categories): a page now linked to the contribution language was translated, a page no
+  longer in any category of the tree left it, a missing pageid was deleted; a page renamed since the last run
+  is reported removed (under its old title) and added (under the new one)
+- the refresh answers with the delta (added and removed articles, with a reason for each removal)
+  and stores the new state
+
+Changes a delta cannot see (a subcategory taken out of the tree, an interlanguage link removed from a page
+that had one) are picked up by a full refresh, which runs the whole search again and diffs it with the
+stored state. Saved searches always ask the live API (the category graph store may be older than the last
+run, and would hide members added meanwhile).
+
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import search, siteinfo, wiki_client
+from .models import SavedSearch
+from .singleflight import SingleFlight
+from .workers import parallel_map
+
+PAGEIDS_PER_BATCH = 50  # maximum number of pageids per query for non-bot clients
+DEFAULT_OVERLAP = 60 * 5  # seconds re-read before the last run (clock skew, replication lag)
+
+_flights = SingleFlight()  # one refresh at a time per saved search (in this process)
+
+
+def _api_timestamp(moment):
+    """
+    :param moment: Aware datetime
+    :return: MediaWiki ISO 8601 timestamp (e.g. '2024-05-01T12:00:00Z')
+    """
+    return moment.astimezone(dt_timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def iter_new_members(lang, category, target_lang, since, with_subcategories=True):
+    """
+    Lazily iterate over the pages and subcategories added to a category since a given time, with the langlink
+    status of the pages for the target language.
+https://en.wikipedia.org/w/api.php?action=query&generator=categorymembers&gcmtitle=Category:Art&gcmtype=page|subcat&gcmsort=timestamp&gcmdir=newer&gcmstart=2024-05-01T00:00:00Z&gcmlimit=max&prop=langlinks&lllang=he&lllimit=max&format=json
+    :param lang: Wikipedia language code of the category (reference language)
+    :param category: Full category title
+    :param target_lang: Language code checked for interlanguage links
+    :param since: Aware datetime: members added to the category before it are skipped
+    :param with_subcategories: Also list the subcategories added
+    :return: Generator of (pageid, title, has_langlink, is_subcategory)
+    """
+    params = {
+        "action": "query",
+        "generator": "categorymembers",
+        "gcmtitle": category,
+        "gcmtype": "page|subcat" if with_subcategories else "page",
+        "gcmsort": "timestamp",
+        "gcmdir": "newer",
+        "gcmstart": _api_timestamp(since),
+        "gcmlimit": "max",
+        "prop": "langlinks",
+        "lllang": target_lang,
+        "lllimit": "max",
+        "format": "json",
+    }
+    category_ns = siteinfo.NAMESPACE_CATEGORY
+    batch = {}  # pageid -> [title, has_langlink, is_subcategory] for the current generator batch
+    for data in wiki_client.api_continue(lang, params):
+        for pid, page in data.get("query", {}).get("pages", {}).items():
+            entry = batch.setdefault(int(pid), [page["title"], False, page.get("ns") == category_ns])
+            if page.get("langlinks"):
+                entry[1] = True
+        if "batchcomplete" in data:  # langlinks of a batch may be split over several responses
+            for pid, (title, has_langlink, is_subcategory) in sorted(batch.items(), key=lambda item: item[1]):
+                yield pid, title, has_langlink, is_subcategory
+            batch = {}
+
+
+def check_pages(lang, pageids, target_lang):
+    """
+    Check again up to 50 pages: current title, langlink to the target language and categories.
+https://en.wikipedia.org/w/api.php?action=query&pageids=736|15580374&prop=langlinks|categories&lllang=he&lllimit=max&cllimit=max&format=json
+    :param lang: Wikipedia language code of the pages
+    :param pageids: List of at most PAGEIDS_PER_BATCH page ids
+    :param target_lang: Language code checked for interlanguage links
+    :return: Dict pageid -> (title, has_langlink, set of category titles), without the deleted pages
+    """
+    params = {
+        "action": "query",
+        "pageids": "|".join(str(pageid) for pageid in pageids),
+        "prop": "langlinks|categories",
+        "lllang": target_lang,
+        "lllimit": "max",
+        "cllimit": "max",
+        "format": "json",
+    }
+    pages = {}
+    for data in wiki_client.api_continue(lang, params):
+        for pid, page in data.get("query", {}).get("pages", {}).items():
+            if "missing" in page or "invalid" in page:
+                continue
+            title, has_langlink, categories = pages.setdefault(int(pid), (page["title"], False, set()))
+            categories.update(category["title"] for category in page.get("categories", []))
+            if page.get("langlinks") and not has_langlink:
+                pages[int(pid)] = (title, True, categories)
+    return pages
+
+
+def _walk(lang, roots, max_depth, categories):
+    """
+    Walk the category tree below new categories, level by level on the shared worker pool.
+
+    :param lang: Wikipedia language code
+    :param roots: List of (category title, depth) to add
+    :param max_depth: Maximum subcategory depth
+    :param categories: Dict category title -> depth of the categories already known, updated in place
+    :return: List of the categories added, in breadth-first order
+    """
+    added = []
+    level = []
+    for title, depth in roots:
+        if title not in categories:
+            categories[title] = depth
+            added.append(title)
+            level.append((title, depth))
+    while level:
+        expanded = [(title, depth) for title, depth in level if depth < max_depth]
+        results = parallel_map(
+            lambda item: [member["title"] for member in search.iter_category_members(lang, item[0], "subcat")],
+            expanded,
+        )
+        level = []
+        for (_, depth), subcategories in zip(expanded, results):
+            for subcategory in subcategories:
+                if subcategory not in categories:
+                    categories[subcategory] = depth + 1
+                    added.append(subcategory)
+                    level.append((subcategory, depth + 1))
+    return added
+
+
+def _list_missing(lang, categories, target_lang):
+    """
+    List the missing pages of whole categories (in parallel).
+
+    :return: List of [pageid, title, source], deduplicated by pageid (the first source found is kept)
+    """
+    listings = parallel_map(lambda category: list(search.iter_member_langlinks(lang, category, target_lang)),
+                            categories)
+    articles = {}
+    for category, listing in zip(categories, listings):
+        for pageid, title, has_langlink in listing:
+            if not has_langlink and pageid not in articles:
+                articles[pageid] = [pageid, title, category]
+    return list(articles.values())
+
+
+def _snapshot(saved):
+    """
+    Run the whole search of a saved search.
+
+    :return: (categories: dict title -> depth, articles: list of [pageid, title, source])
+    """
+    categories = {}
+    _walk(saved.refer_lang, [(saved.refer_category, 0)], saved.max_depth, categories)
+    return categories, _list_missing(saved.refer_lang, list(categories), saved.edit_lang)
+
+
+def create_saved_search(edit_lang, category, refer_lang, max_depth=1, name=""):
+    """
+    Run a search and save it, with its category tree and missing articles, for later delta refreshes.
+
+    :param edit_lang: Contribution language code
+    :param category: Category name in contribution language
+    :param refer_lang: Reference language code
+    :param max_depth: Maximum subcategory depth
+    :param name: (Optional) label chosen by the user
+    :return: SavedSearch
+    :raises SearchError: if the category cannot be resolved
+    """
+    refer_category = search.resolve_reference_category(edit_lang, category, refer_lang)
+    saved = SavedSearch(name=name, edit_lang=edit_lang, category=category, refer_lang=refer_lang,
+                        refer_category=refer_category, max_depth=max_depth)
+    saved.refreshed_at = timezone.now()  # before listing: members added while it runs are seen next time
+    saved.categories, saved.articles = _snapshot(saved)
+    saved.save()
+    return saved
+
+
+def _article(entry, **extra):
+    pageid, title, source = entry
+    return {"title": title, "source": source, **extra}
+
+
+def _delta(saved, since):
+    """
+    Bring the state of a saved search up to date from the changes since a given time.
+
+    :return: (categories, articles, added articles, removed articles)
+    """
+    lang, target_lang = saved.refer_lang, saved.edit_lang
+    categories = dict(saved.categories)
+    known = {pageid: [pageid, title, source] for pageid, title, source in saved.articles}
+
+    # Members added to the categories of the tree
+    tree = list(categories)
+    listings = parallel_map(
+        lambda category: list(iter_new_members(lang, category, target_lang, since,
+                                               with_subcategories=categories[category] < saved.max_depth)),
+        tree,
+    )
+    new_pages = {}
+    new_subcategories = []
+    for category, listing in zip(tree, listings):
+        for pageid, title, has_langlink, is_subcategory in listing:
+            if is_subcategory:
+                new_subcategories.append((title, categories[category] + 1))
+            elif not has_langlink and pageid not in known:
+                new_pages.setdefault(pageid, [pageid, title, category])
+
+    # New subcategories: the whole subtree is new
+    added_categories = _walk(lang, new_subcategories, saved.max_depth, categories)
+    for entry in _list_missing(lang, added_categories, target_lang):
+        new_pages.setdefault(entry[0], entry)
+
+    # Previously missing pages: still missing, and still in the tree?
+    pageids = list(known)
+    batches = [pageids[i:i + PAGEIDS_PER_BATCH] for i in range(0, len(pageids), PAGEIDS_PER_BATCH)]
+    checked = {}
+    for pages in parallel_map(lambda batch: check_pages(lang, batch, target_lang), batches):
+        checked.update(pages)
+
+    articles = []
+    removed = []
+    for pageid, entry in known.items():
+        page = checked.get(pageid)
+        if page is None:
+            removed.append(_article(entry, reason="deleted"))
+            continue
+        title, has_langlink, page_categories = page
+        if has_langlink:
+            removed.append(_article(entry, reason="translated"))
+            continue
+        source = entry[2] if entry[2] in page_categories else \
+            next((category for category in categories if category in page_categories), None)
+        if source is None:
+            removed.append(_article(entry, reason="left_category"))
+        elif title != entry[1]:
+            removed.append(_article(entry, reason="moved"))
+            new_pages.setdefault(pageid, [pageid, title, source])
+        else:
+            articles.append([pageid, title, source])
+    added = list(new_pages.values())
+    return categories, articles + added, added, removed
+
+
+def _diff(old_articles, articles):
+    """
+    :return: (added, removed) entries between two lists of [pageid, title, source]
+    """
+    old = {(pageid, title) for pageid, title, _ in old_articles}
+    new = {(pageid, title) for pageid, title, _ in articles}
+    added = [entry for entry in articles if (entry[0], entry[1]) not in old]
+    removed = [_article(entry, reason="gone") for entry in old_articles if (entry[0], entry[1]) not in new]
+    return added, removed
+
+
+def refresh_saved_search(saved, full=False):
+    """
+    Bring a saved search up to date and report what changed since its last run.
+
+    :param saved: SavedSearch
+    :param full: Run the whole search again (and diff), instead of asking only for the changes
+    :return: Dict with the delta: added articles (title, source), removed articles (title, source, reason:
+             translated, left_category, deleted, moved, or gone for a full refresh), the new number of missing
+             articles and the times of the previous and of this run
+    """
+    return _flights.do(saved.pk, lambda: _refresh(saved, full))
+
+
+def _refresh(saved, full):
+    started = timezone.now()
+    previous = saved.refreshed_at
+    if full:
+        categories, articles = _snapshot(saved)
+        added, removed = _diff(saved.articles, articles)
+    else:
+        overlap = getattr(settings, "SAVED_SEARCH_OVERLAP", DEFAULT_OVERLAP)
+        categories, articles, added, removed = _delta(saved, previous - timedelta(seconds=overlap))
+
+    delta = {
+        "id": str(saved.id),
+        "mode": "full" if full else "delta",
+        "since": previous.isoformat(),
+        "refreshed_at": started.isoformat(),
+        "added": [_article(entry) for entry in added],
+        "removed": removed,
+        "count": len(articles),
+        "categories": len(categories),
+    }
+    saved.categories, saved.articles, saved.refreshed_at, saved.last_delta = categories, articles, started, delta
+    saved.save(update_fields=["categories", "articles", "refreshed_at", "last_delta"])
+    return delta
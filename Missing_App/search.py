@@ -0,0 +1,483 @@
+"""
+Missing-articles search pipeline
+
+The Wikipedia/Wikidata side of the tool, independent of HTTP request handling:
+- Resolving a category of the contribution language to its title in the reference language
+  (one cached Wikidata sitelinks lookup, see wikidata.py)
+- Walking the category tree of the reference language (level by level, on the shared worker pool)
+- Listing category members with continuation, filtered to the pages missing in the contribution language
+- Category listings are served from the persistent graph store (graph_store.py) while fresh
+- Backends: the live API (ApiBackend, default) or offline stores built from dumps (dump_store.DumpBackend),
+  chosen per search or with the SEARCH_BACKEND setting
+- run_matrix_search: presence of a reference category's pages in several target languages at once
+- iter_search_events: the whole search as a stream of events (start, article, progress, summary),
+  consumed both by the plain JSON endpoint and by the NDJSON / Server-Sent Events streaming modes
+
+"""
+from django.conf import settings
+
+from . import graph_store, metrics, siteinfo, wiki_client, wikidata
+from .workers import parallel_map
+
+MAX_API_LIMIT = 500  # largest cmlimit/gcmlimit allowed for non-bot clients
+
+
+class SearchError(Exception):
+    """
+    A search that cannot be completed for a user-facing reason (e.g. unknown category).
+
+    :param payload: JSON payload describing the error (e.g. {"noQCode": "..."})
+    :param status: HTTP status code to answer with
+    """
+
+    def __init__(self, payload, status=400):
+        super().__init__(payload)
+        self.payload = payload
+        self.status = status
+
+
+def get_prefix(lang="en", type="category"):
+    """
+    Get the correct category or portal namespace prefix for a given Wikipedia language.
+    The namespace table is fetched once per language and then served from memory/cache (see siteinfo.py).
+https://en.wikipedia.org/w/api.php/action=query&meta=siteinfo&siprop=namespaces&format=json
+    :param lang: Wikipedia language code (default: 'en')
+    :param type: Namespace type ('category' or 'portal')
+    :return: Namespace prefix string (e.g., 'Category:', 'تصنيف:')
+    """
+    if (type == "category"):
+        # Namespace ID for categories is always 14
+        return siteinfo.get_namespace_name(lang, siteinfo.NAMESPACE_CATEGORY)
+    return siteinfo.get_namespace_name(lang, siteinfo.NAMESPACE_PORTAL)
+
+
+def iter_category_members(lang, category, cmtype="page", limit=None):
+    """
+    Lazily iterate over the members of a category, following continuation to the end of the listing.
+    Members are requested in the largest batches the API allows and yielded as soon as each batch arrives.
+https://en.wikipedia.org/w/api.php?action=query&list=categorymembers&cmtitle=Category:Art&cmtype=subcat&cmlimit=max&format=json
+    :param lang: Wikipedia language code
+    :param category: Full category title
+    :param cmtype: Member type ('page', 'subcat' or 'file')
+    :param limit: (Optional) maximum number of members to yield, for interactive use
+    :return: Generator of member dicts (pageid, ns, title)
+    """
+    params = {
+        "action": "query",
+        "list": "categorymembers",
+        "cmtitle": category,
+        "cmtype": cmtype,
+        "cmlimit": min(limit, MAX_API_LIMIT) if limit else "max",
+        "format": "json"
+    }
+
+    count = 0
+    for data in wiki_client.api_continue(lang, params):
+        for member in data.get("query", {}).get("categorymembers", []):
+            yield member
+            count += 1
+            if limit and count >= limit:
+                return
+
+
+def get_direct_subcategories(lang, category, limit=None):
+    """
+    Retrieve the direct subcategories of a category.
+    Served from the category graph store when a fresh listing exists, otherwise fetched and stored.
+
+    :param lang: Wikipedia language code
+    :param category: Full category title
+    :param limit: (Optional) maximum number of subcategories
+    :return: List of subcategory titles
+    """
+    stored = graph_store.get_subcategories(lang, category, limit)
+    if stored is not None:
+        return stored
+
+    subcategories = [member["title"] for member in iter_category_members(lang, category, "subcat", limit)]
+    graph_store.save_subcategories(lang, category, subcategories,
+                                   complete=not limit or len(subcategories) < limit)
+    return subcategories
+
+
+def get_all_subcategories(lang, category, visited=None, current_depth=0, max_depth=1, max_members=None,
+                          backend=None):
+    """
+    Retrieve all subcategories of a category up to a maximum depth.
+    The tree is fetched level by level: all categories of a level are requested in parallel on the
+    shared worker pool, so wall time grows with the depth rather than with the number of categories.
+    The result is the same list, in the same order, as a depth-first walk of the tree.
+
+    :param lang: Wikipedia language code
+    :param category: Name of the category
+    :param visited: Set to avoid cycles
+    :param current_depth: Current recursion depth
+    :param max_depth: Maximum allowed depth (default 1)
+    :param max_members: (Optional) maximum number of subcategories listed per category
+    :param backend: (Optional) search backend name (see get_backend)
+    :return: List of all subcategory names
+    """
+    source = get_backend(backend)
+    if visited is None:
+        visited = set()
+        category = source.category_title(lang, category)  # accept names with or without prefix
+
+    # Breadth-first fetch: children[category] -> direct subcategories, each category fetched once
+    children = {}
+    frontier = [] if category in visited else [category]
+    depth = current_depth
+    while frontier and depth < max_depth:
+        results = parallel_map(lambda cat: source.get_direct_subcategories(lang, cat, max_members), frontier)
+        children.update(zip(frontier, results))
+
+        next_frontier = []
+        queued = set()
+        for subcategories in results:
+            for subcat in subcategories:
+                if subcat not in children and subcat not in visited and subcat not in queued:
+                    queued.add(subcat)
+                    next_frontier.append(subcat)
+        frontier = next_frontier
+        depth += 1
+
+    return _walk_subcategories(category, children, visited, current_depth, max_depth)
+
+
+def _walk_subcategories(category, children, visited, current_depth, max_depth):
+    """
+    Depth-first walk of an already fetched category tree (no API calls).
+    Every category it expands was fetched by the breadth-first pass, which reaches each category
+    at its smallest depth.
+
+    :param category: Full category title
+    :param children: Dict category -> list of direct subcategories
+    :param visited: Set to avoid cycles
+    :param current_depth: Current depth
+    :param max_depth: Maximum allowed depth
+    :return: List of all subcategory names, in depth-first order
+    """
+    if current_depth >= max_depth:
+        return []
+
+    if category in visited:
+        return []
+
+    visited.add(category)
+    subcategories = []
+
+    # Add the direct subcategories
+    for subcat in children[category]:
+        subcategories.append(subcat)
+        subcategories.extend(_walk_subcategories(subcat, children, visited, current_depth + 1, max_depth))
+
+    return subcategories
+
+
+def iter_missing_category_members(lang, category, target_lang, limit=None):
+    """
+    Lazily iterate over the pages of a category that have no interlanguage link to the target language.
+    Served from the category graph store when a fresh listing for target_lang exists; otherwise the
+    listing is fetched (see iter_member_langlinks) and stored once it has been read to the end.
+
+    :param lang: Wikipedia language code of the category (reference language)
+    :param category: Full category title
+    :param target_lang: Language code the pages should be missing from (contribution language)
+    :param limit: (Optional) maximum number of category members to examine, for interactive use
+    :return: Generator of missing page titles
+    """
+    for pageid, title in iter_missing_category_pages(lang, category, target_lang, limit):
+        yield title
+
+
+def iter_missing_category_pages(lang, category, target_lang, limit=None):
+    """
+    Same as iter_missing_category_members, with the page ids.
+
+    :return: Generator of (pageid, title) of the missing pages
+    """
+    for pageid, title, has_langlink in iter_category_langlinks(lang, category, target_lang, limit):
+        if not has_langlink:
+            yield pageid, title
+
+
+def iter_new_missing_pages(lang, category, target_lang, seen, limit=None):
+    """
+    Same as iter_missing_category_pages, for the pages not met before: a page already in seen is skipped
+    before its langlink status is read, and every page examined is added to seen. The generator query lists
+    a page together with its langlinks, so with the API skipping a page saves the check, not the request.
+
+    :param seen: Page ids met in earlier categories (a set, or a large_search.PageIdSet), updated in place
+    :return: Generator of (pageid, title) of the missing pages not in seen
+    """
+    for pageid, title, has_langlink in iter_category_langlinks(lang, category, target_lang, limit):
+        if pageid in seen:
+            continue
+        seen.add(pageid)
+        if not has_langlink:
+            yield pageid, title
+
+
+def iter_category_langlinks(lang, category, target_lang, limit=None):
+    """
+    Same as iter_member_langlinks, from the category graph store when it has a fresh listing; a listing read
+    from the API is then stored, unless it is longer than CATEGORY_STORE_MAX_MEMBERS (it is not kept in
+    memory, so the memory used does not grow with the size of the category).
+
+    :return: Generator of (pageid, title, has_langlink)
+    """
+    stored = graph_store.get_members(lang, category, target_lang, limit)
+    if stored is not None:
+        yield from stored
+        return
+
+    max_stored = getattr(settings, "CATEGORY_STORE_MAX_MEMBERS", None)
+    members = []
+    examined = 0
+    for pageid, title, has_langlink in iter_member_langlinks(lang, category, target_lang, limit):
+        examined += 1
+        if members is not None:
+            members.append((pageid, title, has_langlink))
+            if max_stored and len(members) > max_stored:
+                members = None  # too large to store: stop keeping it
+        yield pageid, title, has_langlink
+    if members is not None:
+        graph_store.save_members(lang, category, target_lang, members,
+                                 complete=not limit or examined < limit)
+
+
+def iter_member_langlinks(lang, category, target_lang, limit=None):
+    """
+    Lazily iterate over the pages of a category together with their langlink status for the target language.
+    One generator query lists up to 500 members together with their langlink to target_lang,
+    so the existence check costs no extra request per page. Continuation is followed to the end.
+https://en.wikipedia.org/w/api.php?action=query&generator=categorymembers&gcmtitle=Category:Art&gcmtype=page&gcmlimit=max&prop=langlinks&lllang=he&lllimit=max&format=json
+    :param lang: Wikipedia language code of the category (reference language)
+    :param category: Full category title
+    :param target_lang: Language code checked for interlanguage links
+    :param limit: (Optional) maximum number of category members to examine, for interactive use
+    :return: Generator of (pageid, title, has_langlink), sorted by title within each API batch
+    """
+    params = {
+        "action": "query",
+        "generator": "categorymembers",
+        "gcmtitle": category,
+        "gcmtype": "page",
+        "gcmlimit": min(limit, MAX_API_LIMIT) if limit else "max",
+        "prop": "langlinks",
+        "lllang": target_lang,
+        "lllimit": "max",
+        "format": "json",
+    }
+    batch = {}  # pageid -> [title, has_langlink] for the current generator batch
+    examined = 0
+    for data in wiki_client.api_continue(lang, params):
+        for pid, page in data.get("query", {}).get("pages", {}).items():
+            entry = batch.setdefault(int(pid), [page["title"], False])
+            if page.get("langlinks"):
+                entry[1] = True
+
+        # langlinks of a batch may be split over several responses (llcontinue);
+        # a batch is only decided once the API reports it complete
+        if "batchcomplete" in data:
+            for pid, (title, has_langlink) in sorted(batch.items(), key=lambda item: item[1]):
+                if limit and examined >= limit:
+                    return
+                examined += 1
+                yield pid, title, has_langlink
+            batch = {}
+            if limit and examined >= limit:
+                return
+
+
+def iter_member_presence(lang, category, target_langs, limit=None):
+    """
+    Iterate over the pages of a category together with the target languages they exist in.
+    Each target language is checked on its own: from the category graph store when it has a fresh status for
+    that language, otherwise with the same generator query as iter_member_langlinks (one lllang per target, so
+    a page's langlinks to other languages are never downloaded), and the listing is then stored.
+
+    :param lang: Wikipedia language code of the category (reference language)
+    :param category: Full category title
+    :param target_langs: Language codes checked for interlanguage links
+    :param limit: (Optional) maximum number of category members to examine
+    :return: Generator of (title, set of the target languages having the page)
+    """
+    targets = list(dict.fromkeys(target_langs))
+    titles = {}  # pageid -> title, in listing order
+    present = {}  # target language -> pageids having a langlink to it
+    for target in targets:
+        listing = graph_store.get_members(lang, category, target, limit)
+        if listing is None:
+            listing = list(iter_member_langlinks(lang, category, target, limit))
+            graph_store.save_members(lang, category, target, listing, complete=not limit or len(listing) < limit)
+        for pageid, title, _ in listing:
+            titles.setdefault(pageid, title)
+        present[target] = {pageid for pageid, _, has_langlink in listing if has_langlink}
+
+    for pageid, title in titles.items():
+        yield title, {target for target in targets if pageid in present[target]}
+
+
+def resolve_reference_category(edit_lang, category, refer_lang):
+    """
+    Find the title of a contribution-language category in the reference language.
+
+    :param edit_lang: Contribution language code
+    :param category: Category name in contribution language
+    :param refer_lang: Reference language code
+    :return: Full category title in the reference language
+    :raises SearchError: if the category or its reference-language counterpart does not exist
+    """
+    # One Wikidata lookup gives the category's title in every language (cached, including misses)
+    sitelinks = wikidata.get_sitelinks(edit_lang, siteinfo.category_title(edit_lang, category))
+    if not sitelinks:
+        raise SearchError({"noQCode": "Category not found in wikipedia"}, status=200)
+
+    # The sitelink is the category's real title in the reference wiki, prefix included
+    category_name_in_refer_lang = sitelinks.get(refer_lang)
+    if not category_name_in_refer_lang:
+        raise SearchError({"noCatError": " category names not found"}, status=400)
+    return category_name_in_refer_lang
+
+
+def iter_search_events(edit_lang, category, refer_lang, max_depth=1, max_members=None, backend=None):
+    """
+    Run a missing-articles search and yield its progress as events:
+    - {"event": "resolved", "category": ...} once the reference-language category is known
+    - {"event": "start", "category": ..., "total": number of categories} once the category tree is fetched
+    - {"event": "article", "title": ..., "source": ...} for each missing article, deduplicated by title
+      (the first source found is kept), as soon as its category page is processed
+    - {"event": "progress", "done": ..., "total": ..., "category": ...} after each category
+    - {"event": "summary", "count": number of articles, "categories": number of categories}
+
+    :param edit_lang: Contribution language code
+    :param category: Category name in contribution language
+    :param refer_lang: Reference language code
+    :param max_depth: Maximum subcategory depth
+    :param max_members: (Optional) maximum number of members listed per category
+    :param backend: (Optional) search backend name (see get_backend)
+    :return: Generator of event dicts
+    :raises SearchError: if the category cannot be resolved, or the backend is unknown
+    """
+    source = get_backend(backend)
+    with metrics.phase("resolve"):
+        category_name_in_refer_lang = source.resolve_reference_category(edit_lang, category, refer_lang)
+    yield {"event": "resolved", "category": category_name_in_refer_lang}
+
+    all_categories = [category_name_in_refer_lang]  # La catégorie principale
+    with metrics.phase("traversal"):
+        all_categories.extend(get_all_subcategories(refer_lang, category_name_in_refer_lang, max_depth=max_depth,
+                                                    max_members=max_members, backend=backend))
+    total = len(all_categories)
+    yield {"event": "start", "category": category_name_in_refer_lang, "total": total}
+
+    # Remove duplicates by title (keeping the first source found)
+    seen_titles = set()
+    for done, current_category in enumerate(all_categories, start=1):
+        members = source.iter_missing_category_members(refer_lang, current_category, edit_lang, max_members)
+        for title in metrics.timed_iter("members", members):
+            if title not in seen_titles:
+                seen_titles.add(title)
+                yield {"event": "article", "title": title, "source": current_category}
+        yield {"event": "progress", "done": done, "total": total, "category": current_category}
+
+    yield {"event": "summary", "count": len(seen_titles), "categories": total}
+
+
+def run_search(edit_lang, category, refer_lang, max_depth=1, max_members=None, backend=None):
+    """
+    Run a missing-articles search to completion.
+
+    :return: Dict with the list of missing articles (title, source) and the missing_only flag
+    :raises SearchError: if the category cannot be resolved
+    """
+    articles = [
+        {"title": event["title"], "source": event["source"]}
+        for event in iter_search_events(edit_lang, category, refer_lang, max_depth, max_members, backend)
+        if event["event"] == "article"
+    ]
+    return {"articles": articles, "missing_only": True}
+
+
+def run_matrix_search(refer_lang, category, target_langs, max_depth=1, max_members=None, backend=None):
+    """
+    Compute which pages of a reference-language category tree exist in each of several target languages.
+    The tree is traversed once; each target language is then checked with one lllang query per batch of members.
+
+    :param refer_lang: Reference language code (language of the category)
+    :param category: Category name in the reference language, with or without prefix
+    :param target_langs: Target (contribution) language codes
+    :param max_depth: Maximum subcategory depth
+    :param max_members: (Optional) maximum number of members listed per category
+    :param backend: (Optional) search backend name (see get_backend)
+    :return: Dict with the category, the languages, one row per page (title, source, present: one boolean
+             per language) and the number of missing pages per language
+    :raises SearchError: for an unknown backend
+    """
+    source = get_backend(backend)
+    category = source.category_title(refer_lang, category)
+    target_langs = list(dict.fromkeys(target_langs))
+
+    all_categories = [category]
+    with metrics.phase("traversal"):
+        all_categories.extend(get_all_subcategories(refer_lang, category, max_depth=max_depth,
+                                                    max_members=max_members, backend=backend))
+    listings = parallel_map(
+        lambda cat: list(metrics.timed_iter("members",
+                                            source.iter_member_presence(refer_lang, cat, target_langs, max_members))),
+        all_categories,
+    )
+
+    rows = []
+    seen_titles = set()
+    missing = dict.fromkeys(target_langs, 0)
+    for current_category, listing in zip(all_categories, listings):
+        for title, languages in listing:
+            if title in seen_titles:
+                continue
+            seen_titles.add(title)
+            present = [lang in languages for lang in target_langs]
+            for lang, exists in zip(target_langs, present):
+                if not exists:
+                    missing[lang] += 1
+            rows.append({"title": title, "source": current_category, "present": present})
+
+    return {
+        "category": category,
+        "languages": target_langs,
+        "articles": rows,
+        "missing": missing,
+        "categories": len(all_categories),
+    }
+
+
+class ApiBackend:
+    """
+    Search backend answering from the live Wikipedia and Wikidata APIs (default).
+    """
+    name = "api"
+
+    category_title = staticmethod(siteinfo.category_title)
+    resolve_reference_category = staticmethod(resolve_reference_category)
+    get_direct_subcategories = staticmethod(get_direct_subcategories)
+    iter_missing_category_members = staticmethod(iter_missing_category_members)
+    iter_missing_category_pages = staticmethod(iter_missing_category_pages)
+    iter_new_missing_pages = staticmethod(iter_new_missing_pages)
+    iter_member_presence = staticmethod(iter_member_presence)
+
+
+def get_backend(name=None):
+    """
+    Return a search backend.
+
+    :param name: 'api' (live APIs) or 'dump' (offline stores, see dump_store.py); default: SEARCH_BACKEND
+    :return: Backend object
+    :raises SearchError: for an unknown backend name
+    """
+    name = name or getattr(settings, "SEARCH_BACKEND", "api")
+    if name == "api":
+        return ApiBackend
+    if name == "dump":
+        from .dump_store import DumpBackend  # imports this module
+        return DumpBackend()
+    raise SearchError({"error": f"Unknown search backend: {name}"}, status=400)
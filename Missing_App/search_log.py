@@ -0,0 +1,128 @@
+"""
+Search history
+
+Every missing-articles search is logged in the database (SearchLog): language pair, category, depth, cap,
+backend, mode (JSON, streamed, background job), HTTP status, latency and number of Wikimedia calls. The
+prefetch_searches command reads it to warm the caches for the most popular searches.
+
+Logging never fails a search: database errors are logged and ignored. SEARCH_LOG_ENABLED turns it off.
+
+"""
+import functools
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from . import metrics
+from .models import SearchLog
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = 90
+SEARCH_FIELDS = ("edit_lang", "category", "refer_lang", "max_depth", "max_members", "backend")
+
+
+def is_enabled():
+    return getattr(settings, "SEARCH_LOG_ENABLED", True)
+
+
+def log_search(edit_lang, category, refer_lang, max_depth, max_members, backend, mode, status, latency,
+               calls=0):
+    """
+    :param edit_lang: Contribution language code
+    :param category: Category name in contribution language
+    :param refer_lang: Reference language code
+    :param max_depth: Maximum subcategory depth
+    :param max_members: Per-category cap (None: complete listings)
+    :param backend: Search backend name (None: SEARCH_BACKEND)
+    :param mode: SearchLog.MODE_JSON, MODE_STREAM, MODE_JOB or MODE_LARGE
+    :param status: HTTP status of the answer
+    :param latency: Seconds taken to answer
+    :param calls: Calls made to Wikimedia to answer
+    """
+    if not is_enabled():
+        return
+    try:
+        SearchLog.objects.create(edit_lang=edit_lang, category=category, refer_lang=refer_lang,
+                                 max_depth=max_depth, max_members=max_members, backend=backend or "", mode=mode,
+                                 status=status, latency_ms=round(latency * 1000), calls=calls)
+    except DatabaseError as e:
+        logger.warning("Search log write failed: %s", e)
+
+
+def _logged_stream(content, finish):
+    try:
+        yield from content
+    finally:
+        finish()
+
+
+def logged_search(view):
+    """
+    Decorator of the search view (request, edit_lang, category, refer_lang): logs every search it answers,
+    streamed ones when their last byte is sent.
+    """
+    @functools.wraps(view)
+    def wrapper(request, edit_lang, category, refer_lang):
+        start = time.perf_counter()
+        timings = metrics.current_timings()
+        response = view(request, edit_lang, category, refer_lang)
+        try:
+            max_depth = int(request.GET.get("max_depth", 1))
+            max_members = int(request.GET.get("max_members", 0)) or getattr(settings, "MAX_MEMBERS_PER_CATEGORY",
+                                                                             None)
+        except ValueError:
+            return response  # not a search
+
+        if request.GET.get("large") in ("1", "true"):
+            mode = SearchLog.MODE_LARGE
+        else:
+            mode = SearchLog.MODE_STREAM if response.streaming else SearchLog.MODE_JSON
+
+        def finish():
+            log_search(edit_lang, category, refer_lang, max_depth, max_members, request.GET.get("backend"), mode,
+                       response.status_code, time.perf_counter() - start,
+                       timings.upstream_calls() if timings is not None else 0)
+
+        if response.streaming:
+            response.streaming_content = _logged_stream(response.streaming_content, finish)
+        else:
+            finish()
+        return response
+    return wrapper
+
+
+def popular_searches(limit, days):
+    """
+    The searches asked most often recently (successful or revalidated answers only; large category mode
+    searches are left out, their results are not cached).
+
+    :param limit: Maximum number of searches
+    :param days: Days of history considered
+    :return: List of dicts: the search fields (edit_lang, category, refer_lang, max_depth, max_members,
+             backend), searches (times asked), calls (most Wikimedia calls one answer took) and last_searched
+    """
+    since = timezone.now() - timedelta(days=days)
+    rows = (SearchLog.objects.filter(created_at__gte=since, status__in=(200, 304))
+            .exclude(mode=SearchLog.MODE_LARGE)
+            .values(*SEARCH_FIELDS)
+            .annotate(searches=Count("id"), calls=Max("calls"), last_searched=Max("created_at"))
+            .order_by("-searches", "-last_searched"))
+    return list(rows[:limit])
+
+
+def prune(days=None):
+    """
+    Delete the history older than SEARCH_LOG_RETENTION_DAYS.
+
+    :param days: (Optional) retention overriding the setting
+    :return: Number of entries deleted
+    """
+    days = days if days is not None else getattr(settings, "SEARCH_LOG_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)
+    deleted, _ = SearchLog.objects.filter(created_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
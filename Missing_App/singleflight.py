@@ -0,0 +1,70 @@
+"""
+Single-flight coalescing of identical concurrent calls
+
+When several threads ask for the same key at the same time, only the first one runs the function; the
+others wait for it and receive the same result (or the same exception). Once the call has finished the key
+is forgotten, so later calls run again (caching is left to the callers).
+
+Results are shared between threads: callers must treat them as read-only.
+
+Usage:
+    _flights = SingleFlight()
+    data = _flights.do(("en", "Category:Art"), lambda: fetch(...))
+
+"""
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Registry of in-flight calls, keyed by any hashable value.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """
+        Run func, unless an identical call (same key) is already running: then wait for its result.
+
+        :param key: Hashable key identifying the call
+        :param func: Function without arguments
+        :return: Result of func
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        """
+        :return: Number of calls currently running
+        """
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,198 @@
+"""
+Per-language namespace tables for Wikipedia
+
+The namespace names of a wiki (e.g. 'Category' / 'تصنيف' / 'קטגוריה') almost never change, so they are
+fetched once per language with meta=siteinfo and then kept:
+- in process memory, for zero-cost lookups on every request
+- in Django's cache with a long TTL (WIKI_SITEINFO_CACHE_TIMEOUT), so other workers and restarts reuse them
+
+The table covers the localized names, the canonical (English) names and the namespace aliases, so titles
+can be built ('Category:' + name) and recognized ('Cat:Foo', 'category:foo', 'تصنيف:...') locally.
+
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics, wiki_client
+
+NAMESPACE_CATEGORY = 14
+NAMESPACE_PORTAL = 100
+
+DEFAULT_CACHE_TIMEOUT = 60 * 60 * 24 * 7  # one week
+
+_tables = {}  # lang -> namespace table
+_lock = threading.Lock()
+
+
+def _normalize(name):
+    """
+    Normalize a namespace name for lookups (case-insensitive, underscores as spaces).
+
+    :param name: Namespace name or alias
+    :return: Normalized key
+    """
+    return name.replace("_", " ").strip().casefold()
+
+
+def fetch_namespace_data(lang):
+    """
+    Fetch the namespaces and namespace aliases of a wiki.
+https://en.wikipedia.org/w/api.php?action=query&meta=siteinfo&siprop=namespaces|namespacealiases&format=json
+    :param lang: Wikipedia language code
+    :return: Decoded siteinfo JSON
+    """
+    params = {
+        "action": "query",
+        "meta": "siteinfo",
+        "siprop": "namespaces|namespacealiases",
+        "format": "json",
+    }
+    return wiki_client.api_get(lang, params)
+
+
+def parse_namespace_table(data):
+    """
+    Build the lookup table of a wiki from its siteinfo namespaces (API response or the
+    <dbname>-siteinfo-namespaces.json dump file, which has the same format).
+
+    :param data: Decoded siteinfo JSON
+    :return: Dict with 'names' (id -> localized name), 'canonical' (id -> canonical name)
+             and 'lookup' (normalized name/alias -> id)
+    """
+    query = data["query"]
+
+    names = {}
+    canonical = {}
+    lookup = {}
+    for key, namespace in query["namespaces"].items():
+        ns_id = int(key)
+        names[ns_id] = namespace["*"]
+        canonical[ns_id] = namespace.get("canonical", namespace["*"])
+        for name in (namespace["*"], namespace.get("canonical")):
+            if name:
+                lookup[_normalize(name)] = ns_id
+
+    for alias in query.get("namespacealiases", []):
+        lookup[_normalize(alias["*"])] = alias["id"]
+
+    return {"names": names, "canonical": canonical, "lookup": lookup}
+
+
+def fetch_namespace_table(lang):
+    """
+    Fetch the namespaces and namespace aliases of a wiki and build its lookup table.
+
+    :param lang: Wikipedia language code
+    :return: Namespace table (see parse_namespace_table)
+    """
+    return parse_namespace_table(fetch_namespace_data(lang))
+
+
+def set_namespace_table(lang, table):
+    """
+    Install a namespace table obtained elsewhere (e.g. from a dump), so lookups need no API call.
+
+    :param lang: Wikipedia language code
+    :param table: Namespace table (see parse_namespace_table)
+    """
+    with _lock:
+        _tables[lang] = table
+
+
+def get_namespace_table(lang):
+    """
+    Return the namespace table of a wiki: from memory, else from the cache, else from the API.
+
+    :param lang: Wikipedia language code
+    :return: Namespace table (see fetch_namespace_table)
+    """
+    table = _tables.get(lang)
+    if table is not None:
+        return table
+
+    cache_key = f"siteinfo_namespaces:{lang}"
+    table = cache.get(cache_key)
+    metrics.record_cache("siteinfo", "miss" if table is None else "hit")
+    if table is None:
+        table = fetch_namespace_table(lang)
+        timeout = getattr(settings, "WIKI_SITEINFO_CACHE_TIMEOUT", DEFAULT_CACHE_TIMEOUT)
+        cache.set(cache_key, table, timeout=timeout)
+
+    with _lock:
+        _tables[lang] = table
+    return table
+
+
+def clear():
+    """
+    Forget the namespace tables kept in process memory.
+    """
+    with _lock:
+        _tables.clear()
+
+
+def get_namespace_name(lang, ns_id):
+    """
+    Return the localized name of a namespace (e.g. 14 -> 'Category' in en, 'تصنيف' in ar).
+
+    :param lang: Wikipedia language code
+    :param ns_id: Namespace number
+    :return: Localized namespace name
+    """
+    return get_namespace_table(lang)["names"][ns_id]
+
+
+def split_title(lang, title):
+    """
+    Split a page title into its namespace number and its name, recognizing localized names and aliases.
+
+    :param lang: Wikipedia language code
+    :param title: Page title (e.g. 'Category:Art', 'Cat:Art', 'Art')
+    :return: Tuple (namespace number, name without prefix); namespace 0 when there is no known prefix
+    """
+    if ":" in title:
+        prefix, name = title.split(":", 1)
+        ns_id = get_namespace_table(lang)["lookup"].get(_normalize(prefix))
+        if ns_id is not None and ns_id != 0:
+            return ns_id, name.strip()
+    return 0, title
+
+
+def namespace_title(lang, ns_id, name):
+    """
+    Build a full title in a namespace, using the localized namespace name.
+    A name that already carries a prefix of that namespace (in any alias) is re-prefixed, not doubled.
+
+    :param lang: Wikipedia language code
+    :param ns_id: Namespace number
+    :param name: Page name, with or without the namespace prefix
+    :return: Full title (e.g. 'Category:Art')
+    """
+    title_ns, bare_name = split_title(lang, name)
+    if title_ns == ns_id:
+        name = bare_name
+    return f"{get_namespace_name(lang, ns_id)}:{name}"
+
+
+def category_title(lang, name):
+    """
+    Build the full category title of a category name in a given wiki.
+
+    :param lang: Wikipedia language code
+    :param name: Category name, with or without prefix
+    :return: Full category title (e.g. 'تصنيف:صحة')
+    """
+    return namespace_title(lang, NAMESPACE_CATEGORY, name)
+
+
+def is_category_title(lang, title):
+    """
+    Check whether a title belongs to the category namespace of a wiki.
+
+    :param lang: Wikipedia language code
+    :param title: Page title
+    :return: True if the title has a category prefix (localized, canonical or alias)
+    """
+    return split_title(lang, title)[0] == NAMESPACE_CATEGORY
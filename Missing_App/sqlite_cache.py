@@ -0,0 +1,361 @@
+"""
+Django cache backend shared by all worker processes, on a local SQLite file
+
+LocMemCache is private to each worker process and lost on restart; Toolforge has no Redis or memcached.
+This backend keeps the cache in one SQLite file (LOCATION) that every process opens:
+- WAL journal (readers never block the writer) and a memory-mapped file (OPTIONS MMAP_SIZE) for fast reads
+- writes are short IMMEDIATE transactions, so concurrent processes and threads serialize safely
+- entries expire with their timeout, and the cache is bounded by entry count (OPTIONS MAX_ENTRIES) and
+  size (OPTIONS MAX_BYTES): when a write goes past a bound, expired entries and then the least recently
+  used ones are evicted (1 / CULL_FREQUENCY of the bound); last access times are written at most every
+  ACCESS_RESOLUTION seconds per entry, so reads stay read-only
+- add, get_or_set and incr are atomic across processes: with get_or_set, the first stored value wins and
+  every caller receives it
+- values are pickled, and compressed with zlib above COMPRESS_MIN_BYTES
+- the schema is created once per process and file, not by every thread's connection
+
+Usage (settings.py):
+    CACHES = {"default": {
+        "BACKEND": "Missing_App.sqlite_cache.SQLiteCache",
+        "LOCATION": BASE_DIR / "cache.sqlite3",
+        "OPTIONS": {"MAX_ENTRIES": 100000, "MAX_BYTES": 256 * 1024 * 1024},
+    }}
+
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    compressed INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_stats VALUES (1, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_inserted AFTER INSERT ON cache BEGIN
+    UPDATE cache_stats SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_deleted AFTER DELETE ON cache BEGIN
+    UPDATE cache_stats SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_resized AFTER UPDATE OF size ON cache BEGIN
+    UPDATE cache_stats SET bytes = bytes - OLD.size + NEW.size WHERE id = 1;
+END;
+"""
+
+# Insert, or replace an entry only if it has expired (add semantics); a plain set replaces in any case
+UPSERT = """
+INSERT INTO cache (key, value, compressed, size, expires, accessed) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET value = excluded.value, compressed = excluded.compressed,
+    size = excluded.size, expires = excluded.expires, accessed = excluded.accessed
+"""
+UPSERT_IF_EXPIRED = UPSERT + " WHERE cache.expires IS NOT NULL AND cache.expires <= ?"
+
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_ACCESS_RESOLUTION = 60  # seconds
+DEFAULT_COMPRESS_MIN_BYTES = 4096
+DEFAULT_MMAP_SIZE = 64 * 1024 * 1024
+BUSY_TIMEOUT = 10  # seconds a write waits for the lock held by another process
+QUERY_CHUNK = 500  # keys per IN (...) query
+
+_schema_lock = threading.Lock()
+_schema_ready = set()  # (pid, path) of the files whose schema this process has created
+
+
+def _create_schema(connection):
+    connection.executescript("BEGIN IMMEDIATE;" + SCHEMA + "COMMIT;")
+
+
+def _ensure_schema(connection, path):
+    """
+    Create the schema of a cache file, unless this process already did.
+    """
+    key = (os.getpid(), path)
+    if key in _schema_ready:
+        return
+    with _schema_lock:
+        if key not in _schema_ready:
+            _create_schema(connection)
+            _schema_ready.add(key)
+
+
+class SQLiteCache(BaseCache):
+    """
+    Cross-process cache backend on a SQLite file (see the module docstring for the options).
+
+    :param location: Path of the SQLite file
+    :param params: Cache settings (TIMEOUT, KEY_PREFIX, VERSION, OPTIONS, ...)
+    """
+
+    def __init__(self, location, params):
+        options = params.get("OPTIONS") or {}
+        params = {**params, "OPTIONS": {**options, "MAX_ENTRIES": options.get("MAX_ENTRIES", DEFAULT_MAX_ENTRIES)}}
+        super().__init__(params)
+        self.path = str(location)
+        self.max_bytes = int(options.get("MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.access_resolution = options.get("ACCESS_RESOLUTION", DEFAULT_ACCESS_RESOLUTION)
+        self.compress_min_bytes = options.get("COMPRESS_MIN_BYTES", DEFAULT_COMPRESS_MIN_BYTES)
+        self.mmap_size = options.get("MMAP_SIZE", DEFAULT_MMAP_SIZE)
+        self._local = threading.local()
+
+    # Connections
+
+    def _connection(self):
+        """
+        :return: sqlite3.Connection of this thread (reopened after a fork)
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        _ensure_schema(connection, self.path)
+        self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    @staticmethod
+    def _write(connection):
+        return _WriteTransaction(connection)
+
+    # Serialization
+
+    def _encode(self, value):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) >= self.compress_min_bytes:
+            return zlib.compress(data, 1), 1
+        return data, 0
+
+    @staticmethod
+    def _decode(data, compressed):
+        return pickle.loads(zlib.decompress(data) if compressed else data)
+
+    # Eviction
+
+    def _cull(self, connection, now):
+        """
+        Evict expired entries, then the least recently used ones, when a bound is exceeded
+        (inside the write transaction).
+        """
+        entries, size = connection.execute("SELECT entries, bytes FROM cache_stats WHERE id = 1").fetchone()
+        if entries <= self._max_entries and size <= self.max_bytes:
+            return
+        connection.execute("DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?", (now,))
+        entries, size = connection.execute("SELECT entries, bytes FROM cache_stats WHERE id = 1").fetchone()
+
+        keep = 1 - 1 / self._cull_frequency if self._cull_frequency else 0
+        excess_entries = entries - int(self._max_entries * keep) if entries > self._max_entries else 0
+        excess_bytes = size - int(self.max_bytes * keep) if size > self.max_bytes else 0
+        if not excess_entries and not excess_bytes:
+            return
+        victims = []
+        for key, entry_size in connection.execute("SELECT key, size FROM cache ORDER BY accessed"):
+            if len(victims) >= excess_entries and excess_bytes <= 0:
+                break
+            victims.append(key)
+            excess_bytes -= entry_size
+        for i in range(0, len(victims), QUERY_CHUNK):
+            chunk = victims[i:i + QUERY_CHUNK]
+            connection.execute(f"DELETE FROM cache WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+
+    # Django cache API
+
+    def _store(self, connection, key, value, timeout, only_if_missing=False):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        if expires is not None and expires <= now:
+            connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return False
+        data, compressed = self._encode(value)
+        row = (key, data, compressed, len(data), expires, now)
+        if only_if_missing:
+            cursor = connection.execute(UPSERT_IF_EXPIRED, row + (now,))
+        else:
+            cursor = connection.execute(UPSERT, row)
+        if cursor.rowcount:
+            self._cull(connection, now)
+        return cursor.rowcount > 0
+
+    def _touch_access(self, connection, keys, now):
+        """
+        Record an access to entries read, unless it was recorded less than ACCESS_RESOLUTION seconds ago.
+        """
+        try:
+            with self._write(connection):
+                for i in range(0, len(keys), QUERY_CHUNK):
+                    chunk = keys[i:i + QUERY_CHUNK]
+                    connection.execute(
+                        f"UPDATE cache SET accessed = ? WHERE key IN ({','.join('?' * len(chunk))})",
+                        [now] + chunk,
+                    )
+        except sqlite3.OperationalError:
+            pass  # busy: the LRU order is only approximate
+
+    def _read(self, keys):
+        """
+        :param keys: Validated keys
+        :return: Dict key -> value of the keys present and not expired
+        """
+        connection = self._connection()
+        now = time.time()
+        found = {}
+        stale_access = []
+        for i in range(0, len(keys), QUERY_CHUNK):
+            chunk = keys[i:i + QUERY_CHUNK]
+            rows = connection.execute(
+                f"SELECT key, value, compressed, expires, accessed FROM cache "
+                f"WHERE key IN ({','.join('?' * len(chunk))})", chunk,
+            )
+            for key, data, compressed, expires, accessed in rows:
+                if expires is not None and expires <= now:
+                    continue
+                found[key] = self._decode(data, compressed)
+                if now - accessed >= self.access_resolution:
+                    stale_access.append(key)
+        if stale_access:
+            self._touch_access(connection, stale_access, now)
+        return found
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._read([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        return {keys[key]: value for key, value in self._read(list(keys)).items()}
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute("SELECT expires FROM cache WHERE key = ?", (key,)).fetchone()
+        return row is not None and (row[0] is None or row[0] > time.time())
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        with self._write(connection):
+            self._store(connection, key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        connection = self._connection()
+        with self._write(connection):
+            for key, value in data.items():
+                self._store(connection, self.make_and_validate_key(key, version=version), value, timeout)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        with self._write(connection):
+            return self._store(connection, key, value, timeout, only_if_missing=True)
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Return the value of a key, storing default (called if callable) when it is missing.
+        Atomic across processes: if several callers race, the first stored value wins and is returned to all.
+        """
+        value = self.get(key, self._missing_key, version=version)
+        if value is not self._missing_key:
+            return value
+        if callable(default):
+            default = default()
+        validated = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        with self._write(connection):
+            if self._store(connection, validated, default, timeout, only_if_missing=True):
+                return default
+            row = connection.execute("SELECT value, compressed, expires FROM cache WHERE key = ?",
+                                     (validated,)).fetchone()
+        if row is None or (row[2] is not None and row[2] <= time.time()):
+            return default  # timeout <= 0: nothing is kept
+        return self._decode(row[0], row[1])
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        connection = self._connection()
+        with self._write(connection):
+            cursor = connection.execute(
+                "UPDATE cache SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                (self.get_backend_timeout(timeout), now, key, now),
+            )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        with self._write(connection):
+            row = connection.execute("SELECT value, compressed, expires FROM cache WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is None or (row[2] is not None and row[2] <= time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = self._decode(row[0], row[1]) + delta
+            data, compressed = self._encode(value)
+            connection.execute("UPDATE cache SET value = ?, compressed = ?, size = ? WHERE key = ?",
+                               (data, compressed, len(data), key))
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        with self._write(connection):
+            cursor = connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+        return cursor.rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        connection = self._connection()
+        with self._write(connection):
+            for i in range(0, len(keys), QUERY_CHUNK):
+                chunk = keys[i:i + QUERY_CHUNK]
+                connection.execute(f"DELETE FROM cache WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+
+    def clear(self):
+        connection = self._connection()
+        with self._write(connection):
+            connection.execute("DELETE FROM cache")
+
+    def stats(self):
+        """
+        :return: Dict with the number of entries and their total size in bytes
+        """
+        entries, size = self._connection().execute("SELECT entries, bytes FROM cache_stats WHERE id = 1").fetchone()
+        return {"entries": entries, "bytes": size}
+
+
+class _WriteTransaction:
+    """
+    BEGIN IMMEDIATE ... COMMIT (ROLLBACK on error): takes the write lock at once, so concurrent writers wait
+    (busy timeout) instead of failing when upgrading a read lock.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
@@ -1,3 +1,1264 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone as django_timezone
+
+from . import (category_index, dump_store, graph_store, http_cache, jobs, languages, large_search, metadata, ratelimit,
+               replay, result_cache, result_sets, search, singleflight, siteinfo, sqlite_cache, wiki_client, wikidata)
+from .models import CategoryListing, CategoryMember, PageLanglink, SearchJob, SearchLog
+from .sqlite_cache import SQLiteCache
+
+# Small synthetic category tree (he:Root / en:Category:Root, 4 levels deep, with a cycle), recorded with
+# the benchmark_search command
+SAMPLE_FIXTURE = Path(__file__).resolve().parent / "data" / "replay" / "sample_tree.json"
+# Small dumps of en (Category:Root <-> Category:Sub) and he, with escapes and multi-row INSERTs
+SAMPLE_DUMPS = Path(__file__).resolve().parent / "data" / "dump_sample"
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests"}},
+    CATEGORY_STORE_ENABLED=False,
+    LANGUAGE_CATALOG_REFRESH_INTERVAL=0,
+    WIKI_HTTP_RATE=0,
+)
+class ReplayTestCase(TestCase):
+    """
+    Base class: every test starts with empty caches and the sample fixture loaded.
+    """
+
+    def setUp(self):
+        cache.clear()
+        category_index.clear()
+        siteinfo.clear()
+        wiki_client.reset_session()
+        self.fixture = replay.Fixture.load(SAMPLE_FIXTURE)
+
+    def tearDown(self):
+        wiki_client.reset_session()
+
+    def search(self, max_depth):
+        url = reverse("get_articles_from_other_languages", args=["he", "Root", "en"])
+        return self.client.get(url, {"max_depth": max_depth})
+
+
+def add_response(fixture, url, params, body, status=200, headers=None):
+    """
+    Record a JSON response to a GET request in a replay fixture.
+    """
+    request = requests.Request("GET", url, params=params).prepare()
+    fixture.add("GET", request.url, status, {"Content-Type": "application/json", **(headers or {})},
+                json.dumps(body))
+
+
+class WikiClientTests(ReplayTestCase):
+
+    @override_settings(WIKI_HTTP_POOL_MAXSIZE=7, WIKI_HTTP_RETRIES=2)
+    def test_calls_share_one_pooled_session(self):
+        wiki_client.reset_session()
+        session = wiki_client.get_session()
+        self.assertIs(wiki_client.get_session(), session)
+        self.assertIn("multilingual-missing-articles", session.headers["User-Agent"])
+        adapter = session.get_adapter("https://en.wikipedia.org/w/api.php")
+        self.assertEqual(adapter._pool_maxsize, 7)
+        self.assertEqual(adapter.max_retries.total, 2)
+        self.assertIn(503, adapter.max_retries.status_forcelist)
+
+    def test_api_continue_follows_continuation(self):
+        fixture = replay.Fixture()
+        url = wiki_client.WIKI_API_URL.format(lang="en")
+        params = {"action": "query", "list": "categorymembers", "cmtitle": "Category:X", "format": "json"}
+        add_response(fixture, url, params, {"continue": {"cmcontinue": "page|2", "continue": "-||"},
+                                            "query": {"categorymembers": [{"title": "A"}]}})
+        add_response(fixture, url, {**params, "cmcontinue": "page|2", "continue": "-||"},
+                     {"query": {"categorymembers": [{"title": "B"}]}})
+        adapter = replay.ReplayAdapter(fixture)
+        with replay.use_adapter(adapter):
+            pages = [member["title"] for data in wiki_client.api_continue("en", params)
+                     for member in data["query"]["categorymembers"]]
+        self.assertEqual(pages, ["A", "B"])
+        self.assertEqual(adapter.calls, 2)
+
+
+def throttled_response(retry_after):
+    response = requests.Response()
+    response.status_code = 429
+    response.headers["Retry-After"] = retry_after
+    response._content = b"{}"
+    return response
+
+
+class RateLimitTests(ReplayTestCase):
+
+    def test_token_bucket_paces_requests_after_a_burst(self):
+        limiter = ratelimit.HostLimiter(rate=20, burst=2, max_concurrency=8)
+        start = time.monotonic()
+        for _ in range(2):
+            with limiter.slot():
+                pass
+        self.assertLess(time.monotonic() - start, 0.04)
+        with limiter.slot():
+            pass
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)  # a token every 0.05 s
+
+    def test_window_halves_on_throttling_and_grows_back(self):
+        limiter = ratelimit.HostLimiter(rate=0, burst=1, max_concurrency=8)
+        limiter.record_throttle(0)
+        limiter.record_throttle(0)
+        self.assertEqual(limiter.snapshot()["concurrency"], 2)
+        limiter.record_success()
+        limiter.record_success()
+        self.assertEqual(limiter.snapshot()["concurrency"], 2)  # +1 per window of successes
+        for _ in range(100):
+            limiter.record_success()
+        self.assertEqual(limiter.snapshot(), {"concurrency": 8, "in_flight": 0, "paused_for": 0.0, "throttled": 2})
+
+        limiter = ratelimit.HostLimiter(rate=0, burst=1, max_concurrency=1)
+        limiter.acquire()
+        waiter = threading.Thread(target=limiter.acquire)
+        waiter.start()
+        waiter.join(0.05)
+        self.assertTrue(waiter.is_alive())  # the window is full
+        limiter.release()
+        waiter.join(1)
+        self.assertFalse(waiter.is_alive())
+
+    def test_throttled_requests_are_retried_after_retry_after(self):
+        ok = requests.Response()
+        ok.status_code, ok._content = 200, b'{"query": {}}'
+        session = mock.Mock()
+        session.get.side_effect = [throttled_response("0"), ok]
+        with mock.patch.object(wiki_client, "get_session", return_value=session):
+            self.assertEqual(wiki_client.api_get("en", {"action": "query"}), {"query": {}})
+        self.assertEqual(session.get.call_count, 2)
+        self.assertEqual(wiki_client.get_limiter("en.wikipedia.org").snapshot()["throttled"], 1)
+
+    @override_settings(WIKI_HTTP_MAX_RETRY_AFTER=0.1)
+    def test_a_long_retry_after_fails_at_once_and_pauses_the_host_briefly(self):
+        session = mock.Mock()
+        session.get.return_value = throttled_response("3600")
+        with mock.patch.object(wiki_client, "get_session", return_value=session):
+            with self.assertRaises(wiki_client.UpstreamThrottled) as raised:
+                wiki_client.get("https://en.wikipedia.org/w/api.php")
+            self.assertEqual(raised.exception.retry_after, 3600)
+            self.assertEqual(session.get.call_count, 1)
+            self.assertLessEqual(wiki_client.get_limiter("en.wikipedia.org").snapshot()["paused_for"], 0.1)
+            start = time.monotonic()
+            with self.assertRaises(wiki_client.UpstreamThrottled):
+                wiki_client.get("https://en.wikipedia.org/w/api.php")
+        self.assertLess(time.monotonic() - start, 1)
+
+
+class SiteinfoTests(ReplayTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.fixture = replay.Fixture()
+        add_response(self.fixture, wiki_client.WIKI_API_URL.format(lang="ar"),
+                     {"action": "query", "meta": "siteinfo", "siprop": "namespaces|namespacealiases",
+                      "format": "json"},
+                     {"query": {"namespaces": {"0": {"id": 0, "*": ""},
+                                               "14": {"id": 14, "*": "تصنيف", "canonical": "Category"}},
+                                "namespacealiases": [{"id": 14, "*": "Cat"}]}})
+
+    def test_titles_are_built_and_recognized_locally(self):
+        adapter = replay.ReplayAdapter(self.fixture)
+        with replay.use_adapter(adapter):
+            self.assertEqual(search.get_prefix("ar"), "تصنيف")
+            self.assertEqual(siteinfo.category_title("ar", "صحة"), "تصنيف:صحة")
+            self.assertEqual(siteinfo.category_title("ar", "category:صحة"), "تصنيف:صحة")
+            self.assertTrue(siteinfo.is_category_title("ar", "Cat:صحة"))
+            self.assertFalse(siteinfo.is_category_title("ar", "صحة: مقالة"))
+        self.assertEqual(adapter.calls, 1)
+
+    def test_tables_are_shared_through_the_cache(self):
+        adapter = replay.ReplayAdapter(self.fixture)
+        with replay.use_adapter(adapter):
+            siteinfo.get_namespace_table("ar")
+            siteinfo.clear()  # as another worker process would start
+            self.assertEqual(siteinfo.get_namespace_name("ar", 14), "تصنيف")
+        self.assertEqual(adapter.calls, 1)
+
+
+class WikidataTests(ReplayTestCase):
+
+    def add_entities(self, fixture, lang, title, entities):
+        add_response(fixture, wiki_client.WIKIDATA_API_URL,
+                     {"action": "wbgetentities", "sites": f"{lang}wiki", "titles": title, "props": "sitelinks",
+                      "normalize": 1, "format": "json"},
+                     {"entities": entities, "success": 1})
+
+    def test_an_item_is_cached_under_all_its_sitelinks(self):
+        fixture = replay.Fixture()
+        self.add_entities(fixture, "en", "Category:art", {"Q1": {"type": "item", "id": "Q1", "sitelinks": {
+            "enwiki": {"site": "enwiki", "title": "Category:Art"},
+            "hewiki": {"site": "hewiki", "title": "קטגוריה:אמנות"},
+            "enwikiquote": {"site": "enwikiquote", "title": "Category:Art"}}}})
+        adapter = replay.ReplayAdapter(fixture)
+        with replay.use_adapter(adapter):
+            sitelinks = wikidata.get_sitelinks("en", "Category:art")
+            self.assertEqual(sitelinks, {"en": "Category:Art", "he": "קטגוריה:אמנות"})
+            self.assertEqual(wikidata.get_sitelinks("he", "קטגוריה:אמנות"), sitelinks)
+            self.assertEqual(wikidata.get_sitelinks("en", "Category:Art"), sitelinks)
+            self.assertEqual(wikidata.get_sitelinks("en", "Category:art"), sitelinks)
+        self.assertEqual(adapter.calls, 1)
+
+    @override_settings(WIKIDATA_NEGATIVE_CACHE_TIMEOUT=120, WIKIDATA_SITELINKS_CACHE_TIMEOUT=3600)
+    def test_pages_without_item_are_cached_for_a_shorter_time(self):
+        fixture = replay.Fixture()
+        self.add_entities(fixture, "en", "Category:Foo",
+                          {"-1": {"site": "enwiki", "title": "Category:Foo", "missing": ""}})
+        adapter = replay.ReplayAdapter(fixture)
+        with replay.use_adapter(adapter), mock.patch.object(cache, "set", wraps=cache.set) as cache_set:
+            self.assertEqual(wikidata.get_sitelinks("en", "Category:Foo"), {})
+            self.assertEqual(wikidata.get_sitelinks("en", "Category:Foo"), {})
+        self.assertEqual(adapter.calls, 1)
+        self.assertEqual(cache_set.call_args.kwargs["timeout"], 120)
+
+
+class CategoryIndexTests(ReplayTestCase):
+
+    def test_a_cut_listing_covers_the_prefixes_sorting_before_its_last_title(self):
+        self.assertTrue(category_index._covers([], True, "Hist"))
+        self.assertFalse(category_index._covers([], False, "Hist"))
+        self.assertTrue(category_index._covers(["Hi", "History", "Hollywood"], False, "Hist"))
+        self.assertFalse(category_index._covers(["Hi", "History", "History of art"], False, "History"))
+        self.assertFalse(category_index._covers(["Ha", "Hi"], False, "Hist"))
+        # spaces compare as underscores, as in the database keys allcategories is sorted by
+        self.assertFalse(category_index._covers(["History", "History of art"], False, "History "))
+
+    def test_longer_prefixes_are_answered_from_the_index(self):
+        fixture = replay.Fixture()
+        url = wiki_client.WIKI_API_URL.format(lang="en")
+        params = {"action": "query", "list": "allcategories", "aclimit": "max", "format": "json"}
+        add_response(fixture, url, {**params, "acprefix": "Hi"},
+                     {"continue": {"accontinue": "Hobbies", "continue": "-||"}, "query": {"allcategories": [
+                         {"*": "Hi"}, {"*": "History"}, {"*": "History of art"}, {"*": "Hollywood"}]}})
+        add_response(fixture, url, {**params, "acprefix": "Hz"}, {"query": {"allcategories": []}})
+        adapter = replay.ReplayAdapter(fixture)
+        with replay.use_adapter(adapter):
+            self.assertEqual(len(category_index.search_categories("en", "hi")), 4)
+            self.assertEqual(category_index.search_categories("en", "hist"), ["History", "History of art"])
+            self.assertEqual(category_index.search_categories("en", "history_of"), ["History of art"])
+            self.assertEqual(adapter.calls, 1)
+            self.assertEqual(category_index.search_categories("en", "hz"), [])
+        self.assertEqual(adapter.calls, 2)
+
+    def test_outdated_listings_are_fetched_again(self):
+        fixture = replay.Fixture()
+        url = wiki_client.WIKI_API_URL.format(lang="en")
+        params = {"action": "query", "list": "allcategories", "aclimit": "max", "format": "json"}
+        add_response(fixture, url, {**params, "acprefix": "Hi"}, {"query": {"allcategories": [{"*": "History"}]}})
+        add_response(fixture, url, {**params, "acprefix": "Hist"},
+                     {"query": {"allcategories": [{"*": "History"}, {"*": "Historians"}]}})
+        adapter = replay.ReplayAdapter(fixture)
+        with replay.use_adapter(adapter), override_settings(CATEGORY_INDEX_TTL=60):
+            category_index.search_categories("en", "hi")
+            category_index.search_categories("en", "hist")
+            self.assertEqual(adapter.calls, 1)
+            titles, complete, fetched_at = category_index._index[("en", "Hi")]
+            category_index._index[("en", "Hi")] = (titles, complete, fetched_at - 61)
+            self.assertEqual(category_index.search_categories("en", "hist"), ["History", "Historians"])
+        self.assertEqual(adapter.calls, 2)  # the outdated "Hi" listing no longer covers "Hist"
+        self.assertNotIn(("en", "Hi"), category_index._index)
+
+
+SITEMATRIX_RESPONSE = {"sitematrix": {
+    "count": 4,
+    "0": {"code": "be-tarask", "name": "беларуская (тарашкевіца)", "localname": "Belarusian (Taraškievica)",
+          "dir": "ltr",
+          "site": [{"url": "https://be-tarask.wikipedia.org", "dbname": "be_x_oldwiki", "code": "wiki"}]},
+    "1": {"code": "he", "name": "עברית", "localname": "Hebrew", "dir": "rtl",
+          "site": [{"url": "https://he.wikipedia.org", "dbname": "hewiki", "code": "wiki"},
+                   {"url": "https://he.wiktionary.org", "dbname": "hewiktionary", "code": "wiktionary"}]},
+    "2": {"code": "mo", "name": "молдовеняскэ", "localname": "Moldovan",
+          "site": [{"url": "https://mo.wikipedia.org", "dbname": "mowiki", "code": "wiki", "closed": ""}]},
+    "specials": [{"url": "https://commons.wikimedia.org", "dbname": "commonswiki", "code": "commons"}],
+}}
+
+
+class LanguageCatalogTests(TestCase):
+
+    def test_sitematrix_is_indexed(self):
+        catalog = languages.LanguageCatalog(languages.parse_sitematrix(SITEMATRIX_RESPONSE))
+        self.assertEqual([entry["code"] for entry in catalog.languages], ["be-tarask", "he", "mo"])
+        self.assertEqual(catalog.dbname("be-tarask"), "be_x_oldwiki")
+        self.assertEqual(catalog.code_for_dbname("be_x_oldwiki"), "be-tarask")
+        self.assertIsNone(catalog.code_for_dbname("hewiktionary"))
+        self.assertEqual(catalog.hostname("he"), "he.wikipedia.org")
+        self.assertTrue(catalog.is_valid("mo"))  # closed editions stay listed, as in the live sitematrix
+        self.assertTrue(catalog.get("mo")["closed"])
+        self.assertFalse(catalog.is_valid("xx"))
+        self.assertEqual(catalog.as_list()[1], {"code": "he", "name": "Hebrew", "native_name": "עברית"})
+        self.assertEqual(len(catalog.as_list()), 3)
+
+    def test_refresh_command_reads_a_saved_response(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        response, output = Path(directory.name) / "response.json", Path(directory.name) / "sitematrix.json"
+        response.write_text(json.dumps(SITEMATRIX_RESPONSE), encoding="utf-8")
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                                                   "LOCATION": "catalog-tests"}}), \
+                mock.patch.object(languages, "_catalog", None):  # the command installs the catalog it built
+            call_command("refresh_sitematrix", input=str(response), output=str(output), stdout=StringIO())
+        catalog = languages.load_snapshot(output)
+        self.assertEqual(catalog.dbname("be-tarask"), "be_x_oldwiki")
+        self.assertGreater(catalog.generated_at, 0)
+
+    def test_bundled_snapshot_is_refreshed_once_outdated(self):
+        bundled = languages.load_snapshot()
+        self.assertEqual(bundled.dbname("be-tarask"), "be_x_oldwiki")
+        self.assertEqual(bundled.get("he")["native_name"], "עברית")
+        self.assertEqual([entry["code"] for entry in bundled.languages if not entry["native_name"]], [])
+        for interval, refreshed in ((bundled.age() + 3600, False), (3600, True)):
+            with override_settings(LANGUAGE_CATALOG_REFRESH_INTERVAL=interval), \
+                    mock.patch.object(languages, "_catalog", bundled), \
+                    mock.patch.object(languages, "refresh_in_background") as refresh:
+                languages.get_catalog()
+            self.assertEqual(refresh.called, refreshed)
+
+
+EN_NAMESPACES = {"query": {"namespaces": {"0": {"id": 0, "*": ""},
+                                           "14": {"id": 14, "*": "Category", "canonical": "Category"}}}}
+
+
+class MissingFilterTests(ReplayTestCase):
+
+    def test_langlinks_split_over_responses_are_merged(self):
+        fixture = replay.Fixture()
+        url = wiki_client.WIKI_API_URL.format(lang="en")
+        params = {"action": "query", "generator": "categorymembers", "gcmtitle": "Category:X", "gcmtype": "page",
+                  "gcmlimit": "max", "prop": "langlinks", "lllang": "he", "lllimit": "max", "format": "json"}
+        add_response(fixture, url, params, {"continue": {"llcontinue": "2|he", "continue": "||"},
+                                            "query": {"pages": {"1": {"title": "A"}, "2": {"title": "B"}}}})
+        add_response(fixture, url, {**params, "llcontinue": "2|he", "continue": "||"},
+                     {"batchcomplete": "", "query": {"pages": {"1": {"title": "A"}, "2": {
+                         "title": "B", "langlinks": [{"lang": "he", "*": "ב"}]}}}})
+        with replay.use_adapter(replay.ReplayAdapter(fixture)):
+            self.assertEqual(list(search.iter_member_langlinks("en", "Category:X", "he")),
+                             [(1, "A", False), (2, "B", True)])
+            self.assertEqual(list(search.iter_missing_category_members("en", "Category:X", "he")), ["A"])
+
+
+class TraversalTests(ReplayTestCase):
+
+    def setUp(self):
+        super().setUp()
+        siteinfo.set_namespace_table("en", siteinfo.parse_namespace_table(EN_NAMESPACES))
+        self.wiki = FakeCategoryWiki()
+        never = datetime(2000, 1, 1, tzinfo=timezone.utc)
+        tree = {"Root": ["A", "B"], "A": ["C", "Root"], "B": ["D"], "C": ["E"], "D": [], "E": []}
+        self.wiki.subcategories = {f"Category:{name}": {f"Category:{child}": never for child in children}
+                                   for name, children in tree.items()}
+        patcher = mock.patch.object(wiki_client, "api_continue", self.wiki.api_continue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_tree_is_fetched_level_by_level_in_depth_first_order(self):
+        subcategories = search.get_all_subcategories("en", "Root", max_depth=2)
+        self.assertEqual(subcategories, ["Category:A", "Category:C", "Category:Root", "Category:B", "Category:D"])
+        fetched = [call["cmtitle"] for call in self.wiki.calls]
+        self.assertEqual(sorted(fetched), ["Category:A", "Category:B", "Category:Root"])  # once each
+
+
+class MemberListingTests(ReplayTestCase):
+
+    def test_listing_follows_continuation_and_stops_at_the_limit(self):
+        fixture = replay.Fixture()
+        url = wiki_client.WIKI_API_URL.format(lang="en")
+        params = {"action": "query", "list": "categorymembers", "cmtitle": "Category:X", "cmtype": "page",
+                  "cmlimit": "max", "format": "json"}
+        first = {"continue": {"cmcontinue": "page|2", "continue": "-||"},
+                 "query": {"categorymembers": [{"title": "A"}, {"title": "B"}]}}
+        add_response(fixture, url, params, first)
+        add_response(fixture, url, {**params, "cmcontinue": "page|2", "continue": "-||"},
+                     {"query": {"categorymembers": [{"title": "C"}]}})
+        add_response(fixture, url, {**params, "cmlimit": 2}, first)
+        adapter = replay.ReplayAdapter(fixture)
+        with replay.use_adapter(adapter):
+            members = search.iter_category_members("en", "Category:X")
+            self.assertEqual([member["title"] for member in members], ["A", "B", "C"])
+            adapter.reset()
+            members = search.iter_category_members("en", "Category:X", limit=2)
+            self.assertEqual([member["title"] for member in members], ["A", "B"])
+        self.assertEqual(adapter.calls, 1)  # the continuation is not requested
+
+
+class MemberPresenceTests(ReplayTestCase):
+
+    def add_listing(self, fixture, target, pages):
+        add_response(fixture, wiki_client.WIKI_API_URL.format(lang="en"),
+                     {"action": "query", "generator": "categorymembers", "gcmtitle": "Category:Root",
+                      "gcmtype": "page", "gcmlimit": "max", "prop": "langlinks", "lllang": target, "lllimit": "max",
+                      "format": "json"},
+                     {"query": {"pages": {str(pageid): {
+                         "pageid": pageid, "ns": 0, "title": title,
+                         **({"langlinks": [{"lang": target, "*": title}]} if has_langlink else {}),
+                     } for pageid, title, has_langlink in pages}}, "batchcomplete": ""})
+
+    @override_settings(CATEGORY_STORE_ENABLED=True, CATEGORY_STORE_PRUNE_INTERVAL=None)
+    def test_each_target_language_is_checked_on_its_own(self):
+        graph_store.save_members("en", "Category:Root", "he", [(1, "Earth", True), (2, "Moon", False),
+                                                                (3, "Sun", False)])
+        fixture = replay.Fixture()
+        self.add_listing(fixture, "fr", [(1, "Earth", False), (2, "Moon", True), (3, "Sun", False)])
+        adapter = replay.ReplayAdapter(fixture)
+        with replay.use_adapter(adapter):
+            presence = list(search.iter_member_presence("en", "Category:Root", ["he", "fr"]))
+            self.assertEqual(presence, [("Earth", {"he"}), ("Moon", {"fr"}), ("Sun", set())])
+            self.assertEqual(adapter.calls, 1)  # he came from the store, fr with its own lllang query
+            self.assertEqual(list(search.iter_member_presence("en", "Category:Root", ["fr", "he"])), presence)
+        self.assertEqual(adapter.calls, 1)
+        self.assertEqual(adapter.misses, [])
+
+
+class StreamingTests(ReplayTestCase):
+
+    def stream(self, stream_format):
+        url = reverse("get_articles_from_other_languages", args=["he", "Root", "en"])
+        with replay.use_adapter(replay.ReplayAdapter(self.fixture)):
+            response = self.client.get(url, {"max_depth": 4, "stream": stream_format})
+            return response, b"".join(response.streaming_content).decode("utf-8")
+
+    def test_ndjson_events(self):
+        response, body = self.stream("ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        events = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(events[0]["event"], "resolved")
+        self.assertEqual(events[1]["event"], "start")
+        articles = [event for event in events if event["event"] == "article"]
+        self.assertEqual(len(articles), 48)
+        self.assertEqual((events[-1]["event"], events[-1]["count"], events[-1]["categories"]),
+                         ("summary", 48, events[1]["total"]))
+        progress = [event["done"] for event in events if event["event"] == "progress"]
+        self.assertEqual(progress, list(range(1, events[1]["total"] + 1)))
+
+    def test_server_sent_events(self):
+        response, body = self.stream("sse")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        records = body.strip().split("\n\n")
+        self.assertTrue(records[0].startswith("event: resolved\ndata: {"))
+        self.assertTrue(records[-1].startswith("event: summary\n"))
+
+
+class MetadataHarvestTests(TestCase):
+
+    def fake_api_continue(self, lang, params):
+        """
+        Batch query: the links of A, then of B, are spread over responses that run out of budget (2 requests).
+        Per-title queries: B has 5 links, C has more than its budget can count.
+        """
+        self.queries.append(params["titles"])
+        if "|" in params["titles"]:
+            yield {"continue": {"plcontinue": "1|0|X", "continue": "||"}, "query": {"pages": {
+                "1": {"pageid": 1, "title": "A", "length": 100, "links": [{}] * 3,
+                      "pageviews": {"2024-05-01": 10, "2024-05-02": None}},
+                "2": {"pageid": 2, "title": "B", "length": 200},
+                "3": {"pageid": 3, "title": "C", "length": 300}}}}
+            yield {"continue": {"plcontinue": "2|0|Y", "continue": "||"}, "query": {"pages": {
+                "1": {"pageid": 1, "title": "A", "links": [{}] * 2},
+                "2": {"pageid": 2, "title": "B", "links": [{}] * 4}}}}
+            raise AssertionError("the budget is exhausted")
+        elif params["titles"] == "B":
+            yield {"query": {"pages": {"2": {"pageid": 2, "title": "B", "links": [{}] * 5}}}}
+        else:
+            while True:
+                yield {"continue": {"plcontinue": "3|0|Z", "continue": "||"},
+                       "query": {"pages": {"3": {"pageid": 3, "title": "C", "links": [{}] * 500}}}}
+
+    @override_settings(METADATA_MAX_CONTINUATIONS=2)
+    def test_pages_left_open_by_a_batch_are_counted_on_their_own(self):
+        self.queries = []
+        with mock.patch.object(wiki_client, "api_continue", self.fake_api_continue):
+            features = metadata.harvest_batch("en", ["A", "B", "C"])
+        self.assertEqual(self.queries, ["A|B|C", "B", "C"])  # A was complete before the continuation point
+        self.assertEqual((features["A"]["out_links_count"], features["A"]["views"], features["A"]["incomplete"]),
+                         (5, 10, False))
+        self.assertEqual((features["B"]["out_links_count"], features["B"]["size"], features["B"]["incomplete"]),
+                         (5, 200, False))
+        self.assertEqual((features["C"]["out_links_count"], features["C"]["incomplete"]), (1000, True))
+
+
+@override_settings(CATEGORY_STORE_ENABLED=True, CATEGORY_STORE_PRUNE_INTERVAL=None)
+class GraphStoreTests(TestCase):
+    MEMBERS = [(1, "A", True), (2, "B", False)]
+
+    def test_the_page_membership_is_shared_by_target_languages(self):
+        graph_store.save_members("en", "Category:Root", "he", self.MEMBERS)
+        self.assertEqual(graph_store.get_members("en", "Category:Root", "he"), self.MEMBERS)
+        self.assertIsNone(graph_store.get_members("en", "Category:Root", "fr"))  # no status for fr yet
+
+        graph_store.save_members("en", "Category:Root", "fr", [(1, "A", False), (2, "B", False)])
+        self.assertEqual(CategoryListing.objects.count(), 1)
+        self.assertEqual(CategoryMember.objects.count(), 2)
+        self.assertEqual(graph_store.get_members("en", "Category:Root", "he"), self.MEMBERS)
+        self.assertEqual(graph_store.get_members("en", "Category:Root", "fr"), [(1, "A", False), (2, "B", False)])
+
+    def test_expired_rows_are_pruned(self):
+        graph_store.save_subcategories("en", "Category:Root", ["Category:Sub"])
+        graph_store.save_members("en", "Category:Root", "he", self.MEMBERS)
+        graph_store.save_members("en", "Category:Other", "he", self.MEMBERS)
+        old = django_timezone.now() - timedelta(days=2)
+        CategoryListing.objects.exclude(title="Category:Other").update(fetched_at=old)
+        PageLanglink.objects.filter(pageid=1).update(checked_at=old)
+
+        self.assertIsNone(graph_store.get_subcategories("en", "Category:Root"))
+        self.assertEqual(graph_store.prune(), 3)
+        self.assertEqual(list(CategoryListing.objects.values_list("title", flat=True)), ["Category:Other"])
+        self.assertEqual(list(CategoryMember.objects.values_list("pageid", flat=True)), [1, 2])
+        self.assertEqual(list(PageLanglink.objects.values_list("pageid", flat=True)), [2])
+        self.assertIsNone(graph_store.get_members("en", "Category:Other", "he"))  # page 1 must be checked again
+
+
+class ReplayAdapterTests(ReplayTestCase):
+
+    def test_search_runs_offline(self):
+        adapter = replay.ReplayAdapter(self.fixture)
+        with replay.use_adapter(adapter):
+            response = self.search(max_depth=4)
+        self.assertEqual(response.status_code, 200)
+        titles = [article["title"] for article in response.json()["articles"]]
+        self.assertEqual(len(titles), 48)
+        self.assertEqual(len(titles), len(set(titles)))
+        self.assertEqual(adapter.calls, 18)
+        self.assertEqual(adapter.misses, [])
+
+    def test_repeated_search_makes_no_call(self):
+        adapter = replay.ReplayAdapter(self.fixture)
+        with replay.use_adapter(adapter):
+            first = self.search(max_depth=2).json()["articles"]
+            adapter.reset()
+            second = self.search(max_depth=2).json()["articles"]
+        self.assertEqual(first, second)
+        self.assertEqual(adapter.calls, 0)
+
+    def test_unrecorded_request_raises(self):
+        adapter = replay.ReplayAdapter(replay.Fixture())
+        with replay.use_adapter(adapter):
+            with self.assertRaises(replay.FixtureMiss):
+                wiki_client.api_get("en", {"action": "query", "meta": "siteinfo", "format": "json"})
+        self.assertEqual(len(adapter.misses), 1)
+
+    def test_latency_is_injected(self):
+        adapter = replay.ReplayAdapter(self.fixture, latency=0.05)
+        with replay.use_adapter(adapter):
+            start = time.perf_counter()
+            siteinfo.fetch_namespace_data("en")
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+        self.assertEqual((adapter.calls, adapter.misses), (1, []))
+
+    def test_request_key_ignores_maxlag_and_order(self):
+        self.assertEqual(
+            replay.request_key("get", "https://en.wikipedia.org/w/api.php?maxlag=5&list=a&action=query"),
+            replay.request_key("GET", "https://en.wikipedia.org/w/api.php?action=query&list=a"),
+        )
+
+
+class RecordingAdapterTests(ReplayTestCase):
+
+    def test_recorded_fixture_replays_the_same_search(self):
+        recorded = replay.Fixture()
+        recorder = replay.RecordingAdapter(recorded, adapter=replay.ReplayAdapter(self.fixture))
+        with replay.use_adapter(recorder):
+            expected = self.search(max_depth=3).json()["articles"]
+        self.assertTrue(0 < len(recorded) <= recorder.calls)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "recorded.json.gz"
+            recorded.save(path)
+            reloaded = replay.Fixture.load(path)
+
+        cache.clear()
+        siteinfo.clear()
+        adapter = replay.ReplayAdapter(reloaded)
+        with replay.use_adapter(adapter):
+            self.assertEqual(self.search(max_depth=3).json()["articles"], expected)
+        self.assertEqual(adapter.misses, [])
+
+
+class BenchmarkCommandTests(ReplayTestCase):
+
+    def test_benchmark_reports_every_endpoint_and_depth(self):
+        out = StringIO()
+        call_command("benchmark_search", fixture=str(SAMPLE_FIXTURE), depths=[1, 2], repeat=1, json=True,
+                     stdout=out, stderr=StringIO())
+        rows = json.loads(out.getvalue())
+        self.assertEqual([(row["endpoint"], row["depth"]) for row in rows],
+                         [("articles", 1), ("articles", 2), ("stream", 1), ("stream", 2),
+                          ("matrix", 1), ("matrix", 2)])
+        for row in rows:
+            self.assertEqual(row["status"], 200)
+            self.assertGreater(row["calls"], 0)
+            self.assertGreater(row["peak_kib"], 0)
+        by_endpoint = {(row["endpoint"], row["depth"]): row for row in rows}
+        self.assertEqual(by_endpoint["articles", 2]["items"], by_endpoint["stream", 2]["items"])
+        self.assertGreater(by_endpoint["articles", 2]["calls"], by_endpoint["articles", 1]["calls"])
+
+
+class MetricsTests(ReplayTestCase):
+
+    def test_server_timing_lists_upstream_calls_and_phases(self):
+        with replay.use_adapter(replay.ReplayAdapter(self.fixture)):
+            timing = self.search(max_depth=2)["Server-Timing"]
+            cached_timing = self.search(max_depth=2)["Server-Timing"]
+        for entry in ("api.wbgetentities;", "api.query.categorymembers;", "api.query.categorymembers+langlinks;",
+                      "resolve;", "traversal;", "members;", 'cache.search_result;desc="1 miss"', "total;"):
+            self.assertIn(entry, timing)
+        self.assertNotIn("api.", cached_timing)
+        self.assertIn('cache.search_result;desc="1 hit"', cached_timing)
+
+    def test_metrics_endpoint(self):
+        with replay.use_adapter(replay.ReplayAdapter(self.fixture)):
+            self.search(max_depth=1)
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        text = response.content.decode()
+        self.assertIn('missing_upstream_requests_total{host="www.wikidata.org",module="wbgetentities",status="200"}',
+                      text)
+        self.assertIn('missing_http_request_duration_seconds_bucket{view="get_articles_from_other_languages",'
+                      'le="+Inf"}', text)
+        self.assertIn('missing_cache_hit_ratio{cache="search_result"}', text)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_metrics_endpoint_can_be_disabled(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+
+
+class HttpCacheTests(ReplayTestCase):
+
+    def setUp(self):
+        super().setUp()
+        http_cache.clear()
+
+    def test_languages_are_served_gzipped_with_etag(self):
+        response = self.client.get(reverse("supported_languages"), HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("max-age=", response["Cache-Control"])
+        self.assertIn("Accept-Encoding", response["Vary"])
+        languages = json.loads(gzip.decompress(response.content))["languages"]
+
+        plain = self.client.get(reverse("supported_languages"))
+        self.assertFalse(plain.has_header("Content-Encoding"))
+        self.assertNotEqual(plain["ETag"], response["ETag"])
+        self.assertEqual(plain.json()["languages"], languages)
+
+        revalidated = self.client.get(reverse("supported_languages"), HTTP_ACCEPT_ENCODING="gzip",
+                                      HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated["ETag"], response["ETag"])
+
+    def test_cached_search_result_is_revalidated_without_upstream_calls(self):
+        adapter = replay.ReplayAdapter(self.fixture)
+        with replay.use_adapter(adapter):
+            response = self.search(max_depth=2)
+            adapter.reset()
+            url = reverse("get_articles_from_other_languages", args=["he", "Root", "en"])
+            revalidated = self.client.get(url, {"max_depth": 2}, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(adapter.calls, 0)
+        self.assertNotIn("cache.http_body", revalidated["Server-Timing"])  # no body was prepared
+
+
+class SQLiteCacheTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "cache.sqlite3"
+
+    def backend(self, **options):
+        return SQLiteCache(self.path, {"OPTIONS": options})
+
+    def test_entries_are_shared_between_instances(self):
+        writer, reader = self.backend(), self.backend()  # as two worker processes would open it
+        writer.set("key", {"value": [1, 2]})
+        writer.set("large", "x" * 100000)  # stored compressed
+        self.assertEqual(reader.get("key"), {"value": [1, 2]})
+        self.assertEqual(reader.get("large"), "x" * 100000)
+        self.assertFalse(reader.add("key", "other"))
+        self.assertEqual(reader.get_or_set("key", "other"), {"value": [1, 2]})
+        self.assertTrue(reader.add("counter", 1))
+        self.assertEqual(reader.incr("counter"), 2)
+        self.assertEqual(writer.get("counter"), 2)
+
+    def test_the_schema_is_created_once_per_process(self):
+        with mock.patch.object(sqlite_cache, "_create_schema", wraps=sqlite_cache._create_schema) as create:
+            first, second = self.backend(), self.backend()  # as Django creates one instance per thread
+            threads = [threading.Thread(target=backend.set, args=("key", "value")) for backend in (first, second)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(second.get("key"), "value")
+        self.assertEqual(create.call_count, 1)
+
+    def test_expired_entries_are_misses(self):
+        backend = self.backend()
+        backend.set("key", "value", timeout=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(backend.get("key"))
+        self.assertFalse(backend.has_key("key"))
+        self.assertTrue(backend.add("key", "new"))
+        self.assertEqual(backend.get("key"), "new")
+
+    def test_least_recently_used_entries_are_evicted(self):
+        backend = self.backend(MAX_ENTRIES=10, CULL_FREQUENCY=2, ACCESS_RESOLUTION=0)
+        for i in range(10):
+            backend.set(f"key{i}", i)
+        backend.get("key0")
+        backend.set("key10", 10)
+        self.assertLessEqual(backend.stats()["entries"], 5)
+        self.assertEqual(backend.get("key0"), 0)
+        self.assertIsNone(backend.get("key1"))
+
+    def test_size_is_bounded(self):
+        backend = self.backend(MAX_BYTES=20000, COMPRESS_MIN_BYTES=10 ** 6)
+        for i in range(10):
+            backend.set(f"key{i}", b"x" * 5000)
+        self.assertLessEqual(backend.stats()["bytes"], 20000)
+        self.assertIsNotNone(backend.get("key9"))
+
+
+class DumpStoreTests(ReplayTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(DUMP_STORE_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        dump_store._local.connections = {}
+
+    def api_fixture(self):
+        fixture = replay.Fixture()
+        for lang, name in (("en", "Category"), ("he", "קטגוריה")):
+            add_response(fixture, wiki_client.WIKI_API_URL.format(lang=lang),
+                         {"action": "query", "meta": "siteinfo", "siprop": "namespaces|namespacealiases",
+                          "format": "json"},
+                         {"query": {"namespaces": {"0": {"id": 0, "*": ""},
+                                                   "14": {"id": 14, "*": name, "canonical": "Category"}}}})
+        add_response(fixture, wiki_client.WIKIDATA_API_URL,
+                     {"action": "wbgetentities", "sites": "hewiki", "titles": "קטגוריה:שורש", "props": "sitelinks",
+                      "normalize": 1, "format": "json"},
+                     {"entities": {"Q1": {"sitelinks": {"enwiki": {"title": "Category:Root"},
+                                                        "hewiki": {"title": "קטגוריה:שורש"}}}}})
+        url = wiki_client.WIKI_API_URL.format(lang="en")
+        tree = {
+            "Category:Root": (["Category:Sub"], [(10, "Earth", True), (11, "O'Brien (band)", False)]),
+            "Category:Sub": (["Category:Root"], [(14, "Back\\slash", False), (12, "Moon),(99,0,'x", False),
+                                                 (11, "O'Brien (band)", False)]),
+        }
+        for category, (subcategories, pages) in tree.items():
+            add_response(fixture, url, {"action": "query", "list": "categorymembers", "cmtitle": category,
+                                        "cmtype": "subcat", "cmlimit": "max", "format": "json"},
+                         {"query": {"categorymembers": [{"ns": 14, "title": title} for title in subcategories]}})
+            add_response(fixture, url, {"action": "query", "generator": "categorymembers", "gcmtitle": category,
+                                        "gcmtype": "page", "gcmlimit": "max", "prop": "langlinks", "lllang": "he",
+                                        "lllimit": "max", "format": "json"},
+                         {"query": {"pages": {str(pageid): {
+                             "pageid": pageid, "ns": 0, "title": title,
+                             **({"langlinks": [{"lang": "he", "*": "x"}]} if has_langlink else {}),
+                         } for pageid, title, has_langlink in pages}}, "batchcomplete": ""})
+        return fixture
+
+    def test_rows_are_parsed_with_escapes_and_multi_row_inserts(self):
+        rows = list(dump_store.iter_dump_rows(SAMPLE_DUMPS / "enwiki-20250101-page.sql",
+                                              ["page_id", "page_title", "page_is_redirect", "page_random",
+                                               "page_latest"]))
+        self.assertEqual([row[0] for row in rows], [1, 2, 10, 11, 12, 13, 14, 15])
+        self.assertEqual(rows[3], (11, "O'Brien_(band)", 0, 0.75, None))
+        self.assertEqual(rows[4], (12, "Moon),(99,0,'x", 0, 1e-05, None))  # a row delimiter inside a string
+        self.assertEqual(rows[6][1], "Back\\slash")
+
+    def test_the_dump_backend_answers_like_the_api_backend(self):
+        out = StringIO()
+        call_command("ingest_dumps", "en", "he", dir=str(SAMPLE_DUMPS), stdout=out)
+        self.assertIn("en: 6 pages, 7 category links, 5 interlanguage links", out.getvalue())
+
+        def articles(backend):
+            return [(event["title"], event["source"]) for event in
+                    search.iter_search_events("he", "שורש", "en", max_depth=3, backend=backend)
+                    if event["event"] == "article"]
+
+        with replay.use_adapter(replay.ReplayAdapter(self.api_fixture())):
+            from_api = articles("api")
+        siteinfo.clear()
+        from_dump = articles("dump")
+        self.assertEqual(from_dump, [("O'Brien (band)", "Category:Root"), ("Back\\slash", "Category:Sub"),
+                                     ("Moon),(99,0,'x", "Category:Sub")])
+        self.assertEqual(from_dump, from_api)
+
+    def test_large_mode_checks_each_page_once(self):
+        call_command("ingest_dumps", "en", "he", dir=str(SAMPLE_DUMPS), stdout=StringIO())
+
+        def articles(backend):
+            pieces = large_search.stream_missing_articles("he", "שורש", "en", max_depth=3, backend=backend)
+            return json.loads("".join(pieces))["articles"]
+
+        with replay.use_adapter(replay.ReplayAdapter(self.api_fixture())):
+            from_api = articles("api")
+        siteinfo.clear()
+        checked = []
+        without_langlink = dump_store.DumpBackend._without_langlink
+
+        def record(connection, lang, pages, target_lang):
+            checked.extend(pageid for pageid, _, _ in pages)
+            return without_langlink(connection, lang, pages, target_lang)
+
+        with mock.patch.object(dump_store.DumpBackend, "_without_langlink", staticmethod(record)):
+            from_dump = articles("dump")
+        self.assertEqual(sorted(checked), [10, 11, 12, 14])  # O'Brien (band), in both categories, is checked once
+        self.assertEqual(from_dump, from_api)
+        self.assertEqual(len(from_dump), 3)
+
+
+class FakeCategoryWiki:
+    """
+    In-memory reference wiki answering the queries of saved searches (stands in for wiki_client.api_continue).
+    """
+
+    def __init__(self):
+        self.subcategories = {}  # category -> {subcategory: time added}
+        self.members = {}  # category -> {pageid: time added}
+        self.titles = {}  # pageid -> title (deleted pages are removed)
+        self.linked = set()  # pageids having a langlink to the contribution language
+        self.calls = []
+
+    def add(self, category, pageid, title, added_at, linked=False):
+        self.members.setdefault(category, {})[pageid] = added_at
+        self.titles[pageid] = title
+        if linked:
+            self.linked.add(pageid)
+
+    def delete(self, pageid):
+        del self.titles[pageid]
+        for members in self.members.values():
+            members.pop(pageid, None)
+
+    def api_continue(self, lang, params):
+        self.calls.append(params)
+        if params.get("list") == "categorymembers":
+            yield {"query": {"categorymembers": [{"ns": 14, "title": title}
+                                                 for title in self.subcategories.get(params["cmtitle"], {})]},
+                   "batchcomplete": ""}
+        elif params.get("generator") == "categorymembers":
+            category = params["gcmtitle"]
+            since = datetime.strptime(params.get("gcmstart", "2000-01-01T00:00:00Z"), "%Y-%m-%dT%H:%M:%SZ")
+            since = since.replace(tzinfo=timezone.utc)
+            pages = {pageid: {"ns": 0, "title": self.titles[pageid]}
+                     for pageid, added_at in self.members.get(category, {}).items() if added_at >= since}
+            if "subcat" in params["gcmtype"]:
+                for number, (title, added_at) in enumerate(self.subcategories.get(category, {}).items()):
+                    if added_at >= since:
+                        pages[-1 - number] = {"ns": 14, "title": title}
+            for pageid, page in pages.items():
+                if pageid in self.linked:
+                    page["langlinks"] = [{"lang": params["lllang"], "*": page["title"]}]
+            yield {"query": {"pages": {str(pageid): page for pageid, page in pages.items()}}, "batchcomplete": ""}
+        else:
+            pages = {}
+            for pageid in map(int, params["pageids"].split("|")):
+                if pageid not in self.titles:
+                    pages[str(pageid)] = {"pageid": pageid, "missing": ""}
+                    continue
+                page = pages[str(pageid)] = {"title": self.titles[pageid], "categories": [
+                    {"ns": 14, "title": category} for category, members in self.members.items() if pageid in members]}
+                if pageid in self.linked:
+                    page["langlinks"] = [{"lang": params["lllang"], "*": page["title"]}]
+            yield {"query": {"pages": pages}, "batchcomplete": ""}
+
+
+class SavedSearchTests(ReplayTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.wiki = FakeCategoryWiki()
+        long_ago = datetime.now(timezone.utc) - timedelta(days=7)
+        self.wiki.subcategories = {"Category:Root": {"Category:A": long_ago}, "Category:A": {}}
+        self.wiki.add("Category:Root", 1, "P1", long_ago)
+        self.wiki.add("Category:Root", 2, "P2", long_ago, linked=True)
+        self.wiki.add("Category:Root", 3, "P3", long_ago)
+        self.wiki.add("Category:A", 4, "P4", long_ago)
+        self.wiki.add("Category:B", 6, "P6", long_ago)
+        self.client = Client(enforce_csrf_checks=True)  # API clients send no CSRF token
+        for patcher in (mock.patch.object(wiki_client, "api_continue", self.wiki.api_continue),
+                        mock.patch.object(search, "resolve_reference_category", return_value="Category:Root")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_refresh_reports_only_the_changes(self):
+        response = self.client.post(reverse("saved_search_list"), {"edit_lang": "he", "category": "Root",
+                                                                   "refer_lang": "en", "max_depth": 1},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([article["title"] for article in response.json()["articles"]], ["P1", "P3", "P4"])
+
+        now = datetime.now(timezone.utc)
+        self.wiki.linked.add(1)  # translated
+        self.wiki.delete(3)
+        self.wiki.titles[4] = "P4 (moved)"
+        self.wiki.add("Category:A", 5, "P5", now)
+        self.wiki.subcategories["Category:Root"]["Category:B"] = now
+        self.wiki.calls.clear()
+
+        delta = self.client.post(response.json()["refresh_url"]).json()
+        self.assertEqual(delta["mode"], "delta")
+        self.assertEqual(sorted(article["title"] for article in delta["added"]), ["P4 (moved)", "P5", "P6"])
+        self.assertEqual(sorted((article["title"], article["reason"]) for article in delta["removed"]),
+                         [("P1", "translated"), ("P3", "deleted"), ("P4", "moved")])
+        self.assertEqual((delta["count"], delta["categories"]), (3, 3))
+        # the known tree is not walked again: only the new subcategory is listed in full
+        self.assertEqual([call.get("cmtitle") for call in self.wiki.calls if call.get("list")], [])
+        self.assertIn("Category:B", [call.get("gcmtitle") for call in self.wiki.calls if "gcmstart" not in call])
+
+        full = self.client.post(response.json()["refresh_url"] + "?full=1").json()
+        self.assertEqual((full["added"], full["removed"], full["count"]), ([], [], 3))
+        detail = self.client.get(reverse("saved_search_detail", args=[delta["id"]])).json()
+        self.assertEqual(sorted(article["title"] for article in detail["articles"]), ["P4 (moved)", "P5", "P6"])
+
+        self.assertEqual(self.client.delete(reverse("saved_search_detail", args=[delta["id"]])).status_code, 200)
+        self.assertEqual(self.client.get(reverse("saved_search_list")).json(), {"saved_searches": []})
+
+
+class FakeSearch:
+    """
+    Stands for search.iter_search_events: records the threads it runs on, and waits for release.
+    """
+    ARGS = ("he", "Root", "en", 1, None, None)
+
+    def __init__(self):
+        self.threads = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def events(self, *args):
+        self.threads.append(threading.current_thread().name)
+        self.release.wait(5)
+        yield {"event": "article", "title": "A", "source": "Category:Root"}
+        yield {"event": "summary", "count": 1}
+
+
+class ResultCacheTests(ReplayTestCase):
+    ARGS = FakeSearch.ARGS
+
+    def setUp(self):
+        super().setUp()
+        self.fake = FakeSearch()
+
+    def make_stale(self):
+        key = result_cache.cache_key(*self.ARGS)
+        computed_at = cache.get(key)["computed_at"] - result_cache._fresh_timeout() - 1
+        cache.set_many({key: {**cache.get(key), "computed_at": computed_at}, key + ":computed_at": computed_at})
+        return computed_at
+
+    def test_fresh_results_are_served_from_the_cache(self):
+        with mock.patch.object(result_cache, "iter_search_events", self.fake.events):
+            first = result_cache.run_search(*self.ARGS)
+            second = result_cache.run_search(*self.ARGS)
+        self.assertEqual(first["articles"], [{"title": "A", "source": "Category:Root"}])
+        self.assertEqual(second, first)
+        self.assertFalse(second["stale"])
+        self.assertEqual(len(self.fake.threads), 1)
+        self.assertTrue(self.fake.threads[0].startswith("search"))  # on the bounded search pool
+
+    def test_stale_results_are_served_while_they_are_refreshed(self):
+        with mock.patch.object(result_cache, "iter_search_events", self.fake.events):
+            result_cache.run_search(*self.ARGS)
+            old = self.make_stale()
+            self.fake.release.clear()  # the refresh waits until the stale result was served
+            stale = result_cache.run_search(*self.ARGS)
+            self.assertEqual((stale["computed_at"], stale["stale"]), (int(old), True))
+            self.fake.release.set()
+            key = result_cache.cache_key(*self.ARGS)
+            for _ in range(500):
+                if cache.get(key + ":computed_at") != old:
+                    break
+                time.sleep(0.01)
+            fresh = result_cache.run_search(*self.ARGS)
+        self.assertFalse(fresh["stale"])
+        self.assertEqual(fresh["articles"], stale["articles"])
+        self.assertEqual(len(self.fake.threads), 2)
+        self.assertTrue(all(name.startswith("search") for name in self.fake.threads))
+
+
+class SingleFlightTests(ReplayTestCase):
+
+    def test_identical_concurrent_searches_share_one_computation(self):
+        fake = FakeSearch()
+        fake.release.clear()
+        joined = []
+        join = result_cache._join
+
+        def counting_join(*args):
+            flight = join(*args)
+            joined.append(flight[1])
+            return flight
+
+        results = []
+        with mock.patch.object(result_cache, "iter_search_events", fake.events), \
+                mock.patch.object(result_cache, "_join", counting_join):
+            threads = [threading.Thread(target=lambda: results.append(result_cache.run_search(*fake.ARGS)))
+                       for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for _ in range(500):
+                if len(joined) == 3:
+                    break
+                time.sleep(0.01)
+            fake.release.set()
+            for thread in threads:
+                thread.join(5)
+        self.assertEqual(sorted(joined), [False, False, True])
+        self.assertEqual(len(fake.threads), 1)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(result == results[0] for result in results))
+
+    def test_identical_concurrent_calls_share_one_request(self):
+        flights = singleflight.SingleFlight()
+        waiting = threading.Event()
+
+        class Call(singleflight._Call):
+            def __init__(self):
+                super().__init__()
+                wait = self.done.wait
+                self.done.wait = lambda: waiting.set() or wait()
+
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            waiting.wait(5)  # until the second caller waits for this call
+            return {"query": {}}
+
+        with mock.patch.object(singleflight, "_Call", Call):
+            results = []
+            leader = threading.Thread(target=lambda: results.append(flights.do("key", fetch)))
+            leader.start()
+            while not flights.in_flight():
+                time.sleep(0.001)
+            results.append(flights.do("key", fetch))
+            leader.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertIs(results[0], results[1])
+        self.assertEqual(flights.in_flight(), 0)
+
+    def test_a_search_request_looks_the_result_up_once(self):
+        fake = FakeSearch()
+        url = reverse("get_articles_from_other_languages", args=["he", "Root", "en"])
+        with mock.patch.object(result_cache, "iter_search_events", fake.events):
+            first = self.client.get(url)
+            with mock.patch.object(result_cache.metrics, "record_cache") as record_cache:
+                second = self.client.get(url)
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        lookups = [call for call in record_cache.call_args_list if call.args[0] == "search_result"]
+        self.assertEqual(lookups, [mock.call("search_result", "hit")])
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(json.loads(second.content)["computed_at"], json.loads(first.content)["computed_at"])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(len(fake.threads), 1)
+
+
+class SearchJobTests(ReplayTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.pool = mock.Mock()
+        patcher = mock.patch.object(jobs, "get_pool", return_value=self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_queued_jobs(self):
+        for call in self.pool.submit.call_args_list:
+            call.args[0](*call.args[1:])
+
+    def test_a_job_is_submitted_without_csrf_token_and_polled(self):
+        client = Client(enforce_csrf_checks=True)
+        response = client.post(reverse("submit_search_job"), {"edit_lang": "he", "category": "Root",
+                                                                "refer_lang": "en"}, content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job["status"], SearchJob.STATUS_QUEUED)
+        self.assertEqual(client.get(job["result_url"]).status_code, 202)
+
+        fake = FakeSearch()
+        with mock.patch.object(result_cache, "iter_search_events", fake.events):
+            self.run_queued_jobs()
+        self.assertEqual(client.get(job["status_url"]).json()["status"], SearchJob.STATUS_DONE)
+        self.assertEqual(client.get(job["result_url"]).json()["articles"],
+                         [{"title": "A", "source": "Category:Root"}])
+
+    def test_a_job_beats_while_its_search_reports_nothing(self):
+        job = SearchJob.objects.create(edit_lang="he", category="Root", refer_lang="en")
+
+        def silent_events(*args):
+            time.sleep(0.2)  # as a long traversal, before the first event
+            yield {"event": "summary", "count": 0, "categories": 1}
+
+        with override_settings(JOB_HEARTBEAT_TIMEOUT=0.15), mock.patch.object(jobs, "_beat") as beat, \
+                mock.patch.object(result_cache, "iter_search_events", silent_events):
+            jobs.run_job(job.id)
+        self.assertGreaterEqual(beat.call_count, 2)
+        beat.assert_called_with(job.id)
+
+        running = SearchJob.objects.create(edit_lang="he", category="Root", refer_lang="en",
+                                           status=SearchJob.STATUS_RUNNING)
+        SearchJob.objects.filter(id=running.id).update(updated_at=django_timezone.now() - timedelta(hours=1))
+        jobs._beat(running.id)
+        self.assertGreater(SearchJob.objects.get(id=running.id).updated_at,
+                           django_timezone.now() - timedelta(minutes=1))
+
+    @override_settings(JOB_HEARTBEAT_TIMEOUT=60)
+    def test_orphaned_jobs_are_queued_again(self):
+        alive = SearchJob.objects.create(edit_lang="he", category="Root", refer_lang="en",
+                                         status=SearchJob.STATUS_RUNNING)
+        orphaned = SearchJob.objects.create(edit_lang="he", category="Other", refer_lang="en",
+                                            status=SearchJob.STATUS_RUNNING)
+        SearchJob.objects.filter(id=orphaned.id).update(updated_at=django_timezone.now() - timedelta(minutes=5))
+        jobs.resume_jobs(self.pool)
+        self.pool.submit.assert_called_once_with(jobs.run_job, orphaned.id)
+        self.assertEqual(SearchJob.objects.get(id=alive.id).status, SearchJob.STATUS_RUNNING)
+        self.assertEqual(SearchJob.objects.get(id=orphaned.id).status, SearchJob.STATUS_QUEUED)
+
+
+class PrefetchTests(ReplayTestCase):
+
+    def test_searches_are_logged_and_popular_ones_prefetched(self):
+        adapter = replay.ReplayAdapter(self.fixture)
+        with replay.use_adapter(adapter):
+            self.search(max_depth=1)
+            self.search(max_depth=1)
+            self.search(max_depth=2)
+        logs = list(SearchLog.objects.order_by("id").values_list("max_depth", "mode", "status", "calls"))
+        self.assertEqual([log[:3] for log in logs], [(1, "json", 200), (1, "json", 200), (2, "json", 200)])
+        self.assertGreater(logs[0][3], 0)
+        self.assertEqual(logs[1][3], 0)  # served from the result cache
+
+        cache.clear()
+        out = StringIO()
+        with replay.use_adapter(adapter):
+            call_command("prefetch_searches", top=1, budget=logs[0][3], stdout=out)
+            adapter.reset()
+            self.search(max_depth=1)
+        self.assertIn("1 warmed", out.getvalue())
+        self.assertEqual(adapter.calls, 0)
+
+    def test_budget_skips_expensive_searches(self):
+        with replay.use_adapter(replay.ReplayAdapter(self.fixture)):
+            self.search(max_depth=2)
+        cache.clear()
+        adapter = replay.ReplayAdapter(self.fixture)
+        out = StringIO()
+        with replay.use_adapter(adapter):
+            call_command("prefetch_searches", budget=1, stdout=out)
+        self.assertIn("0 warmed, 0 already fresh, 1 skipped", out.getvalue())
+        self.assertEqual(adapter.calls, 0)
+
+
+class LargeCategoryModeTests(ReplayTestCase):
+
+    def test_large_mode_returns_the_same_articles(self):
+        with replay.use_adapter(replay.ReplayAdapter(self.fixture)):
+            expected = self.search(max_depth=4).json()["articles"]
+            url = reverse("get_articles_from_other_languages", args=["he", "Root", "en"])
+            response = self.client.get(url, {"max_depth": 4, "large": 1})
+            data = json.loads(b"".join(response.streaming_content))  # the search runs as the response is read
+        self.assertTrue(response.streaming)
+        self.assertEqual(data["articles"], expected)
+        self.assertEqual(data["count"], len(expected))
+
+    def test_large_mode_streams_while_the_search_runs(self):
+        adapter = replay.ReplayAdapter(self.fixture)
+        url = reverse("get_articles_from_other_languages", args=["he", "Root", "en"])
+        with replay.use_adapter(adapter), mock.patch.object(large_search, "JSON_BATCH", 2):
+            response = self.client.get(url, {"max_depth": 4, "large": 1})
+            pieces = iter(response.streaming_content)
+            head = [next(pieces), next(pieces)]
+            calls_before_first_articles = adapter.calls
+            rest = list(pieces)
+        self.assertLess(calls_before_first_articles, adapter.calls)  # later categories are listed afterwards
+        data = json.loads(b"".join(head + rest))
+        self.assertEqual(data["count"], 48)
+        self.assertNotIn("error", data)
+
+    def test_a_failure_midway_ends_the_payload(self):
+        def failing(lang, category, target_lang, seen, limit=None):
+            yield 1, "First"
+            raise wiki_client.UpstreamThrottled("throttled", retry_after=2.5)
+
+        url = reverse("get_articles_from_other_languages", args=["he", "Root", "en"])
+        with replay.use_adapter(replay.ReplayAdapter(self.fixture)), \
+                mock.patch.object(search.ApiBackend, "iter_new_missing_pages", staticmethod(failing)):
+            response = self.client.get(url, {"max_depth": 1, "large": 1})
+            data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data["articles"], [{"title": "First", "source": "Category:Root"}])
+        self.assertEqual((data["error"], data["complete"], data["retry_after"]), ("throttled", False, 3))
+
+    def test_page_id_set_merges_recent_ids(self):
+        seen = large_search.PageIdSet()
+        with mock.patch.object(large_search, "RECENT_IDS", 64):
+            added = [pageid for pageid in (number * 7919 % 1000 for number in range(2000)) if seen.add(pageid)]
+        self.assertEqual(sorted(added), list(range(1000)))
+        self.assertEqual(len(seen), 1000)
+        self.assertEqual(list(seen._sorted), sorted(seen._sorted))  # merged runs stay sorted
+        self.assertGreater(len(seen._sorted), 0)
+        self.assertIn(999, seen)
+        self.assertNotIn(1000, seen)
+
+
+class ResultPaginationTests(ReplayTestCase):
+
+    def setUp(self):
+        super().setUp()
+        http_cache.clear()
+
+    def read_pages(self, page_size, sort=""):
+        url = reverse("get_articles_from_other_languages", args=["he", "Root", "en"])
+        page = self.client.get(url, {"max_depth": 4, "page_size": page_size, "sort": sort}).json()
+        pages = [page]
+        while page["next_cursor"]:
+            page = self.client.get(reverse("result_page", args=[page["result_id"]]),
+                                   {"cursor": page["next_cursor"], "page_size": page_size, "sort": sort}).json()
+            pages.append(page)
+        return pages
+
+    def test_pages_concatenate_to_the_whole_result(self):
+        adapter = replay.ReplayAdapter(self.fixture)
+        with replay.use_adapter(adapter):
+            expected = self.search(max_depth=4).json()["articles"]
+            adapter.reset()
+            with mock.patch.object(result_sets, "CHUNK_SIZE", 7):
+                pages = self.read_pages(page_size=10)
+                by_title = self.read_pages(page_size=10, sort="-title")
+        self.assertEqual(adapter.calls, 0)  # computed once, by the first search
+        self.assertEqual([len(page["articles"]) for page in pages], [10, 10, 10, 10, 8])
+        self.assertEqual({page["total"] for page in pages}, {48})
+        self.assertEqual([article for page in pages for article in page["articles"]], expected)
+        titles = [article["title"] for page in by_title for article in page["articles"]]
+        self.assertEqual(titles, sorted((article["title"] for article in expected), key=str.casefold,
+                                        reverse=True))
+
+    def test_unknown_result_and_invalid_cursor(self):
+        with replay.use_adapter(replay.ReplayAdapter(self.fixture)):
+            first = self.read_pages(page_size=40)[0]
+        url = reverse("result_page", args=[first["result_id"]])
+        self.assertEqual(self.client.get(url, {"cursor": first["next_cursor"], "sort": "title"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"cursor": "not-a-cursor"}).status_code, 400)
+        cache.clear()
+        expired = self.client.get(url, {"cursor": first["next_cursor"]})
+        self.assertEqual(expired.status_code, 404)
+        self.assertEqual(expired.json()["error"], "Unknown or expired result")
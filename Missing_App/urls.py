@@ -10,8 +10,19 @@ urlpatterns = [
     path('get_articles_from_other_languages/<str:edit_lang>/<str:category>/<str:refer_lang>/'
          , views.get_articles_from_other_languages,
          name='get_articles_from_other_languages'),
+    path('get_missing_matrix/<str:refer_lang>/<str:category>/', views.get_missing_matrix,
+         name='get_missing_matrix'),
     path('get_categories_with_query/<str:lang>/<str:query>/', views.get_categories_with_query,
          name='get_categories_with_query'),
+    path('api/jobs/', views.submit_search_job, name='submit_search_job'),
+    path('api/jobs/<uuid:job_id>/', views.get_search_job, name='search_job'),
+    path('api/jobs/<uuid:job_id>/result/', views.get_search_job_result, name='search_job_result'),
+    path('api/saved_searches/', views.saved_search_list, name='saved_search_list'),
+    path('api/saved_searches/<uuid:saved_id>/', views.saved_search_detail, name='saved_search_detail'),
+    path('api/saved_searches/<uuid:saved_id>/refresh/', views.saved_search_refresh, name='saved_search_refresh'),
+    path('api/results/<str:result_id>/', views.get_result_page, name='result_page'),
+    path('metrics', views.metrics_view, name='metrics'),
+    path('api/article_metadata/<str:lang>/', views.get_articles_metadata, name='article_metadata'),
     path('get_page_translation_supported_languages', views.get_page_translation_supported_languages,
          name='get_page_translation_supported_languages'),
 ]
@@ -7,47 +7,72 @@ This module implements the main backend logic for the Wikipedia Missing Articles
 - Retrieve missing articles in a target language by comparing categories across languages
 - Handle translation and language switching for the tool interface
 - Interact with the Wikipedia and Wikidata APIs to fetch category, article, and language data
-- Use caching to optimize repeated queries for supported languages
+- Use caching to optimize repeated queries
 
 Key Endpoints:
 - index: Renders the main landing page of the tool
 - missing_articles_by_category: Renders the category search page and handles POST form submissions (not used in AJAX flow)
-- get_supported_languages: Returns a JSON list of supported Wikipedia languages (with caching)
+- get_supported_languages: Returns a JSON list of supported Wikipedia languages
 - get_categories_with_query: Returns a filtered list of categories for a given language and query string
 - get_articles_from_other_languages: Main AJAX endpoint to fetch missing articles in a target language, given a category and reference language. Handles subcategory recursion and deduplication.
+- get_result_page: Next pages of a paginated search result
+- get_missing_matrix: Presence of a category's articles in several target languages
+- submit_search_job / get_search_job / get_search_job_result: Background jobs for deep searches
+- saved_search_list / saved_search_detail / saved_search_refresh: Saved searches and their incremental refresh
+- get_articles_metadata: Returns the ranking features of a batch of articles
+- metrics_view: Prometheus metrics of the process
 - translated_page: Handles switching the UI language of the tool
 - custom_404: Custom 404 error page
 
 Implementation Notes:
-- Uses requests to interact with Wikipedia and Wikidata APIs for live data
-- Uses Django's cache framework to store supported languages for 24 hours
+- The search pipeline itself lives in search.py; all API calls go through the shared client in wiki_client.py
 - Handles Unicode and encoding issues for multilingual support
-- Recursively fetches subcategories up to a user-specified depth
 - Deduplicates articles by title, keeping the first found source
 
 """
 import sys
 sys.stdout.reconfigure(encoding='utf-8')  # Ensures proper encoding for print output
 
+import itertools
+import math
 import json
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 import requests
-from django.core.cache import cache  # Import Django's caching framework
 from django.conf import settings
 from django.utils import translation
 
-WIKI_API_URL = "https://{lang}.wikipedia.org/w/api.php"
+from . import (category_index, http_cache, jobs, large_search, metrics, result_cache, result_sets, saved_searches,
+               search_log, wiki_client)
+from .languages import get_catalog
+from .metadata import harvest_metadata
+from .models import SavedSearch, SearchJob
+from .search import (  # search pipeline helpers, re-exported for existing callers
+    SearchError, get_backend, get_prefix, get_all_subcategories,
+    iter_category_members, iter_missing_category_members, iter_search_events, run_matrix_search, run_search,
+)
+
+WIKI_API_URL = wiki_client.WIKI_API_URL
 WIKIDATA_URL = "https://www.wikidata.org/wiki/Special:EntityData/{qcode}.json"
-headers = {
-    "User-Agent": "multilingual-missing-articles/1.0 (https://multilingual-missing-articles.toolforge.org/)"
-}
+STREAM_FORMATS = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+headers = wiki_client.headers
 
 from django.shortcuts import redirect
 from django.shortcuts import render
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
 
 
 def get_page_translation_supported_languages(request):
-    return JsonResponse(dict(settings.LANGUAGES))
+    """
+    Return the UI languages of the tool (served with ETag / Cache-Control, see http_cache.py).
+
+    :param request: Django HTTP request
+    :return: JSON response code -> language name, or 304
+    """
+    return http_cache.cached_json_response(
+        request, ["page_languages", settings.LANGUAGES], lambda: dict(settings.LANGUAGES),
+        max_age=getattr(settings, "LANGUAGES_HTTP_MAX_AGE", 60 * 60 * 24),
+    )
 
 
 def dictfetchall(cursor):
@@ -117,87 +142,64 @@ def translated_page(request):  # TODO support translation to wikipedia languages
     return response
 
 
-def get_prefix(lang="en", type="category"):
-    """
-    Get the correct category or portal namespace prefix for a given Wikipedia language.
-https://en.wikipedia.org/w/api.php/action=query&meta=siteinfo&siprop=namespaces&format=json
-    :param lang: Wikipedia language code (default: 'en')
-    :param type: Namespace type ('category' or 'portal')
-    :return: Namespace prefix string (e.g., 'Category:', 'تصنيف:')
-    """
-    base_url = f"https://{lang}.wikipedia.org/w/api.php"
-
-    params = {
-        "action": "query",
-        "meta": "siteinfo",
-        "siprop": "namespaces",
-        "format": "json"
-    }
-
-    response = requests.get(base_url, params=params,headers=headers)
-    response.raise_for_status()
-    data = response.json()
-
-    if (type == "category"):
-        # Namespace ID for categories is always 14
-        prefix = data["query"]["namespaces"]["14"]["*"]
-    else:
-        prefix = data["query"]["namespaces"]["100"]["*"]
-
-    return prefix
-
-
-# Fetch supported languages (with caching)
+# Fetch supported languages (from the language catalog)
 def get_supported_languages(request):
     """
-    Return a JSON list of supported Wikipedia languages, using cache if available.
+    Return a JSON list of supported Wikipedia languages, read from the in-memory language catalog.
 
     :param request: Django HTTP request
-    :return: JsonResponse with list of supported languages
+    :return: JSON response with list of supported languages, or 304
     """
-    # Try to get languages from cache first
-    cached_languages = cache.get("supported_languages")
+    # Served from the in-memory language catalog (bundled sitematrix snapshot, refreshed in the background);
+    # the body is serialized and compressed once per catalog version
+    catalog = get_catalog()
+    return http_cache.cached_json_response(
+        request, ["languages", catalog.generated_at, len(catalog.as_list())], lambda: {"languages": catalog.as_list()},
+        max_age=getattr(settings, "LANGUAGES_HTTP_MAX_AGE", 60 * 60 * 24),
+    )
 
-    if cached_languages:
-        return JsonResponse({"languages": cached_languages})
 
-    # If not cached, fetch from the Wikimedia API
-    api_url = "https://meta.wikimedia.org/w/api.php?action=sitematrix&format=json"
+def metrics_view(request):
+    """
+    Return the metrics of this process in the Prometheus text exposition format.
 
-    try:
-        response = requests.get(api_url, headers=headers, timeout=10)
-        response.raise_for_status()  # Raise an error for bad responses
-        data = response.json()
+    :param request: Django HTTP request
+    :return: HttpResponse (404 when METRICS_ENABLED is off)
+    """
+    if not getattr(settings, "METRICS_ENABLED", True):
+        return HttpResponse("Metrics are disabled", status=404, content_type="text/plain; charset=utf-8")
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
-        # Extracting the languages from the API response
-        languages = []
 
-        for value in data['sitematrix'].values():
-            if isinstance(value, dict) and 'code' in value:
+def invalid_language_response(*langs):
+    """
+    Check language codes against the language catalog.
 
-                name = value.get('localname',
-                                 'Unknown Language')  # Default to 'Unknown Language' if 'localname' is missing
-                native_name = value.get('name',
-                                 'Unknown Language')  # Default to 'Unknown Language' if 'localname' is missing
-                languages.append({"code": value['code'],
-                                  "name": name,
-                                  "native_name": native_name
-                                  })
+    :param langs: Wikipedia language codes to validate
+    :return: JsonResponse with status 400 for the first unknown code, or None if all are valid
+    """
+    for lang in langs:
+        if not get_catalog().is_valid(lang):
+            return JsonResponse({"error": f"Unsupported Wikipedia language: {lang}"}, status=400)
+    return None
 
-        # Cache the result for 24 hours (86400 seconds)
-        cache.set("supported_languages", languages, timeout=86400)
 
-        # Return the list of languages as a JSON response
-        return JsonResponse({"languages": languages})
+def throttled_response(error):
+    """
+    Answer a request that failed because Wikimedia kept throttling us (HTTP 429 or maxlag).
 
-    except requests.RequestException as e:
-        error_message = f"An error occurred while searching for languages: {e}"
-        return JsonResponse({"error": error_message}, status=500)
+    :param error: wiki_client.UpstreamThrottled
+    :return: JsonResponse with status 503 and a Retry-After header
+    """
+    response = JsonResponse({"error": str(error), "retry_after": math.ceil(error.retry_after)}, status=503)
+    response["Retry-After"] = str(max(1, math.ceil(error.retry_after)))
+    return response
 
 
 def get_categories_with_query(request, lang, query):
     """
     Fetch categories dynamically based on a query string, filtering directly in the API request.
+    Prefixes already fetched are kept in a per-language index, so most keystrokes need no API call.
 
     :param request: Django HTTP request
     :param lang: Wikipedia language code
@@ -209,260 +211,402 @@ def get_categories_with_query(request, lang, query):
         # If no query is provided, return there is no query
         return JsonResponse({"error": "there is no query"}, status=500)
 
-    base_url = f"https://{lang}.wikipedia.org/w/api.php"
-
-    params = {
-        "action": "query",
-        "list": "allcategories",
-        "acprefix": query,  # Direct filtering using query prefix
-        "aclimit": 50,  # Limit results to 50 (can be adjusted)
-        "format": "json",
-    }
+    invalid = invalid_language_response(lang)
+    if invalid:
+        return invalid
 
     try:
-        response = requests.get(base_url, params=params, headers=headers)
-        response.raise_for_status()
-        data = response.json()
+        # Answered from the local prefix index when an earlier listing covers the query (category_index.py)
+        categories = category_index.search_categories(lang, query)
 
-        # Extract filtered categories
-        categories = [cat["*"] for cat in data.get("query", {}).get("allcategories", [])]
+        return http_cache.cached_json_response(
+            request, ["categories", lang, categories], lambda: {"categories": categories},
+            max_age=getattr(settings, "CATEGORIES_HTTP_MAX_AGE", 60 * 60),
+        )
 
-        return JsonResponse({"categories": categories}, status=200)
+    except wiki_client.UpstreamThrottled as e:
+        return throttled_response(e)
 
     except requests.RequestException as e:
         return JsonResponse({"error": f"Failed to fetch categories: {str(e)}"}, status=500)
 
 
-def get_qcode(page_name, lang, type="category"):
+@search_log.logged_search
+def get_articles_from_other_languages(request, edit_lang, category, refer_lang):
     """
-    Retrieve the universal Wikidata Q-code for a Wikipedia page (category or portal).
+    Retrieve missing articles in the target language by comparing categories and subcategories with the reference language.
+    Only pages without a langlink to edit_lang are returned, so the browser does not need to check them one by one.
 
-    :param page_name: Name of the page
-    :param lang: Wikipedia language code
-    :param type: Type of page ('category' or 'portal')
-    :return: Q-code string or None if not found
+    With ?backend=dump the search runs on the offline stores built from dumps (see dump_store.py).
+    With ?stream=ndjson (or ?stream=sse) the search is streamed: each article is sent as soon as its category
+    page is processed, together with progress events, and the stream ends with a summary record.
+    With ?page_size= (and optionally ?sort=title, source, -title or -source) only the first page is answered,
+    with a result id and the cursor of the next page (see get_result_page and result_sets.py).
+    With ?large=1 the search runs in bounded memory, for huge trees (large_search.py): articles are
+    deduplicated by page id and the JSON is streamed category by category as the search runs, without going
+    through the result cache; a failure midway ends the payload with error and complete: false.
+
+    Results are served from the whole-result cache (result_cache.py): stale results are answered at once and
+    refreshed in the background. computed_at (Unix time) and stale tell how fresh the result is.
+    Every search is logged (search_log.py) for the prefetch of popular searches.
+
+    :param request: Django HTTP request
+    :param edit_lang: Contribution language code
+    :param category: Category name in contribution language
+    :param refer_lang: Reference language code
+    :return: JsonResponse with list of missing articles (title, source), or StreamingHttpResponse of events
     """
+    invalid = invalid_language_response(edit_lang, refer_lang)
+    if invalid:
+        return invalid
+
     try:
-        if type == "category":
-            categoryPrefix = get_prefix(lang, "category")
-            page_name = categoryPrefix+":"+page_name
-        else:
-            portalPrefix = get_prefix(lang,"portal")
-            page_name = portalPrefix+":"+page_name
-
-        wikipedia_url =\
-            f"https://{lang}.wikipedia.org/w/api.php?action=query&titles={page_name}&prop=pageprops&format=json"
-        response = requests.get(wikipedia_url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        """
-        example for response to "Category:art" in english "en"
-        https://en.wikipedia.org/w/api.php?action=query&titles=Category:art&prop=pageprops&format=json
-        {
-          "batchcomplete": "",
-          "query": {
-            "normalized": [
-              {
-                "from": "Category:art",
-                "to": "Category:Art"
-              }
-            ],
-            "pages": {
-              "5344528": {
-                "pageid": 5344528,
-                "ns": 14,
-                "title": "Category:Art",
-                "pageprops": {
-                  "wikibase_item": "Q9709140"
-                }
-              }
-            }
-          }
-        }
-        """
-
-        """ 
-        example for response to "تصنيف:الصحة" in arabic "ar" that does not have a wikipedia pages in any language
-        {'batchcomplete': '',
-         'query': 
-         {'pages':
-          {'1056957':
-           {'pageid':1056957,
-            'ns': 14,
-             'title': 'ØªØµÙ†ÙŠÙ:Ø§Ù„ØµØ­Ø©',
-             'pageprops': {'expectunusedcategory': '', 'unexpectedUnconnectedPage': '-14'}}}}}
-        """
-
-        if data['query']:
-            # there is only one-pageID
-            pid = next(iter(data['query']['pages']))
-            res_qcode = data['query']['pages'][pid]['pageprops'].get('wikibase_item')
-            return res_qcode
-        else:
-            raise ValueError(f"query {page_name} not found on wikipedia.")
+        max_depth = int(request.GET.get('max_depth',1))
+        print("max_depth reçu :", max_depth)
+        # Optional per-category cap for interactive use (default: complete listings)
+        max_members = int(request.GET.get('max_members', 0)) or getattr(settings, "MAX_MEMBERS_PER_CATEGORY", None)
+        backend = request.GET.get("backend")  # 'api' or 'dump' (offline stores); default: SEARCH_BACKEND
+
+        if request.GET.get("large") in ("1", "true"):
+            # resolves the category and traverses the tree first, so errors are still answered as plain JSON
+            pieces = large_search.stream_missing_articles(edit_lang, category, refer_lang, max_depth, max_members,
+                                                          backend)
+            response = StreamingHttpResponse(pieces, content_type="application/json")
+            response["Cache-Control"] = "no-cache"
+            response["X-Accel-Buffering"] = "no"
+            return response
+
+        stream_format = request.GET.get("stream")
+        if stream_format in STREAM_FORMATS:
+            events = result_cache.search_events(edit_lang, category, refer_lang, max_depth, max_members,
+                                                backend)
+            first_event = next(events)  # resolves the category, so errors are still answered as plain JSON
+            return stream_search_events(itertools.chain([first_event], events), stream_format)
+
+        # A cached result is identified by its cache key and computed_at, read with the result in one lookup:
+        # revalidations are answered 304 without serializing it again
+        search_args = (edit_lang, category, refer_lang, max_depth, max_members, backend)
+        data = result_cache.run_search(*search_args)
+        computed_at, stale = data["computed_at"], data["stale"]
+        backend_name = get_backend(backend).name
+
+        if "page_size" in request.GET:
+            # Paginated: the result is materialized under a result id; the next pages come from get_result_page
+            page_size = result_sets.parse_page_size(request.GET["page_size"])
+            sort = result_sets.parse_sort(request.GET.get("sort"))
+            rid = result_sets.result_id(search_args[:-1] + (backend_name,), computed_at)
+            result_sets.materialize(rid, data)  # unless it already is (the first page body may outlive it)
+            return http_cache.cached_json_response(
+                request, ["result_page", rid, "", page_size, sort],
+                lambda: result_sets.get_page(rid, None, page_size, sort),
+                max_age=0 if stale else result_cache.fresh_for(computed_at),
+            )
+
+        return http_cache.cached_json_response(
+            request, ["search", edit_lang, category, refer_lang, max_depth, max_members, backend_name, computed_at,
+                      stale],
+            lambda: data,
+            max_age=0 if stale else result_cache.fresh_for(computed_at),
+        )
+
+    except SearchError as e:
+        return JsonResponse(e.payload, status=e.status)
+
+    except wiki_client.UpstreamThrottled as e:
+        return throttled_response(e)
+
     except Exception as e:
-        return None
+        return JsonResponse({"error": str(e)}, status=500)
+
 
+def get_result_page(request, result_id):
+    """
+    Return a page of a materialized search result (see result_sets.py), e.g.
+    /api/results/<result_id>/?cursor=...&page_size=100&sort=title
+    The result id and the first cursor come with the first page (get_articles_from_other_languages?page_size=).
 
-def get_page_name_in_refer_lang(qcode, refer_lang, edit_lang=None):
+    :param request: Django HTTP request
+    :param result_id: Result id
+    :return: JsonResponse with the articles of the page, next_cursor (null on the last page) and total; 404 if
+             the result is unknown or expired (run the search again)
+    """
+    try:
+        page_size = result_sets.parse_page_size(request.GET.get("page_size"))
+        sort = result_sets.parse_sort(request.GET.get("sort"))
+        cursor = request.GET.get("cursor", "")
+        result_sets.decode_cursor(cursor, sort)
+        if not result_sets.exists(result_id):
+            return JsonResponse({"error": "Unknown or expired result", "result_id": result_id}, status=404)
+        # Pages never change: they are answered with a long max-age, and 304 on revalidation
+        return http_cache.cached_json_response(
+            request, ["result_page", result_id, cursor, page_size, sort],
+            lambda: result_sets.get_page(result_id, cursor, page_size, sort),
+            max_age=result_sets.timeout(),
+        )
+    except SearchError as e:
+        return JsonResponse(e.payload, status=e.status)
+
+
+def get_missing_matrix(request, refer_lang, category):
     """
-    Retrieve the localized page name in the reference language using the Wikidata Q-code.
+    Return which articles of a reference-language category tree exist in several target languages, e.g.
+    /get_missing_matrix/en/Physics/?targets=he,ar,hi,fr&max_depth=2
+    The reference tree is traversed once; each target is checked with its own lllang query per batch of members.
 
-    :param qcode: Wikidata Q-code
-    :param refer_lang: Reference Wikipedia language code
-    :param edit_lang: (Optional) Contribution language code
-    :return: Page name in reference language or None
+    :param request: Django HTTP request
+    :param refer_lang: Reference language code
+    :param category: Category name in the reference language
+    :return: JsonResponse with the languages, one row per article (title, source, present: one boolean per
+             language) and the number of missing articles per language
     """
+    targets = [lang for lang in request.GET.get("targets", "").split(",") if lang]
+    max_languages = getattr(settings, "MATRIX_MAX_LANGUAGES", 50)
+    if not targets or len(targets) > max_languages:
+        return JsonResponse({"error": f"Expected 1 to {max_languages} comma-separated target languages"},
+                            status=400)
+
+    invalid = invalid_language_response(refer_lang, *targets)
+    if invalid:
+        return invalid
+
     try:
-        # Query Wikidata to get translations for the Q code
-        wikidata_url \
-            = (f"https://www.wikidata.org/w/api.php?action=wbgetentities&ids={qcode}&props=labels&languages={refer_lang}&format=json")
-        response = requests.get(wikidata_url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        """
-        example of a json response dor Q2 in english:
-        #     "entities": {
-        #         "Q2": {
-        #             "type": "item",
-        #             "id": "Q2",
-        #             "labels": {
-        #                 "en": {
-        #                     "language": "en",
-        #                     "value": "Earth"
-        #                 }
-        #             }
-        #         }
-        #     },
-        #     "success": 1
-        # }
-        """
-
-        # Check if the Q-code exists in the response
-        entity = data.get("entities", {}).get(qcode, {})
-        labels = entity.get("labels", {})
-        if refer_lang in labels:
-            the_category_name = labels[refer_lang]["value"]
-            return the_category_name
-        else:
-            return None
-
-    except UnicodeEncodeError as e:
-        return None
-
-    except json.JSONDecodeError as e:
-        return None
+        max_depth = int(request.GET.get('max_depth', 1))
+        max_members = int(request.GET.get('max_members', 0)) or getattr(settings, "MAX_MEMBERS_PER_CATEGORY", None)
+        backend = request.GET.get("backend")
+        return JsonResponse(run_matrix_search(refer_lang, category, targets, max_depth, max_members, backend))
+
+    except SearchError as e:
+        return JsonResponse(e.payload, status=e.status)
+
+    except wiki_client.UpstreamThrottled as e:
+        return throttled_response(e)
 
     except Exception as e:
-        return None
+        return JsonResponse({"error": str(e)}, status=500)
 
 
-def get_all_subcategories(lang, category, visited=None, current_depth=0, max_depth=1):
+def stream_search_events(events, stream_format):
     """
-    Recursively retrieve all subcategories of a category up to a maximum depth.
+    Wrap search events in a streaming response.
 
-    :param lang: Wikipedia language code
-    :param category: Name of the category
-    :param visited: Set to avoid cycles
-    :param current_depth: Current recursion depth
-    :param max_depth: Maximum allowed depth (default 1)
-    :return: List of all subcategory names
-    """
-    if visited is None:
-        visited = set()
-    
-    if current_depth >= max_depth:
-        return []
-    
-    if category in visited:
-        return []
-    
-    visited.add(category)
-    subcategories = []
-    
-    params = {
-        "action": "query",
-        "list": "categorymembers",
-        "cmtitle": category,
-        "cmtype": "subcat",  
-        "cmlimit": 10,
-        "format": "json"
-    }
-    
-    url = WIKI_API_URL.format(lang=lang)
-    response = requests.get(url, params=params, headers=headers)
-    response.raise_for_status()
-    data = response.json()
-    
-    # Add the direct subcategories
-    for member in data.get("query", {}).get("categorymembers", []):
-        subcat = member["title"]
-        subcategories.append(subcat)
-        subcategories.extend(get_all_subcategories(lang, subcat, visited, current_depth + 1, max_depth))
-    
-    return subcategories
+    :param events: Iterable of event dicts (see search.iter_search_events)
+    :param stream_format: 'ndjson' (one JSON object per line) or 'sse' (Server-Sent Events)
+    :return: StreamingHttpResponse
+    """
+    def encode(event):
+        data = json.dumps(event, ensure_ascii=False)
+        if stream_format == "sse":
+            return f"event: {event['event']}\ndata: {data}\n\n"
+        return data + "\n"
+
+    def body():
+        try:
+            for event in events:
+                yield encode(event)
+        except Exception as e:
+            # the status line is already sent: report the failure as the last record
+            error = {"event": "error", "error": str(e)}
+            if isinstance(e, wiki_client.UpstreamThrottled):
+                error["retry_after"] = math.ceil(e.retry_after)
+            yield encode(error)
+
+    response = StreamingHttpResponse(body(), content_type=STREAM_FORMATS[stream_format])
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # ask proxies (nginx) not to buffer the stream
+    return response
 
 
-def get_articles_from_other_languages(request, edit_lang, category, refer_lang):
+@csrf_exempt  # JSON API for scripts: no session, so no CSRF token to send
+def submit_search_job(request):
     """
-    Retrieve missing articles in the target language by comparing categories and subcategories with the reference language.
+    Start a missing-articles search in the background, for searches too long for one HTTP request.
+    Expects a POST with a JSON body: {"edit_lang": "he", "category": "...", "refer_lang": "en", "max_depth": 3}
 
     :param request: Django HTTP request
-    :param edit_lang: Contribution language code
-    :param category: Category name in contribution language
-    :param refer_lang: Reference language code
-    :return: JsonResponse with list of missing articles (title, source)
+    :return: JsonResponse (202) with the job status and the URLs to poll it and fetch its result
     """
-    articles = []
+    if request.method != "POST":
+        return JsonResponse({"error": "POST a JSON body describing the search"}, status=405)
+
     try:
-        # Get the Q code for the category from Wikidata
-        qcode = get_qcode(category, edit_lang)
-        if not qcode:
-            return JsonResponse({"noQCode": "Category not found in wikipedia"})
+        params = json.loads(request.body)
+        edit_lang, category, refer_lang = params["edit_lang"], params["category"], params["refer_lang"]
+        max_depth = int(params.get("max_depth", 1))
+        max_members = int(params.get("max_members") or 0) or getattr(settings, "MAX_MEMBERS_PER_CATEGORY", None)
+        backend = params.get("backend")
+        get_backend(backend)  # unknown backend names are rejected here, not in the job
+    except SearchError as e:
+        return JsonResponse(e.payload, status=e.status)
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({"error": "Expected edit_lang, category, refer_lang and an optional max_depth"},
+                            status=400)
+
+    invalid = invalid_language_response(edit_lang, refer_lang)
+    if invalid:
+        return invalid
+
+    job = jobs.submit_job(edit_lang, category, refer_lang, max_depth, max_members, backend)
+    payload = job.to_dict()
+    payload["status_url"] = reverse("search_job", args=[job.id])
+    payload["result_url"] = reverse("search_job_result", args=[job.id])
+    return JsonResponse(payload, status=202)
+
+
+def get_search_job(request, job_id):
+    """
+    Return the status and progress of a background search.
 
-        # Get the localized category names for the selected Q code
-        category_name_in_refer_lang = get_page_name_in_refer_lang(qcode, refer_lang, edit_lang)
-        if not category_name_in_refer_lang:
-            return JsonResponse({"noCatError": " category names not found"}, status=400)
+    :param request: Django HTTP request
+    :param job_id: SearchJob id
+    :return: JsonResponse with status (queued, running, done, failed), done/total categories and error
+    """
+    jobs.get_pool()  # resumes unfinished jobs after a restart
+    job = SearchJob.objects.filter(id=job_id).first()
+    if job is None:
+        return JsonResponse({"error": "Unknown job"}, status=404)
+    return JsonResponse(job.to_dict())
 
-        max_depth = int(request.GET.get('max_depth',1))
-        print("max_depth reçu :", max_depth)
-        all_categories = [category_name_in_refer_lang]  # La catégorie principale
-        all_categories.extend(get_all_subcategories(refer_lang, category_name_in_refer_lang, max_depth=max_depth))
-
-        for current_category in all_categories:
-            params = {
-                "action": "query",
-                "list": "categorymembers",
-                "cmtitle": current_category,
-                "cmtype": "page", 
-                "cmlimit": 20,  
-                "format": "json",
-            }
-            url = WIKI_API_URL.format(lang=refer_lang)
-            response = requests.get(url, params=params, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-
-
-            articles.extend({
-                "title": article["title"],
-                "source": current_category
-            } for article in data["query"]["categorymembers"])
-
-        # Remove duplicates by title (keeping the first source found)
-        seen_titles = set()
-        unique_articles = []
-        for art in articles:
-            if art["title"] not in seen_titles:
-                unique_articles.append(art)
-                seen_titles.add(art["title"])
-
-        return JsonResponse({"articles": unique_articles})
 
-    except Exception as e:
+def get_search_job_result(request, job_id):
+    """
+    Return the result of a background search once it is done.
+
+    :param request: Django HTTP request
+    :param job_id: SearchJob id
+    :return: JsonResponse with the same payload as get_articles_from_other_languages, the job's error
+             payload if it failed, or its status (202) while it is still running
+    """
+    jobs.get_pool()  # resumes unfinished jobs after a restart
+    job = SearchJob.objects.filter(id=job_id).first()
+    if job is None:
+        return JsonResponse({"error": "Unknown job"}, status=404)
+    if job.status == SearchJob.STATUS_DONE:
+        return JsonResponse(job.result)
+    if job.status == SearchJob.STATUS_FAILED:
+        return JsonResponse(job.error, status=job.error_status or 500)
+    return JsonResponse(job.to_dict(), status=202)
+
+
+@csrf_exempt
+def saved_search_list(request):
+    """
+    List the saved searches (GET), or run a search and save it (POST).
+    Expects a POST with a JSON body: {"edit_lang": "he", "category": "...", "refer_lang": "en", "max_depth": 2,
+    "name": "..."}
+
+    :param request: Django HTTP request
+    :return: JsonResponse with the saved searches, or the new saved search (201) with its missing articles
+    """
+    if request.method != "POST":
+        return JsonResponse({"saved_searches": [saved.to_dict() for saved in
+                                                SavedSearch.objects.order_by("-created_at")]})
+
+    try:
+        params = json.loads(request.body)
+        edit_lang, category, refer_lang = params["edit_lang"], params["category"], params["refer_lang"]
+        max_depth = int(params.get("max_depth", 1))
+        name = str(params.get("name") or "")
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({"error": "Expected edit_lang, category, refer_lang, an optional max_depth and name"},
+                            status=400)
+
+    invalid = invalid_language_response(edit_lang, refer_lang)
+    if invalid:
+        return invalid
+
+    try:
+        saved = saved_searches.create_saved_search(edit_lang, category, refer_lang, max_depth, name)
+    except SearchError as e:
+        return JsonResponse(e.payload, status=e.status)
+    except wiki_client.UpstreamThrottled as e:
+        return throttled_response(e)
+    except requests.RequestException as e:
         return JsonResponse({"error": str(e)}, status=500)
 
+    payload = saved.to_dict(with_articles=True)
+    payload["refresh_url"] = reverse("saved_search_refresh", args=[saved.id])
+    return JsonResponse(payload, status=201)
+
+
+@csrf_exempt
+def saved_search_detail(request, saved_id):
+    """
+    Return a saved search with its missing articles as of its last run (GET), or delete it (DELETE).
+
+    :param request: Django HTTP request
+    :param saved_id: SavedSearch id
+    :return: JsonResponse with the saved search, its articles and the changes found by its last refresh
+    """
+    saved = SavedSearch.objects.filter(id=saved_id).first()
+    if saved is None:
+        return JsonResponse({"error": "Unknown saved search"}, status=404)
+    if request.method == "DELETE":
+        saved.delete()
+        return JsonResponse({"deleted": str(saved_id)})
+    payload = saved.to_dict(with_articles=True)
+    payload["last_delta"] = saved.last_delta
+    return JsonResponse(payload)
+
+
+@csrf_exempt
+def saved_search_refresh(request, saved_id):
+    """
+    Bring a saved search up to date, asking only what changed since its last run (or everything with ?full=1).
+    Expects a POST.
+
+    :param request: Django HTTP request
+    :param saved_id: SavedSearch id
+    :return: JsonResponse with the delta: added articles, removed articles (with the reason), new count
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST to refresh the saved search"}, status=405)
+
+    saved = SavedSearch.objects.filter(id=saved_id).first()
+    if saved is None:
+        return JsonResponse({"error": "Unknown saved search"}, status=404)
+
+    try:
+        full = request.GET.get("full") in ("1", "true")
+        return JsonResponse(saved_searches.refresh_saved_search(saved, full=full))
+    except wiki_client.UpstreamThrottled as e:
+        return throttled_response(e)
+    except requests.RequestException as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+def get_articles_metadata(request, lang):
+    """
+    Return the ranking features of a batch of articles, gathered server-side with multi-title queries.
+    Expects a POST with a JSON body: {"titles": ["Earth", "Moon", ...]}
+
+    :param request: Django HTTP request
+    :param lang: Wikipedia language code of the articles (reference language)
+    :return: JsonResponse with a feature table: {"features": [{title, views, langlinks, ...}, ...]}
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST a JSON body with a list of titles"}, status=405)
+
+    invalid = invalid_language_response(lang)
+    if invalid:
+        return invalid
+
+    try:
+        titles = json.loads(request.body).get("titles", [])
+    except (ValueError, AttributeError):
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+
+    max_titles = getattr(settings, "METADATA_MAX_TITLES", 500)
+    if not isinstance(titles, list) or len(titles) > max_titles:
+        return JsonResponse({"error": f"Expected a list of at most {max_titles} titles"}, status=400)
+
+    try:
+        return JsonResponse({"features": harvest_metadata(lang, titles)})
+    except wiki_client.UpstreamThrottled as e:
+        return throttled_response(e)
+
+    except requests.RequestException as e:
+        return JsonResponse({"error": f"Failed to fetch article metadata: {str(e)}"}, status=500)
+
 
 def custom_404(request, exception):
     """
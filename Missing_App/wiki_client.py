@@ -0,0 +1,302 @@
+"""
+Shared HTTP client for all Wikimedia API calls
+
+Every outbound request of the tool (Wikipedia, Wikidata and Meta-Wiki) goes through this module so that:
+- TCP/TLS connections are kept alive and reused, with one connection pool per Wikimedia host
+- Pool sizes, timeouts and retry policy are configured in one place (see the WIKI_HTTP_* settings)
+- Transient errors (connection resets, 5xx responses) are retried with exponential backoff
+- Requests are paced per host (token bucket + AIMD concurrency window, see ratelimit.py): action API calls
+  carry maxlag, and 429 / maxlag answers pause the host for Retry-After seconds and shrink its window
+  before the request is sent again; when throttling lasts, UpstreamThrottled is raised (answered as 503)
+- Identical requests sent at the same time by several threads are coalesced into one (single flight)
+- Every call is timed and counted per host and API module (metrics.py)
+
+Usage:
+    from Missing_App import wiki_client
+    data = wiki_client.api_get("en", {"action": "query", "meta": "siteinfo", "format": "json"})
+    for data in wiki_client.api_continue("en", {"action": "query", "list": "categorymembers", ...}): ...
+
+"""
+import math
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+
+from . import metrics
+from .ratelimit import HostLimiter, parse_retry_after
+from .singleflight import SingleFlight
+
+WIKI_API_URL = "https://{lang}.wikipedia.org/w/api.php"
+WIKIDATA_API_URL = "https://www.wikidata.org/w/api.php"
+META_API_URL = "https://meta.wikimedia.org/w/api.php"
+
+headers = {
+    "User-Agent": "multilingual-missing-articles/1.0 (https://multilingual-missing-articles.toolforge.org/)"
+}
+
+# Fallback values, used when the setting is missing or Django settings are not configured yet
+DEFAULTS = {
+    "WIKI_HTTP_POOL_CONNECTIONS": 20,  # number of per-host pools kept alive (one per wiki)
+    "WIKI_HTTP_POOL_MAXSIZE": 10,  # keep-alive connections kept per host
+    "WIKI_HTTP_TIMEOUT": (3.05, 20),  # (connect, read) timeout in seconds
+    "WIKI_HTTP_RETRIES": 3,  # retries on connection errors and transient status codes
+    "WIKI_HTTP_BACKOFF": 0.5,  # backoff factor: 0.5s, 1s, 2s, ...
+    "WIKI_HTTP_RATE": 20,  # requests per second per host (0: unlimited)
+    "WIKI_HTTP_BURST": 20,  # requests a host may receive at once after a quiet period
+    "WIKI_HTTP_MAXLAG": 5,  # maxlag sent to the action API, in seconds (None: not sent)
+    "WIKI_HTTP_THROTTLE_RETRIES": 3,  # times a throttled request is sent again
+    "WIKI_HTTP_MAX_RETRY_AFTER": 30,  # longest Retry-After we wait for, in seconds, before giving up
+}
+
+# 429 is not retried by urllib3: throttling is handled by the per-host limiters
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+DEFAULT_RETRY_AFTER = 5  # seconds, when a throttling response has no Retry-After header
+
+
+class UpstreamThrottled(requests.RequestException):
+    """
+    Wikimedia kept throttling a request (HTTP 429 or maxlag) past the retry budget.
+
+    :param retry_after: Seconds the host asked us to wait
+    """
+
+    def __init__(self, message, retry_after=DEFAULT_RETRY_AFTER, **kwargs):
+        super().__init__(message, **kwargs)
+        self.retry_after = retry_after
+
+
+_session = None
+_session_lock = threading.Lock()
+_flights = SingleFlight()  # in-flight JSON requests, keyed by URL and parameters
+_limiters = {}  # host -> HostLimiter
+_limiters_lock = threading.Lock()
+
+metrics.Gauge("missing_upstream_coalesced_in_flight", "Distinct API calls in flight (identical calls coalesced)",
+              function=lambda: {(): _flights.in_flight()})
+
+
+def _setting(name):
+    """
+    Read a WIKI_HTTP_* setting, falling back to DEFAULTS.
+
+    :param name: Setting name
+    :return: Configured value or the default one
+    """
+    if settings.configured:
+        return getattr(settings, name, DEFAULTS[name])
+    return DEFAULTS[name]
+
+
+def build_adapter():
+    """
+    Create the transport adapter: pooled keep-alive connections with retry/backoff.
+
+    :return: requests.adapters.HTTPAdapter
+    """
+    retry = Retry(
+        total=_setting("WIKI_HTTP_RETRIES"),
+        backoff_factor=_setting("WIKI_HTTP_BACKOFF"),
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # the last response is returned and raise_for_status() reports it
+    )
+    return HTTPAdapter(
+        pool_connections=_setting("WIKI_HTTP_POOL_CONNECTIONS"),
+        pool_maxsize=_setting("WIKI_HTTP_POOL_MAXSIZE"),
+        max_retries=retry,
+    )
+
+
+def build_session(adapter=None):
+    """
+    Create a requests session sending every request through one adapter.
+
+    :param adapter: (Optional) transport adapter, e.g. a replay.ReplayAdapter (default: build_adapter())
+    :return: requests.Session
+    """
+    adapter = adapter or build_adapter()
+    session = requests.Session()
+    session.headers.update(headers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """
+    Return the process-wide shared session, creating it on first use.
+
+    :return: requests.Session
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def reset_session():
+    """
+    Close the shared session so that the next call rebuilds it (e.g. after changing settings).
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+    with _limiters_lock:
+        _limiters.clear()
+
+
+def set_session(session):
+    """
+    Install a session as the shared one (e.g. a recording or replaying session, see replay.py).
+
+    :param session: requests.Session, or None to rebuild the default session on next use
+    :return: The previously installed session (None if it was not created yet)
+    """
+    global _session
+    with _session_lock:
+        previous, _session = _session, session
+    return previous
+
+
+def get_limiter(host):
+    """
+    Return the rate limiter of a host, creating it on first use.
+
+    :param host: Host name (e.g. 'en.wikipedia.org')
+    :return: ratelimit.HostLimiter
+    """
+    limiter = _limiters.get(host)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(host)
+            if limiter is None:
+                limiter = _limiters[host] = HostLimiter(
+                    rate=_setting("WIKI_HTTP_RATE"),
+                    burst=_setting("WIKI_HTTP_BURST"),
+                    max_concurrency=_setting("WIKI_HTTP_POOL_MAXSIZE"),
+                )
+    return limiter
+
+
+def _throttle_delay(response):
+    """
+    :param response: requests.Response
+    :return: Seconds to back off if the response throttles us (429 or maxlag error), else None
+    """
+    if response.status_code == 429 or response.headers.get("MediaWiki-API-Error") == "maxlag":
+        return parse_retry_after(response.headers.get("Retry-After"), DEFAULT_RETRY_AFTER)
+    return None
+
+
+def get(url, params=None, timeout=None):
+    """
+    Send a GET request through the shared session, paced by the rate limiter of the host.
+    Throttled requests (429, maxlag) are sent again after Retry-After, up to WIKI_HTTP_THROTTLE_RETRIES times.
+
+    :param url: Full URL to fetch
+    :param params: (Optional) query string parameters
+    :param timeout: (Optional) timeout overriding WIKI_HTTP_TIMEOUT
+    :return: requests.Response (raise_for_status already called)
+    :raises UpstreamThrottled: if the host keeps throttling the request
+    """
+    maxlag = _setting("WIKI_HTTP_MAXLAG")
+    if url.endswith("/api.php") and maxlag is not None:
+        params = {"maxlag": maxlag, **(params or {})}
+    limiter = get_limiter(urlparse(url).netloc)
+
+    retries = _setting("WIKI_HTTP_THROTTLE_RETRIES")
+    for attempt in range(retries + 1):
+        with limiter.slot(), metrics.upstream_call(url, params) as call:
+            response = get_session().get(url, params=params, timeout=timeout or _setting("WIKI_HTTP_TIMEOUT"))
+            call["status"] = "maxlag" if response.headers.get("MediaWiki-API-Error") == "maxlag" \
+                else response.status_code
+        retry_after = _throttle_delay(response)
+        if retry_after is None:
+            limiter.record_success()
+            response.raise_for_status()
+            return response
+
+        # the host is paused for at most WIKI_HTTP_MAX_RETRY_AFTER: a longer pause would block every
+        # request to it (acquire waits for the pause) while this one gives up anyway
+        max_retry_after = _setting("WIKI_HTTP_MAX_RETRY_AFTER")
+        limiter.record_throttle(min(retry_after, max_retry_after))
+        if retry_after > max_retry_after:
+            break  # not worth holding the request that long
+    raise UpstreamThrottled(f"{urlparse(url).netloc} is throttling requests, retry after {math.ceil(retry_after)}s",
+                            retry_after=retry_after, response=response)
+
+
+def get_json(url, params=None, timeout=None):
+    """
+    Send a GET request through the shared session and decode the JSON body.
+    Concurrent identical requests share one upstream call and the same (read-only) decoded data.
+
+    :param url: Full URL to fetch
+    :param params: (Optional) query string parameters
+    :param timeout: (Optional) timeout overriding WIKI_HTTP_TIMEOUT
+    :return: Decoded JSON data
+    """
+    key = (url, tuple(sorted((name, str(value)) for name, value in (params or {}).items())))
+    return _flights.do(key, lambda: get(url, params=params, timeout=timeout).json())
+
+
+def api_get(lang, params, timeout=None):
+    """
+    Call the MediaWiki action API of a Wikipedia language edition.
+
+    :param lang: Wikipedia language code
+    :param params: API parameters
+    :param timeout: (Optional) timeout overriding WIKI_HTTP_TIMEOUT
+    :return: Decoded JSON data
+    """
+    return get_json(WIKI_API_URL.format(lang=lang), params=params, timeout=timeout)
+
+
+def api_continue(lang, params, timeout=None):
+    """
+    Call the MediaWiki action API and follow query continuation ('continue') to the end.
+    Responses are yielded one by one, so callers can process results before the whole listing arrives.
+https://www.mediawiki.org/wiki/API:Continue
+    :param lang: Wikipedia language code
+    :param params: API parameters
+    :param timeout: (Optional) timeout overriding WIKI_HTTP_TIMEOUT
+    :return: Generator of decoded JSON responses
+    """
+    continue_params = {}
+    while True:
+        data = api_get(lang, {**params, **continue_params}, timeout=timeout)
+        yield data
+        if "continue" not in data:
+            return
+        continue_params = data["continue"]
+
+
+def wikidata_get(params, timeout=None):
+    """
+    Call the Wikidata action API.
+
+    :param params: API parameters
+    :param timeout: (Optional) timeout overriding WIKI_HTTP_TIMEOUT
+    :return: Decoded JSON data
+    """
+    return get_json(WIKIDATA_API_URL, params=params, timeout=timeout)
+
+
+def meta_get(params, timeout=None):
+    """
+    Call the Meta-Wiki action API (sitematrix, global information).
+
+    :param params: API parameters
+    :param timeout: (Optional) timeout overriding WIKI_HTTP_TIMEOUT
+    :return: Decoded JSON data
+    """
+    return get_json(META_API_URL, params=params, timeout=timeout)
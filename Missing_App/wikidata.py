@@ -0,0 +1,93 @@
+"""
+Wikidata sitelink resolution
+
+Finds the titles of a page in every Wikipedia edition with a single `wbgetentities` call on the page's own
+site and title (no pageprops lookup of the Q-code first, no label lookup after). The result is the real
+title of the page in each wiki (its sitelink), not the Wikidata label.
+
+The sitelinks of an item are cached for all its languages at once (WIKIDATA_SITELINKS_CACHE_TIMEOUT), so
+switching the reference language, or starting from the same category in another language, needs no call.
+Pages without an item are cached too, for a shorter time (WIKIDATA_NEGATIVE_CACHE_TIMEOUT).
+
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics, wiki_client
+from .languages import get_catalog
+
+DEFAULT_CACHE_TIMEOUT = 60 * 60 * 24  # one day
+DEFAULT_NEGATIVE_CACHE_TIMEOUT = 60 * 60  # one hour
+
+
+def _cache_key(lang, title):
+    # titles may contain spaces and characters memcached does not accept in keys
+    return f"wikidata_sitelinks:{lang}:{hashlib.md5(title.encode('utf-8')).hexdigest()}"
+
+
+def fetch_sitelinks(lang, title):
+    """
+    Fetch the Wikipedia sitelinks of the Wikidata item connected to a page.
+https://www.wikidata.org/w/api.php?action=wbgetentities&sites=enwiki&titles=Category:Art&props=sitelinks&normalize=1&format=json
+    :param lang: Wikipedia language code of the page
+    :param title: Full page title (with namespace prefix)
+    :return: Dict language code -> page title (empty if the page has no item)
+    """
+    catalog = get_catalog()
+    params = {
+        "action": "wbgetentities",
+        "sites": catalog.dbname(lang),
+        "titles": title,
+        "props": "sitelinks",
+        "normalize": 1,
+        "format": "json",
+    }
+    data = wiki_client.wikidata_get(params)
+    """
+    example of a response for Category:Art on enwiki (sitelinks shortened):
+    {"entities": {"Q9709140": {"type": "item", "id": "Q9709140",
+                               "sitelinks": {"arwiki": {"site": "arwiki", "title": "تصنيف:فن", "badges": []},
+                                             "enwiki": {"site": "enwiki", "title": "Category:Art", "badges": []},
+                                             "enwikiquote": {...}}}},
+     "success": 1}
+    and for a page without item:
+    {"entities": {"-1": {"site": "enwiki", "title": "Category:Foo", "missing": ""}}, "success": 1}
+    """
+    sitelinks = {}
+    for entity in data.get("entities", {}).values():
+        if "missing" in entity:
+            continue
+        for site, link in entity.get("sitelinks", {}).items():
+            code = catalog.code_for_dbname(site)
+            if code:  # skip Wikiquote, Commons, ... sitelinks
+                sitelinks[code] = link["title"]
+    return sitelinks
+
+
+def get_sitelinks(lang, title):
+    """
+    Return the titles of a page in all Wikipedia editions, from the cache or from Wikidata.
+
+    :param lang: Wikipedia language code of the page
+    :param title: Full page title (with namespace prefix)
+    :return: Dict language code -> page title (empty if the page has no item)
+    """
+    cache_key = _cache_key(lang, title)
+    sitelinks = cache.get(cache_key)
+    metrics.record_cache("wikidata", "miss" if sitelinks is None else "hit")
+    if sitelinks is not None:
+        return sitelinks
+
+    sitelinks = fetch_sitelinks(lang, title)
+    if not sitelinks:
+        cache.set(cache_key, sitelinks,
+                  timeout=getattr(settings, "WIKIDATA_NEGATIVE_CACHE_TIMEOUT", DEFAULT_NEGATIVE_CACHE_TIMEOUT))
+        return sitelinks
+
+    # The same item is reached from any of its sitelinks: cache it under all of them
+    entries = {_cache_key(code, linked_title): sitelinks for code, linked_title in sitelinks.items()}
+    entries[cache_key] = sitelinks  # the requested title may differ from the sitelink (normalization)
+    cache.set_many(entries, timeout=getattr(settings, "WIKIDATA_SITELINKS_CACHE_TIMEOUT", DEFAULT_CACHE_TIMEOUT))
+    return sitelinks
@@ -0,0 +1,82 @@
+"""
+Shared bounded worker pool for concurrent upstream calls
+
+All parallel fan-out of the tool (e.g. fetching every category of a traversal level at once) runs on one
+process-wide thread pool, so the number of concurrent requests a worker sends to Wikimedia stays bounded
+by WIKI_MAX_WORKERS whatever the number of simultaneous searches.
+
+Whole searches (result_cache.py) run on a second bounded pool of WIKI_MAX_SEARCHES threads: their own
+fan-out then still goes to the first pool (it would run serially from inside it), and searches beyond the
+bound wait in its queue instead of each starting a thread.
+
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+from django.conf import settings
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_SEARCHES = 4
+
+_pool = None
+_search_pool = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_pool():
+    """
+    Return the shared thread pool, creating it on first use.
+
+    :return: concurrent.futures.ThreadPoolExecutor
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "WIKI_MAX_WORKERS", DEFAULT_MAX_WORKERS),
+                    thread_name_prefix="wiki-worker",
+                    initializer=_mark_worker_thread,
+                )
+    return _pool
+
+
+def get_search_pool():
+    """
+    Return the shared pool running whole searches, creating it on first use.
+
+    :return: concurrent.futures.ThreadPoolExecutor
+    """
+    global _search_pool
+    if _search_pool is None:
+        with _pool_lock:
+            if _search_pool is None:
+                _search_pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "WIKI_MAX_SEARCHES", DEFAULT_MAX_SEARCHES),
+                    thread_name_prefix="search",
+                )
+    return _search_pool
+
+
+def _mark_worker_thread():
+    _local.in_pool = True
+
+
+def parallel_map(func, items):
+    """
+    Apply func to every item on the shared pool and return the results in the order of items.
+    Called from inside a pool thread it runs serially, so nested fan-out can never deadlock the pool.
+    Each call runs in a copy of the caller's context (contextvars), e.g. to account its timings to the request.
+
+    :param func: Function of one argument
+    :param items: Iterable of arguments
+    :return: List of results (the first exception raised by func is re-raised)
+    """
+    items = list(items)
+    if len(items) <= 1 or getattr(_local, "in_pool", False):
+        return [func(item) for item in items]
+    pool = get_pool()
+    futures = [pool.submit(copy_context().run, func, item) for item in items]
+    return [future.result() for future in futures]
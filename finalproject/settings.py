@@ -12,9 +12,6 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 import os
 from pathlib import Path
 
-import requests
-from django.core.cache import cache
-from django.core.exceptions import ImproperlyConfigured
 from django.conf.locale import LANG_INFO
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -66,6 +63,8 @@ STATICFILES_DIRS = [
 ]
 
 MIDDLEWARE = [
+    'Missing_App.metrics.MetricsMiddleware',  # first: times the whole request (Server-Timing, /metrics)
+    'Missing_App.http_cache.GZipMiddleware',  # compresses pages; streamed search results are left as is
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -106,6 +105,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # The category graph store is written from several worker threads: take the write lock at the
+        # start of each transaction and wait for it, instead of failing with "database is locked"
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -141,46 +146,8 @@ USE_TZ = True
 USE_L10N = True
 
 
-# Specify the list of languages you want to support
-def get_ui_languages_from_api():
-    try:
-        cached_languages = cache.get("supported_languages")
-
-        if cached_languages:
-            return cached_languages["languages"]
-
-        # If not cached, fetch from the Wikimedia API
-        api_url = "https://meta.wikimedia.org/w/api.php?action=sitematrix&format=json"
-        headers = {
-            "User-Agent": "multilingual-missing-articles/1.0 (https://multilingual-missing-articles.toolforge.org/)"
-        }
-        response = requests.get(api_url, headers=headers, timeout=10)
-        response.raise_for_status()  # Raise an error for bad responses
-        data = response.json()
-
-        # Extracting the languages from the API response
-        languages = []
-        for value in data['sitematrix'].values():
-            if isinstance(value, dict) and 'code' in value:
-                name = value.get('localname',
-                                 'Unknown Language')  # Default to 'Unknown Language' if 'localname' is missing
-                native_name = value.get('name', 'Unknown Language')
-                languages.append({"code": value['code'],
-                                  "name": name,
-                                  "native_name": native_name
-                                  })
-
-        # Cache the result for 24 hours (86400 seconds)
-        cache.set("supported_languages", languages, timeout=86400)
-
-        # Return the list of languages as a JSON response
-        return languages
-
-    except Exception as e:
-        raise ImproperlyConfigured(f"Failed to load languages: {e}")
-
-
-UI_LANGUAGES = get_ui_languages_from_api()
+# The list of Wikipedia languages is not fetched here anymore: it is served by the lazily loaded
+# language catalog (Missing_App/languages.py), built from the bundled sitematrix snapshot.
 
 # add a page to translate when ready
 LANGUAGES = [
@@ -561,10 +528,112 @@ LOCALE_PATHS = [
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# cache
+# Wikimedia HTTP client (Missing_App/wiki_client.py): keep-alive pools, timeouts and retries
+WIKI_HTTP_POOL_CONNECTIONS = 20  # number of per-host connection pools (one per wiki host)
+WIKI_HTTP_POOL_MAXSIZE = 10  # keep-alive connections kept open per host
+WIKI_HTTP_TIMEOUT = (3.05, 20)  # (connect, read) timeout in seconds
+WIKI_HTTP_RETRIES = 3  # retries on connection errors and 5xx responses (429 is handled by the rate limiter)
+WIKI_HTTP_BACKOFF = 0.5  # exponential backoff factor between retries (seconds)
+WIKI_HTTP_RATE = 20  # requests per second per Wikimedia host (token bucket; 0: unlimited)
+WIKI_HTTP_BURST = 20
+WIKI_HTTP_MAXLAG = 5  # https://www.mediawiki.org/wiki/Manual:Maxlag_parameter
+WIKI_HTTP_THROTTLE_RETRIES = 3  # a request throttled (429 / maxlag) more often fails with 503
+WIKI_HTTP_MAX_RETRY_AFTER = 30  # seconds; longer Retry-After values fail the request at once and pause the host
+#                                 for this long only
+WIKI_MAX_WORKERS = 8  # size of the shared worker pool used for parallel upstream calls (Missing_App/workers.py)
+WIKI_MAX_SEARCHES = 4  # distinct searches computed at once; more wait in the queue of their pool
+
+# Search pipeline (Missing_App/search.py) and metadata harvester (Missing_App/metadata.py)
+MAX_MEMBERS_PER_CATEGORY = None  # optional cap on the members listed per category (None: complete listings)
+MATRIX_MAX_LANGUAGES = 50  # target languages per missing-matrix request
+METADATA_MAX_TITLES = 500  # maximum number of titles per article_metadata request
+METADATA_MAX_CONTINUATIONS = 10  # requests per metadata query (50-title batch, then per page it left open)
+
+# Namespace tables (Missing_App/siteinfo.py) are kept in the cache for a week
+WIKI_SITEINFO_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Language catalog (Missing_App/languages.py): refreshed in the background when older than this (0 disables)
+LANGUAGE_CATALOG_REFRESH_INTERVAL = 60 * 60 * 24 * 7
+
+# Wikidata sitelinks of categories (Missing_App/wikidata.py), cached for all languages of the item;
+# categories without an item are remembered for a shorter time
+WIKIDATA_SITELINKS_CACHE_TIMEOUT = 60 * 60 * 24
+WIKIDATA_NEGATIVE_CACHE_TIMEOUT = 60 * 60
+
+# Category autocomplete (Missing_App/category_index.py): number of fetched prefixes kept in memory (LRU), and
+# seconds a fetched listing answers longer prefixes before it is fetched again (None: until evicted)
+CATEGORY_INDEX_MAX_ENTRIES = 1000
+CATEGORY_INDEX_TTL = 60 * 60
+
+# Whole search results (Missing_App/result_cache.py): fresh for SEARCH_RESULT_FRESH_TIMEOUT seconds, then served
+# stale for up to SEARCH_RESULT_STALE_TIMEOUT more while a background refresh runs (0 disables the cache)
+SEARCH_RESULT_FRESH_TIMEOUT = 60 * 60
+SEARCH_RESULT_STALE_TIMEOUT = 60 * 60 * 24
+
+# Background search jobs (Missing_App/jobs.py): concurrent jobs, and seconds without a heartbeat (sent every
+# third of it while the job runs) after which a running job is considered orphaned (its worker restarted) and
+# queued again
+JOB_MAX_WORKERS = 2
+JOB_HEARTBEAT_TIMEOUT = 60 * 15
+
+# Saved searches (Missing_App/saved_searches.py): a delta refresh asks for the members added to the categories
+# since the last run minus this many seconds (clock skew between us and Wikipedia, replication lag)
+SAVED_SEARCH_OVERLAP = 60 * 5
+
+# Search history (Missing_App/search_log.py) and prefetch of the popular searches (`python manage.py
+# prefetch_searches`, e.g. from cron every morning and after each deploy): the PREFETCH_TOP_N searches asked most
+# often in the last PREFETCH_WINDOW_DAYS days are computed ahead, with at most PREFETCH_REQUEST_BUDGET calls
+# to Wikimedia per run
+SEARCH_LOG_ENABLED = True
+SEARCH_LOG_RETENTION_DAYS = 90
+PREFETCH_TOP_N = 50
+PREFETCH_WINDOW_DAYS = 14
+PREFETCH_REQUEST_BUDGET = 2000
+
+# Large category mode (?large=1, Missing_App/large_search.py): category listings longer than
+# CATEGORY_STORE_MAX_MEMBERS are not kept in memory for the category graph store
+CATEGORY_STORE_MAX_MEMBERS = 50000
+
+# Paginated search results (?page_size=, Missing_App/result_sets.py): seconds a materialized result set is kept in
+# the cache, and the largest page size accepted
+RESULT_SET_TIMEOUT = 60 * 60
+RESULT_PAGE_MAX_SIZE = 1000
+
+# Search backend: "api" (live Wikipedia/Wikidata APIs) or "dump" (offline stores built from MediaWiki dumps with
+# `python manage.py ingest_dumps`, one SQLite file per language in DUMP_STORE_DIR); ?backend= overrides it
+SEARCH_BACKEND = "api"
+DUMP_STORE_DIR = BASE_DIR / "dumps"
+DUMP_NAMESPACES = (0, 14)  # pages kept from the dumps: articles and categories
+
+# Category graph store (Missing_App/graph_store.py): category listings kept in the database are reused
+# for this many seconds, so repeated or overlapping searches cost no API calls; older rows are deleted at most
+# once every CATEGORY_STORE_PRUNE_INTERVAL seconds per process (None: only by the prefetch_searches command)
+CATEGORY_STORE_ENABLED = True
+CATEGORY_STORE_TTL = 60 * 60 * 24
+CATEGORY_STORE_PRUNE_INTERVAL = 60 * 60
+
+# Instrumentation (Missing_App/metrics.py): Server-Timing header on every response (phase timings, upstream
+# calls per API module, cache hits) and Prometheus metrics at /metrics; turn off to hide them from the public
+SERVER_TIMING_ENABLED = True
+METRICS_ENABLED = True
+
+# HTTP caching of the JSON endpoints (Missing_App/http_cache.py): max-age of the language lists and of the
+# category autocomplete, and memory kept for serialized, gzipped response bodies (per process)
+LANGUAGES_HTTP_MAX_AGE = 60 * 60 * 24
+CATEGORIES_HTTP_MAX_AGE = 60 * 60
+HTTP_BODY_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# cache: one SQLite file (WAL, memory-mapped) shared by every worker process (Missing_App/sqlite_cache.py),
+# bounded by entry count and total size with LRU eviction; entries survive restarts
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-lang-id',  # A unique identifier for my cache instance
+        'BACKEND': 'Missing_App.sqlite_cache.SQLiteCache',
+        'LOCATION': BASE_DIR / 'cache.sqlite3',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_BYTES': 256 * 1024 * 1024,
+            'CULL_FREQUENCY': 10,  # evict a tenth of the bound when it is exceeded
+            'MMAP_SIZE': 64 * 1024 * 1024,
+        },
     }
 }
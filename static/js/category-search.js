@@ -45,15 +45,24 @@ document.addEventListener("DOMContentLoaded", () => {
 
     allCategoryList.innerHTML = "<li style='color: red;'>Please select a language first.</li>";
 
-    // Fetch languages
+    // Fetch languages (one request shared by both language lists; the browser cache keeps it between pages)
+    let languagesPromise = null;
+    function loadLanguages() {
+        if (!languagesPromise) {
+            languagesPromise = fetch("/api/supported_languages/").then((response) => {
+                if (!response.ok) throw new Error("Failed to fetch languages");
+                return response.json();
+            }).then((data) => data.languages);
+            languagesPromise.catch(() => { languagesPromise = null; }); // retry on the next call
+        }
+        return languagesPromise;
+    }
+
     async function fetchLanguages() {
         articleLanguageList.innerHTML = "<li>Loading languages...</li>";
 
         try {
-            const response = await fetch("/api/supported_languages/");
-            if (!response.ok) throw new Error("Failed to fetch languages");
-            const data = await response.json();
-            languages = data.languages;
+            languages = await loadLanguages();
 
             populateLanguageList(""); // Populate list initially
         } catch (error) {
@@ -64,10 +73,7 @@ document.addEventListener("DOMContentLoaded", () => {
     async function fetchReferLanguages() {
         articleReferLanguageList.innerHTML = "<li>Loading languages...</li>";
         try {
-            const response = await fetch("/api/supported_languages/");
-            if (!response.ok) throw new Error("Failed to fetch languages");
-            const data = await response.json();
-            languages = data.languages;
+            languages = await loadLanguages();
 
             populateReferLanguageList(""); // Populate list initially
         } catch (error) {
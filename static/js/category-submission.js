@@ -24,239 +24,52 @@ document.addEventListener("DOMContentLoaded", function () {
 
     let finalSortedResults = [];
 
-    /** check if each page exists in edit-lage by using the MediaWiki API with the action=query
-     and prop=langlinks parameters.
-     for example if we asked this : https://ar.wikipedia.org/w/api.php?action=query&titles=%D8%B5%D8%AD%D8%A9&prop=langlinks&format=json&origin=*
-     we will get:
-     {
-     "continue": {
-     "llcontinue": "1846|bcl",
-     "continue": "||"
-     },
-     "query": {
-        "pages": {
-            "1846": {
-                 "pageid": 1846,
-                 "ns": 0,
-                 "title": "صحة",
-                 "langlinks": [
-                         {
-                         "lang": "af",
-                         "*": "Gesondheid"
-                         },
-                     {
-                     "lang": "als",
-                     "*": "Gesundheit"
-                      },
-                      {
-                        "lang": "am",
-                        "*": "ትምህርተ፡ጤና"
-                      },
-                      {
-                        "lang": "an",
-                        "*": "Salut"
-                      },
-                      {
-                        "lang": "as",
-                        "*": "স্বাস্থ্য"
-                      },
-                      {
-                        "lang": "ast",
-                        "*": "Salú"
-                      },
-                      {
-                        "lang": "az",
-                        "*": "Sağlamlıq"
-                      },
-                      {
-                        "lang": "azb",
-                        "*": "ساغلاملیق"
-                      },
-                      {
-                        "lang": "ba",
-                        "*": "Һаулыҡ"
-                      },
-                      {
-                        "lang": "bat-smg",
-                        "*": "Svēkata"
-                      }
-                    ]
-                  }
-                }
-              }
-            }
-             **/
-    async function checkPageInLanguage(title, sourceLang, targetLang) {
-        const apiUrl =
-                    `https://${sourceLang}.wikipedia.org/w/api.php?action=query&titles=${encodeURIComponent(title)}&prop=langlinks&lllang=${targetLang}&format=json&origin=*`;
-        const timeout = 10000; 
-        const controller = new AbortController();
-        const timeoutId = setTimeout(() => controller.abort(), timeout);
+    const rankButton = document.getElementById("rank-btn");
 
-        try {
-            const response = await fetch(apiUrl, {
-                signal: controller.signal
-            });
-            clearTimeout(timeoutId);
-            const data = await response.json();
+    const sortSelect = document.getElementById("sort-select");
 
-            const pageId = Object.keys(data.query.pages)[0];  // Get the page ID
-            const page = data.query.pages[pageId];
+    const PAGE_SIZE = 100; // missing articles per page of results, and table rows rendered at a time
+    const FULL_PAGE_SIZE = 1000; // articles per request when the whole result is fetched (RESULT_PAGE_MAX_SIZE)
+    const SCROLL_MARGIN = 400; // pixels before the end of the table at which the next rows are loaded
+    let resultPages = null; // current search: result id, pages loaded, ranking (see showResultPages)
+    let tableRows = {items: [], render: null, shown: 0}; // rows of the table (see showRows)
 
-            if (page.langlinks) {
-                return 1; // page exists
-            } else {
-                return 0; // page does not exist
-            }
-        } catch (error) {
-            if (error.name === 'AbortError') {
-                console.error('Request timed out');
-            }
-            console.error("Error checking Wikipedia page:", error);
-            return -1; // Error occurred
+    /**
+     * Fetch the ranking features of a batch of articles from the backend harvester, which gathers them
+     * with multi-title API queries (pageviews, langlinks, editors, templates, in/out links, size).
+     *
+     * @param titles {Array<string>} Article titles (at most 500)
+     * @param lang {string} Wikipedia language code of the articles
+     * @return {Promise<Array>} One metadata object per title, in the format used by computeRankingScore
+     */
+    async function getArticlesMetadata(titles, lang) {
+        const csrfToken = form.querySelector("[name=csrfmiddlewaretoken]").value;
+        const response = await fetch(`/api/article_metadata/${lang}/`, {
+            method: "POST",
+            headers: {"Content-Type": "application/json", "X-CSRFToken": csrfToken},
+            body: JSON.stringify({titles: titles}),
+        });
+        if (!response.ok) {
+            throw new Error(`article_metadata API request failed: ${response.status}`);
         }
-    }
-
-    async function fetchAllFromApi(baseUrl, params, dataKey) {
-    let results = [];
-    let continueParams = {};
-    let shouldContinue = true;
-
-    while (shouldContinue) {
-        const queryParams = new URLSearchParams({ ...params, ...continueParams, origin: '*' });
-        const response = await fetch(`${baseUrl}?${queryParams}`);
         const data = await response.json();
 
-        if (data?.query?.pages) {
-            const page = Object.values(data.query.pages)[0];
-            if (page[dataKey]) {
-                results = results.concat(page[dataKey]);
-            }
-        }
-
-        if (data.continue) {
-            continueParams = data.continue;
-        } else {
-            shouldContinue = false;
-        }
-    }
-
-    return results;
-}
-
-
-    async function getArticleMetadata(title, lang) {
-        const baseUrl = `https://${lang}.wikipedia.org/w/api.php`;
-        const wiki = `${lang}.wikipedia.org`;
-
-        // "Basic information about the page."
-        const xToolInfoUrl = `https://xtools.wmcloud.org/api/page/pageinfo/${wiki}/${encodeURIComponent(title)}`;
-        const xToolProseStatisticsUrl = `https://xtools.wmcloud.org/api/page/prose/${wiki}/${encodeURIComponent(title)}`;
-        const xToolLinksUrl = `https://xtools.wmcloud.org/api/page/links/${wiki}/${encodeURIComponent(title)}`;
-
-        const timeout = 10000; 
-        const controller = new AbortController();
-        const timeoutId = setTimeout(() => controller.abort(), timeout);
-
-        try {
-            // Step 1: Basic info
-            console.log(`\n=== Fetching metadata for article: ${title} ===`);
-            const infoResponse = await fetch(xToolInfoUrl, {
-                signal: controller.signal
-            });
-            clearTimeout(timeoutId);
-            if (!infoResponse.ok) {
-                console.error(`Info API failed for ${title}:`, infoResponse.status);
-                throw new Error("infoResponse API request failed");
-            }
-            const infoData = await infoResponse.json();
-            console.log(`Raw info data for ${title}:`, infoData);
-
-            const pageviews = infoData.pageviews ? infoData.pageviews : 0;
-            const revisions = infoData.revisions ? infoData.revisions : 0;
-            const editors = infoData.editors ? infoData.editors : 0;
-            const created_at = infoData.created_at ? infoData.created_at : 0;
-            const secs_since_last_edit = infoData.secs_since_last_edit ? infoData.secs_since_last_edit : 0;
-
-            // Step 2: Prose statistics
-            const proseResponse = await fetch(xToolProseStatisticsUrl, {
-                signal: controller.signal
-            });
-            clearTimeout(timeoutId);
-            if (!proseResponse.ok) {
-                console.error(`Prose API failed for ${title}:`, proseResponse.status);
-                throw new Error("proseResponse API request failed");
-            }
-            const proseData = await proseResponse.json();
-            console.log(`Raw prose data for ${title}:`, proseData);
-
-            const references = proseData.references ? proseData.references : 0;
-            const words = proseData.words ? proseData.words : 0;
-            const bytesSize = proseData.bytes ? proseData.bytes : 0;
-
-            let words_bytes_ratio = bytesSize !== 0 ? words / bytesSize : 0;
-
-            // Step 3: Links
-            const linkResponse = await fetch(xToolLinksUrl, {
-                signal: controller.signal
-            });
-            clearTimeout(timeoutId);
-            if (!linkResponse.ok) {
-                console.error(`Links API failed for ${title}:`, linkResponse.status);
-                throw new Error("linkResponse API request failed");
-            }
-            const linkData = await linkResponse.json();
-            console.log(`Raw links data for ${title}:`, linkData);
-
-            const links_in = linkData.links_in ? linkData.links_in : 0;
-            const links_ext_count = linkData.links_ext_count ? linkData.links_ext_count : 0;
-            const out_links_count = linkData.links_out ? linkData.links_out : 0;
-
-            // Step 4: Langlinks
-            const langlinks = await fetchAllFromApi(baseUrl, {
-                action: "query",
-                prop: "langlinks",
-                titles: title,
-                lllimit: "50",
-                format: "json"
-            }, "langlinks");
-
-            // Step 5: Templates
-            const templates = await fetchAllFromApi(baseUrl, {
-                action: "query",
-                prop: "templates",
-                titles: title,
-                tllimit: "50",
-                format: "json"
-            }, "templates");
-
-            const metadata = {
-                title: title,
-                views: pageviews,
-                langlinks: langlinks.length,
-                editCount: revisions,
-                firstEdit: created_at,
-                references: references,
-                editWars: editors !== 0 ? revisions / editors : 0,
-                words_bytes_ratio: words_bytes_ratio,
-                templates: templates.length,
-                in_links_Count: links_in + links_ext_count,
-                out_links_count: out_links_count,
-                secs_since_last_edit: secs_since_last_edit,
-                pageRank: 0,
-            };
-            
-
-            console.log(`\nFinal metadata for ${title}:`, metadata);
-            return metadata;
-
-        } catch (error) {
-            if (error.name === 'AbortError') {
-                console.error('Request timed out');
-            }
-            console.error(`Error fetching metadata for ${title}:`, error);
-            return {};
-        }
+        return data.features.map(features => ({
+            title: features.title,
+            views: features.views,
+            langlinks: features.langlinks,
+            editCount: features.editors, // revision counts are not available in multi-title queries
+            firstEdit: 0,
+            references: 0,
+            editWars: 0,
+            words_bytes_ratio: 0,
+            templates: features.templates,
+            in_links_Count: features.in_links_Count,
+            out_links_count: features.out_links_count,
+            secs_since_last_edit: features.secs_since_last_edit,
+            pageRank: 0,
+            incomplete: features.incomplete, // counts are lower bounds: left out of normalization
+        }));
     }
 
     // Function to compute ranking score
@@ -284,14 +97,14 @@ document.addEventListener("DOMContentLoaded", function () {
         return totalScore;
     }
 
-    function sleep(ms) {
-        return new Promise(resolve => setTimeout(resolve, ms));
-    }
-
     form.addEventListener("submit", async function (event) {
         event.preventDefault();
         tableBody.innerHTML = "";
         articles_msg.innerHTML = "";
+        resultPages = null;
+        tableRows = {items: [], render: null, shown: 0};
+        finalSortedResults = [];
+        rankButton.style.display = "none";
         document.getElementById("save-csv-btn").style.display = "none";
 
         const maxDepth = document.getElementById("max-depth-select").value;
@@ -315,130 +128,314 @@ document.addEventListener("DOMContentLoaded", function () {
                 return;
             }
 
-            const url = `/get_articles_from_other_languages/${languageCode}/${encodeURIComponent(category)}/${referLanguageCode}/?max_depth=${maxDepth}`;
+            const url = `/get_articles_from_other_languages/${languageCode}/${encodeURIComponent(category)}/${referLanguageCode}/?max_depth=${maxDepth}&page_size=${PAGE_SIZE}&sort=${sortSelect.value}`;
             console.log("URL fetchée :", url);
 
-            // Fetch missing articles
-            const response = await fetch(url);
-            const data = await response.json();
+            // Fetch the first page of missing articles: the result is kept on the server under a result id, the
+            // next pages are loaded on scroll
+            const page = await fetchResultPage(url);
+
+            if (page.total > 0) {
+                resultPages = {resultId: page.result_id, total: page.total, referLanguageCode, languageCode};
+                showResultPages(resultPages, page);
+                if (!page.next_cursor) {
+                    // Step 2: the first page holds the whole result, rank it at once
+                    await rankResult(resultPages, page.articles);
+                } else {
+                    rankButton.style.display = "inline-block";
+                    ranked_res_spinner.style.display = "none";
+                    showMoreIfVisible();
+                }
+            } else {
+                articles_msg.innerHTML = "Search completed, No missing articles found under this category";
+                ranked_res_spinner.style.display = "none";
+            }
+
+        } catch (error) {
+            handleError(error);
+        }
+    });
 
+    /**
+     * Fetch a page of missing articles: the first one from the search URL (with page_size), the next ones
+     * from /api/results/<result_id>/ with the cursor of the previous page.
+     *
+     * @param url {string} Page URL
+     * @return {Promise<Object>} Page: articles (title, source), result_id, sort, next_cursor (null on the last
+     *                           page) and total
+     */
+    async function fetchResultPage(url) {
+        const response = await fetch(url);
+        const data = await response.json();
+        if (!response.ok) {
             if (data.noCatError) {
                 throw new Error("noCatError");
             } else if (data.noQCode) {
                 throw new Error("noQCode");
             }
+            throw new Error(data.error || "Unexpected response");
+        }
+        return data;
+    }
 
-            if (data.articles && data.articles.length > 0) {
-                // Step 1: Display articles without scores
-                displayArticlesWithoutScores(data.articles, referLanguageCode, languageCode);
-                
-                articles_msg.innerHTML = "fetching metadata and compute relevance score of missing articles found";
+    // URL of a page of the current result
+    function resultPageUrl(state, pageSize, sort, cursor = "") {
+        return `/api/results/${state.resultId}/?page_size=${pageSize}&sort=${sort}&cursor=${encodeURIComponent(cursor)}`;
+    }
 
-                // Step 2: Process articles hybrid
-                await processArticlesHybrid(data.articles, referLanguageCode, languageCode);
-                
-                articles_msg.innerHTML = "";
-                ranked_res_spinner.style.display = "none";
-            } else {
-                articles_msg.innerHTML = "Search completed, No missing articles found under this category";
-                ranked_res_spinner.style.display = "none";
+    /**
+     * Show the result page by page, in the order of a page (its sort): the next pages are loaded on scroll.
+     *
+     * @param state {Object} Current search (resultPages)
+     * @param page {Object} First page, returned by fetchResultPage
+     */
+    function showResultPages(state, page) {
+        state.view = "pages";
+        state.sort = page.sort;
+        state.nextCursor = page.next_cursor;
+        showRows([...page.articles],
+            (article, index) => appendArticleRow(article, index + 1, state.referLanguageCode, state.languageCode));
+        showPagesMessage(state);
+    }
+
+    function showPagesMessage(state) {
+        articles_msg.innerHTML = state.nextCursor
+            ? `Showing ${tableRows.items.length} of ${state.total} missing articles, scroll down for more`
+            : "";
+    }
+
+    /**
+     * Load the next page of the current result, unless one is already loading or it was the last one.
+     */
+    async function loadNextPage() {
+        const state = resultPages;
+        if (!state || state.view !== "pages" || !state.nextCursor || state.loading) return;
+        state.loading = true;
+        ranked_res_spinner.style.display = "inline-block";
+        try {
+            const page = await fetchResultPage(resultPageUrl(state, PAGE_SIZE, state.sort, state.nextCursor));
+            if (state !== resultPages || state.view !== "pages" || page.sort !== state.sort) return;
+            state.nextCursor = page.next_cursor;
+            tableRows.items.push(...page.articles);
+            showMoreRows(page.articles.length);
+            showPagesMessage(state);
+        } catch (error) {
+            handleError(error);
+            return;
+        } finally {
+            state.loading = false;
+            if (!state.ranking || state.ranked) ranked_res_spinner.style.display = "none";
+        }
+        showMoreIfVisible();
+    }
+
+    /**
+     * Fetch every article of the current result, FULL_PAGE_SIZE at a time, in search order.
+     *
+     * @param state {Object} Current search (resultPages)
+     * @return {Promise<Array>} All missing articles (title, source)
+     */
+    async function fetchWholeResult(state) {
+        const articles = [];
+        let cursor = "";
+        do {
+            const page = await fetchResultPage(resultPageUrl(state, FULL_PAGE_SIZE, "", cursor));
+            articles.push(...page.articles);
+            cursor = page.next_cursor;
+            if (state === resultPages && state.view === "ranked") {
+                articles_msg.innerHTML = `Fetching the missing articles to rank... ${articles.length}/${state.total}`;
             }
+        } while (cursor && state === resultPages);
+        return articles;
+    }
 
+    /**
+     * Rank the whole result and show it by relevance. The articles are fetched only now, on demand (unless the
+     * first page already held them all), and the ranking is kept for the search: the CSV export covers it.
+     *
+     * @param state {Object} Current search (resultPages)
+     * @param articles {Array|null} All missing articles, if already loaded
+     */
+    async function rankResult(state, articles = null) {
+        rankButton.style.display = "none";
+        state.view = "ranked";
+        ranked_res_spinner.style.display = "inline-block";
+        const ranking = state.ranking;
+        try {
+            if (!ranking) {
+                state.ranking = (async () => {
+                    const all = articles || await fetchWholeResult(state);
+                    if (state === resultPages && state.view === "ranked") {
+                        articles_msg.innerHTML =
+                            "fetching metadata and compute relevance score of missing articles found";
+                    }
+                    return processArticlesHybrid(all, state);
+                })();
+            }
+            const metadataList = await state.ranking;
+            state.ranked = true;
+            if (ranking && state === resultPages && state.view === "ranked") {
+                displayArticlesWithScores(metadataList, state, true); // ranked before: show it again
+            }
+            if (state === resultPages && state.view === "ranked") articles_msg.innerHTML = "";
+        } catch (error) {
+            state.ranking = null;
+            handleError(error);
+        } finally {
+            if (state === resultPages && !state.loading) ranked_res_spinner.style.display = "none";
+        }
+    }
+
+    rankButton.addEventListener("click", function () {
+        if (resultPages) rankResult(resultPages);
+    });
+
+    // another sort order: show the pages of the same result in that order (the search does not run again)
+    sortSelect.addEventListener("change", async function () {
+        const state = resultPages;
+        if (!state) return;
+        ranked_res_spinner.style.display = "inline-block";
+        try {
+            const page = await fetchResultPage(resultPageUrl(state, PAGE_SIZE, sortSelect.value));
+            if (state !== resultPages || page.sort !== sortSelect.value) return;
+            showResultPages(state, page);
+            rankButton.style.display = "inline-block";
+            showMoreIfVisible();
         } catch (error) {
             handleError(error);
+        } finally {
+            if (!state.ranking || state.ranked) ranked_res_spinner.style.display = "none";
         }
     });
 
-    // function to display articles without scores
-    function displayArticlesWithoutScores(articles, referLanguageCode, languageCode) {
+    /**
+     * Replace the rows of the table: only the first ones are rendered, the next ones when the end of the
+     * table gets near the bottom of the window, so huge results do not fill the page at once.
+     *
+     * @param items {Array} Rows to show (may still grow, as pages are loaded)
+     * @param render {Function} Appends the row of (item, index) to the table
+     * @param keepShown {boolean} Render as many rows as before (provisional rankings replace each other)
+     */
+    function showRows(items, render, keepShown = false) {
+        const shown = keepShown ? Math.max(tableRows.shown, PAGE_SIZE) : PAGE_SIZE;
         tableBody.innerHTML = "";
-        articles.forEach((article, index) => {
-            const title = typeof article === 'string' ? article : article.title;
-            const source = article.source || '';
-            const encodedTitle = encodeURIComponent(title);
-            const referenceWikiUrl = `https://${referLanguageCode}.wikipedia.org/wiki/${encodedTitle}`;
-            const wikiUrl = `https://${languageCode}.wikipedia.org/w/index.php?title=${encodedTitle}&action=edit`;
+        tableRows = {items, render, shown: 0};
+        showMoreRows(shown);
+    }
 
-            const row = document.createElement("tr");
-            row.innerHTML = `
-                <td style="border: 1px solid #ccc; padding: 8px;">
-                    ${index + 1}
-                </td>
-                <td style="border: 1px solid #ccc; padding: 8px;">
-                    ${title}
-                    <span class="score-placeholder">Score: calculating...</span>
-                </td>
-                <td style="border: 1px solid #ccc; padding: 8px;">
-                    ${source}
-                </td>
-                <td style="border: 1px solid #ccc; padding: 8px;">
-                    <a href="${referenceWikiUrl}" target="_blank">View Article</a>
-                    -
-                    <a href="${wikiUrl}" target="_blank">Edit Article</a>
-                </td>
-            `;
-            tableBody.appendChild(row);
-        });
+    // render the next rows of the table
+    function showMoreRows(count = PAGE_SIZE) {
+        const end = Math.min(tableRows.items.length, tableRows.shown + count);
+        for (let i = tableRows.shown; i < end; i++) tableRows.render(tableRows.items[i], i);
+        tableRows.shown = end;
     }
 
-    // main function for hybrid processing
-    async function processArticlesHybrid(articles, referLanguageCode, languageCode) {
-        const BATCH_SIZE = 10; 
+    // render more rows, or load the next page, when the end of the table gets near the bottom of the window
+    const resultsEnd = document.createElement("div");
+    tableBody.closest("table").after(resultsEnd);
+    new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) showMoreIfVisible();
+    }, {rootMargin: `${SCROLL_MARGIN}px`}).observe(resultsEnd);
+
+    // the observer only fires on changes: keep going while the end of a short table stays visible
+    function showMoreIfVisible() {
+        const endIsNear = () => resultsEnd.getBoundingClientRect().top < window.innerHeight + SCROLL_MARGIN;
+        while (tableRows.shown < tableRows.items.length && endIsNear()) {
+            showMoreRows();
+        }
+        if (endIsNear()) loadNextPage();
+    }
+
+    // function to append one article row, without score
+    function appendArticleRow(article, index, referLanguageCode, languageCode) {
+        const title = typeof article === 'string' ? article : article.title;
+        const source = article.source || '';
+        const encodedTitle = encodeURIComponent(title);
+        const referenceWikiUrl = `https://${referLanguageCode}.wikipedia.org/wiki/${encodedTitle}`;
+        const wikiUrl = `https://${languageCode}.wikipedia.org/w/index.php?title=${encodedTitle}&action=edit`;
+
+        const row = document.createElement("tr");
+        row.innerHTML = `
+            <td style="border: 1px solid #ccc; padding: 8px;">
+                ${index}
+            </td>
+            <td style="border: 1px solid #ccc; padding: 8px;">
+                ${title}
+                <span class="score-placeholder">(not ranked yet)</span>
+            </td>
+            <td style="border: 1px solid #ccc; padding: 8px;">
+                ${source}
+            </td>
+            <td style="border: 1px solid #ccc; padding: 8px;">
+                <a href="${referenceWikiUrl}" target="_blank">View Article</a>
+                -
+                <a href="${wikiUrl}" target="_blank">Edit Article</a>
+            </td>
+        `;
+        tableBody.appendChild(row);
+    }
+
+    // main function for hybrid processing: ranks all the articles of a search, returns them by descending score
+    async function processArticlesHybrid(articles, state) {
+        const BATCH_SIZE = 50; // titles per article_metadata request (one multi-title query upstream)
         const filteredMetadataList = [];
         const processedArticles = new Set();
         
         // process articles by batch
         for (let i = 0; i < articles.length; i += BATCH_SIZE) {
-            const batch = articles.slice(i, i + BATCH_SIZE);
-            
-            // process current batch
-            for (const articleObj of batch) {
-                const title = typeof articleObj === 'string' ? articleObj : articleObj.title;
-                const source = articleObj.source || '';
-                if (processedArticles.has(title)) continue;
-                
-                const exists = await checkPageInLanguage(title, referLanguageCode, languageCode);
-                if (exists !== 1) {
-                    const metadata = await getArticleMetadata(title, referLanguageCode);
-                    if (metadata) {
-                        metadata.source = source;
-                        filteredMetadataList.push(metadata);
-                        processedArticles.add(title);
-                    }
-                    await sleep(100);
-                }
+            // the backend only returns articles that are missing in the contribution language
+            // (generator=categorymembers + prop=langlinks), so no per-title existence check is needed here
+            const batch = articles
+                .slice(i, i + BATCH_SIZE)
+                .filter(articleObj => !processedArticles.has(articleObj.title || articleObj));
+            const sources = new Map(batch.map(articleObj => [articleObj.title || articleObj, articleObj.source || '']));
+
+            try {
+                const metadataList = await getArticlesMetadata([...sources.keys()], state.referLanguageCode);
+                metadataList.forEach(metadata => {
+                    metadata.source = sources.get(metadata.title);
+                    filteredMetadataList.push(metadata);
+                    processedArticles.add(metadata.title);
+                });
+            } catch (error) {
+                console.error("Error fetching metadata for batch:", error);
             }
             
-            // if we have enough articles, calculate and display scores
-            if (filteredMetadataList.length >= BATCH_SIZE || i + BATCH_SIZE >= articles.length) {
-                await calculateAndDisplayScores(filteredMetadataList, referLanguageCode, languageCode, false);
-            }
+            // display provisional scores after each batch
+            await calculateAndDisplayScores(filteredMetadataList, state, false);
         }
         
         // Step 3: Calculate final scores with all articles
-        articles_msg.innerHTML = "Ranking...";
-        await calculateAndDisplayScores(filteredMetadataList, referLanguageCode, languageCode, true);
+        if (state === resultPages && state.view === "ranked") articles_msg.innerHTML = "Ranking...";
+        await calculateAndDisplayScores(filteredMetadataList, state, true);
+        return filteredMetadataList;
     }
 
     // function to calculate and display scores
-    async function calculateAndDisplayScores(metadataList, referLanguageCode, languageCode, isFinal = false) {
+    async function calculateAndDisplayScores(metadataList, state, isFinal = false) {
         if (metadataList.length === 0) {
+            if (state !== resultPages) return;
             articles_msg.innerHTML = "Search completed, No missing article found under this category";
             return;
         }
 
-        // calculate max_values
+        // calculate max_values, from the articles whose counts are complete
+        const complete = metadataList.filter(m => !m.incomplete);
+        const reference = complete.length > 0 ? complete : metadataList;
+        // (reduce, not Math.max(...list): spreading the whole result as arguments overflows the stack)
+        const maxOf = field => reference.map(m => Number(m[field])).filter(v => !isNaN(v))
+            .reduce((max, v) => Math.max(max, v), -Infinity);
         const maxValues = {
-            views: Math.max(...metadataList.map(m => Number(m.views)).filter(v => !isNaN(v))),
-            langlinks: Math.max(...metadataList.map(m => Number(m.langlinks)).filter(v => !isNaN(v))),
-            editCount: Math.max(...metadataList.map(m => Number(m.editCount)).filter(v => !isNaN(v))),
-            references: Math.max(...metadataList.map(m => Number(m.references)).filter(v => !isNaN(v))),
-            editWars: Math.max(...metadataList.map(m => Number(m.editWars)).filter(v => !isNaN(v))),
-            templates: Math.max(...metadataList.map(m => Number(m.templates)).filter(v => !isNaN(v))),
-            in_links_Count: Math.max(...metadataList.map(m => Number(m.in_links_Count)).filter(v => !isNaN(v))),
-            out_links_count: Math.max(...metadataList.map(m => Number(m.out_links_count)).filter(v => !isNaN(v))),
-            words_bytes_ratio: Math.max(...metadataList.map(m => Number(m.words_bytes_ratio)).filter(v => !isNaN(v))),
-            secs_since_last_edit: Math.max(...metadataList.map(m => Number(m.secs_since_last_edit)).filter(v => !isNaN(v)))
+            views: maxOf("views"),
+            langlinks: maxOf("langlinks"),
+            editCount: maxOf("editCount"),
+            references: maxOf("references"),
+            editWars: maxOf("editWars"),
+            templates: maxOf("templates"),
+            in_links_Count: maxOf("in_links_Count"),
+            out_links_count: maxOf("out_links_count"),
+            words_bytes_ratio: maxOf("words_bytes_ratio"),
+            secs_since_last_edit: maxOf("secs_since_last_edit")
         };
 
         // normalize and calculate scores
@@ -461,13 +458,26 @@ document.addEventListener("DOMContentLoaded", function () {
         metadataList.sort((a, b) => b.score - a.score);
 
         // display results
-        displayArticlesWithScores(metadataList, referLanguageCode, languageCode, isFinal);
+        displayArticlesWithScores(metadataList, state, isFinal);
     }
 
-    // function to display articles with scores
-    function displayArticlesWithScores(sortedMetadataList, referLanguageCode, languageCode, isFinal = false) {
-        tableBody.innerHTML = "";
-        sortedMetadataList.forEach((meta, index) => {
+    // function to display articles with scores (only while the search is shown by relevance)
+    function displayArticlesWithScores(sortedMetadataList, state, isFinal = false) {
+        if (state !== resultPages) return; // a new search was submitted meanwhile
+        const {referLanguageCode, languageCode} = state;
+        // if it's the final result, store it and display the button: the CSV covers the whole result
+        if (isFinal) {
+            finalSortedResults = sortedMetadataList.map(meta => ({
+                title: meta.title,
+                score: meta.score,
+                referLanguageCode,
+                languageCode,
+                source: meta.source || ''
+            }));
+            document.getElementById("save-csv-btn").style.display = "inline-block";
+        }
+        if (state.view !== "ranked") return;
+        showRows(sortedMetadataList, (meta, index) => {
             const encodedTitle = encodeURIComponent(meta.title);
             const referenceWikiUrl = `https://${referLanguageCode}.wikipedia.org/wiki/${encodedTitle}`;
             const wikiUrl = `https://${languageCode}.wikipedia.org/w/index.php?title=${encodedTitle}&action=edit`;
@@ -492,32 +502,20 @@ document.addEventListener("DOMContentLoaded", function () {
                 </td>
             `;
             tableBody.appendChild(row);
-        });
-        // if it's the final result, store and display the button
-        if (isFinal) {
-            finalSortedResults = sortedMetadataList.map(meta => ({
-                title: meta.title,
-                score: meta.score,
-                referLanguageCode,
-                languageCode,
-                source: meta.source || ''
-            }));
-            document.getElementById("save-csv-btn").style.display = "inline-block";
-        } else {
-            document.getElementById("save-csv-btn").style.display = "none";
-        }
+        }, true);
     }
 
     // Helper function for safe division
     /**
      * Safely divide two numbers, returning 0 if denominator is 0.
+     * The result is capped at 1: the counts of incomplete articles may exceed the maximum they are divided by.
      *
      * @param numerator {number} Numerator
      * @param denominator {number} Denominator
-     * @return {number} Result of division or 0
+     * @return {number} Result of division (at most 1) or 0
      */
     function safe_division(numerator, denominator) {
-        return denominator === 0 ? 0 : numerator / denominator;
+        return denominator === 0 ? 0 : Math.min(1, numerator / denominator);
     }
 
     // Error handling for article fetching